@@ -14,9 +14,12 @@
 from __future__ import print_function
 from abaqus import *
 from abaqusConstants import *
+from jobMessage import *
 import __main__
 
 import ConfigParser as configparser
+import multiprocessing
+import time
 
 
 # Set configuration file path, read it and load configuration data.
@@ -25,6 +28,10 @@ config_file_path = config_file_path.replace().replace('.cfgc', '.cfg')
 cfg = configparser.ConfigParser()
 cfg.read(config_file_path)
 CPUS_NUMBER = eval(cfg.get('MACROS', 'CPUS_NUMBER'))
+MAX_CONCURRENT_JOBS = eval(cfg.get('MACROS', 'MAX_CONCURRENT_JOBS'))
+
+# State of concurrent jobs runs, shared with job messages callbacks.
+CONCURRENT_RUN = {'pending': [], 'running': {}, 'finished': {}}
 
 
 def clean_all_xydata():
@@ -82,6 +89,100 @@ def create_jobs_overwriting():
     return
 
 
+def _finish_concurrent_run():
+    """Remove job messages callbacks and report a finished run."""
+    if not CONCURRENT_RUN.get('active'):
+        return
+    CONCURRENT_RUN['active'] = False
+    for message_type in (JOB_COMPLETED, JOB_ABORTED):
+        monitorManager.removeMessageCallback(
+            jobName=ANY_JOB, messageType=message_type,
+            callback=_on_concurrent_job_finished, userData=None)
+    _report_concurrent_run()
+
+
+def _on_concurrent_job_finished(jobName, messageType, data, userData):
+    """Record a finished job and submit next pending one, if any."""
+    if jobName not in CONCURRENT_RUN['running']:
+        return
+    start_time = CONCURRENT_RUN['running'].pop(jobName)
+    elapsed = time.time() - start_time
+    status = 'COMPLETED' if messageType == JOB_COMPLETED else 'ABORTED'
+    CONCURRENT_RUN['finished'][jobName] = (status, elapsed)
+    print('Job', jobName, status, 'in', round(elapsed, 1), 's.',
+          len(CONCURRENT_RUN['pending']), 'pending')
+
+    # Submit next job, or report throughput if all jobs are finished.
+    _submit_next_concurrent_job()
+
+
+def _report_concurrent_run():
+    """Print per-job times and total throughput of a concurrent run."""
+    total_time = time.time() - CONCURRENT_RUN['start_time']
+    finished = CONCURRENT_RUN['finished']
+    for job_name, (status, elapsed) in sorted(finished.items()):
+        print(job_name, status, round(elapsed, 1), 's')
+    completed = len([i for i in finished.values() if i[0] == 'COMPLETED'])
+    print('*****', completed, 'of', len(finished), 'jobs completed in',
+          round(total_time, 1), 's.', round(3600. * completed / total_time, 2),
+          'jobs per hour')
+
+
+def _run_jobs_concurrently(jobs_list):
+    """Submit jobs keeping up to MAX_CONCURRENT_JOBS running at once.
+
+    Cpus of each job are set so that all running jobs fit the machine
+    cores, up to CPUS_NUMBER. Next jobs are submitted from job messages
+    callbacks, as soon as a running job finishes, so the CAE session is
+    not blocked.
+    """
+    if not jobs_list:
+        return
+    if CONCURRENT_RUN['running']:
+        print('A concurrent run is already in progress')
+        return
+
+    # Set cpus per job, so concurrent jobs fit machine cores.
+    max_jobs = max(1, min(MAX_CONCURRENT_JOBS, len(jobs_list)))
+    cpus = max(1, min(CPUS_NUMBER, multiprocessing.cpu_count() // max_jobs))
+    for job in jobs_list:
+        job.setValues(numCpus=cpus, numDomains=cpus)
+    print(len(jobs_list), 'jobs,', max_jobs, 'at once,', cpus, 'cpus each')
+
+    # Reset run state, register callbacks and submit first jobs.
+    CONCURRENT_RUN['pending'] = [job.name for job in jobs_list]
+    CONCURRENT_RUN['finished'] = {}
+    CONCURRENT_RUN['start_time'] = time.time()
+    CONCURRENT_RUN['active'] = True
+    for message_type in (JOB_COMPLETED, JOB_ABORTED):
+        monitorManager.addMessageCallback(
+            jobName=ANY_JOB, messageType=message_type,
+            callback=_on_concurrent_job_finished, userData=None)
+    for i in range(max_jobs):
+        _submit_next_concurrent_job()
+
+
+def _submit_next_concurrent_job():
+    """Submit first pending job of current concurrent run.
+
+    Jobs that fail to be submitted are recorded as failed, and next
+    pending job is submitted instead. If no job is pending nor running,
+    the run is finished.
+    """
+    while CONCURRENT_RUN['pending']:
+        job_name = CONCURRENT_RUN['pending'].pop(0)
+        CONCURRENT_RUN['running'][job_name] = time.time()
+        try:
+            mdb.jobs[job_name].submit(consistencyChecking=OFF)
+            return
+        except Exception as error:
+            del CONCURRENT_RUN['running'][job_name]
+            CONCURRENT_RUN['finished'][job_name] = ('FAILED', 0.)
+            print('Job', job_name, 'FAILED to submit:', error)
+    if not CONCURRENT_RUN['running']:
+        _finish_concurrent_run()
+
+
 def replace_models_names_blanks():
     """Replace blank for underscores in all models names."""
     for model_key in mdb.models.keys():
@@ -102,6 +203,12 @@ def run_all_jobs():
     return
 
 
+def run_all_jobs_concurrently():
+    """Run all jobs in current database, several at a time."""
+    _run_jobs_concurrently([job for job in mdb.jobs.values()])
+    return
+
+
 def run_not_completed_jobs():
     """Run all not completed jobs in current database, one at a time."""
     # Iterate over jobs, run them, report and wait for completion.
@@ -115,3 +222,10 @@ def run_not_completed_jobs():
             job.waitForCompletion()
             jobs_count += 1
     return
+
+
+def run_not_completed_jobs_concurrently():
+    """Run all not completed jobs in current database, several at a time."""
+    _run_jobs_concurrently([job for job in mdb.jobs.values()
+                            if job.status != COMPLETED])
+    return
@@ -17,8 +17,25 @@ except:
     pass
 
 import ast
+import bisect
+import collections
+import hashlib
+import json
 import os
 import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Python 2 has no lzma module, look for its backport.
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
 from tools_submodule import filesystem_tools as ft
 
@@ -29,6 +46,34 @@ ELEMENT_TYPES = ['numLineElems',  'numMeshedRegions', 'numNodes',
                  'numTetBoundaryElems', 'numTetElems', 'numTriElems',
                  'numWedgeElems']
 
+# Maximum number of Odb objects kept opened by normalize_odb_object.
+MAX_OPENED_ODBS = 8
+
+# Odb paths opened by normalize_odb_object, least recently used first,
+# and their read-only flag.
+OPENED_ODBS = collections.OrderedDict()
+
+# Sorted session Odbs keys and sorted node sets keys of each Odb.
+SORTED_ODBS_KEYS = []
+SORTED_SETS_KEYS = {}
+
+# Reduction operators available while streaming output frames.
+REDUCTIONS = ['max', 'min', 'abs_max', 'time_of_peak', 'mean', 'rms',
+              'histogram']
+
+# Start of each array frame streamed by stream_arrays. Null byte never
+# appears in logged text, so frames can be told apart from it.
+FRAME_MAGIC = b'\x00ABQFRAME'
+
+# Extension of Odb archives written by archive_odbs function of
+# abaqus_outside module, and local cache folder and size in bytes of
+# Odbs restored from them.
+ODB_ARCHIVE_EXTENSION = '.xz'
+ODB_CACHE_FOLDER = os.environ.get(
+    'ABAQUS_ODB_CACHE', os.path.join(tempfile.gettempdir(),
+                                     'abaqus_odb_cache'))
+ODB_CACHE_MAX_BYTES = 50 * 2 ** 30
+
 
 def assign_2d_parts_properties(model_name, section_name,
                                first_letters=None):
@@ -92,6 +137,66 @@ def clean_parts_properties(model_name, first_letters=None):
             del part.sectionAssignments[0]
 
 
+def close_cached_odbs():
+    """Close all Odb objects opened by normalize_odb_object.
+
+    Odb objects opened by other means, for instance from the GUI, are
+    left untouched.
+
+    Returns
+    -------
+    None
+    """
+    for odb_key in list(OPENED_ODBS.keys()):
+        release_odb(odb_key)
+
+
+def evict_cached_odbs(cache_folder=None, max_bytes=None, keep=()):
+    """Remove least recently used Odbs of cache beyond its size.
+
+    Parameters
+    ----------
+    cache_folder : Path, optional
+        Cache folder. Default is ODB_CACHE_FOLDER.
+    max_bytes : int, optional
+        Cache size. Default is ODB_CACHE_MAX_BYTES.
+    keep : list of str, optional
+        Odb paths not to remove.
+
+    Returns
+    -------
+    None
+    """
+    cache_folder = cache_folder or ODB_CACHE_FOLDER
+    max_bytes = ODB_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    # Cached Odbs access time is set on each use, oldest one first.
+    # Partial files of ongoing restores are left out.
+    cached = []
+    for folder, _, files in os.walk(cache_folder):
+        for name in files:
+            if name.endswith('.part'):
+                continue
+            file_path = os.path.join(folder, name)
+            stat = os.stat(file_path)
+            cached.append((stat.st_atime, stat.st_size, file_path))
+    cached.sort()
+    total = sum(i[1] for i in cached)
+    for _, size, file_path in cached:
+        if total <= max_bytes:
+            break
+        if file_path in keep:
+            continue
+        try:
+            os.remove(file_path)
+            os.rmdir(os.path.dirname(file_path))
+        except OSError:
+            # Opened by another session, or folder not empty.
+            if os.path.exists(file_path):
+                continue
+        total -= size
+
+
 def export_parts_iges(model_name, output_path, first_letters=None):
     """Export parts in a model as iges files.
 
@@ -121,6 +226,114 @@ def export_parts_iges(model_name, output_path, first_letters=None):
                            flavor=STANDARD)
 
 
+def extract_set_field_output(odb, set_name, variable, step_names=None,
+                             position=None):
+    """Get field output values of a set for all frames of an Odb.
+
+    Frames of all steps are traversed only once, and values of every
+    node or element of the set are stacked into a single array.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+    variable : str
+        Field output key, such as 'U' or 'S'.
+    step_names : list of str, optional
+        Steps to read from. If not given, use all Odb steps.
+    position : SymbolicConstant, optional
+        If given, output position to extract values at, such as NODAL.
+
+    Returns
+    -------
+    labels : array
+        Mesh labels of each value location, shape (n_entities,).
+    times : array
+        Total time of each frame, shape (n_frames,).
+    values : array
+        Output values, shape (n_entities, n_frames, n_components).
+    """
+    # Stack frames values along second axis.
+    times, frames_values, labels = [], [], None
+    for time, labels, values in iterate_set_field_output(odb, set_name,
+                                                         variable, step_names,
+                                                         position):
+        times.append(time)
+        frames_values.append(values)
+    if not frames_values:
+        return np.array([]), np.array([]), np.zeros((0, 0, 0))
+    return np.array(labels), np.array(times), np.stack(frames_values, axis=1)
+
+
+def extract_set_history_output(odb, set_name, components, step_names=None):
+    """Get history output values of all nodes or elements of a set.
+
+    History regions of each step are traversed only once, selecting
+    those whose point belongs to the set.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+    components : list of str
+        History output keys, such as ['A1', 'A2'].
+    step_names : list of str, optional
+        Steps to read from. If not given, use all Odb steps.
+
+    Returns
+    -------
+    labels : array
+        Mesh labels of set entities, shape (n_entities,).
+    times : array
+        Total time of each history point, shape (n_frames,).
+    values : array
+        Output values, shape (n_entities, n_frames, n_components).
+    """
+    # Normalize input to Odb object and map set entities to rows.
+    odb = normalize_odb_object(odb)
+    rows, labels, point_attribute = get_set_points(get_odb_set(odb,
+                                                               set_name))
+
+    # Iterate trough steps and history regions, gathering set data.
+    if step_names is None:
+        step_names = odb.steps.keys()
+    times, steps_values = None, []
+    for step_name in step_names:
+        step = odb.steps[step_name]
+        step_values, step_times = {}, None
+        for region in step.historyRegions.values():
+            point = getattr(region.point, point_attribute, None)
+            if point is None:
+                continue
+            row = rows.get((point.instanceName, point.label))
+            if (row is None
+                    or components[0] not in region.historyOutputs.keys()):
+                continue
+            data = [np.array(region.historyOutputs[i].data)
+                    for i in components]
+            step_times = data[0][:, 0] + step.totalTime
+            step_values[row] = np.stack([i[:, 1] for i in data], axis=-1)
+        if step_times is None:
+            continue
+
+        # Missing regions are filled with NaN values.
+        values = np.full((len(rows), len(step_times), len(components)),
+                         np.nan)
+        for row, row_values in step_values.items():
+            values[row] = row_values
+        steps_values.append(values)
+        times = (step_times if times is None
+                 else np.concatenate([times, step_times]))
+    if not steps_values:
+        return labels, np.array([]), np.zeros((len(rows), 0,
+                                               len(components)))
+    return labels, times, np.concatenate(steps_values, axis=1)
+
+
 def extract_set_mesh_nodes(odb, set_name):
     """Get mesh nodes labels and coordinates of a set of points.
 
@@ -153,6 +366,71 @@ def extract_set_mesh_nodes(odb, set_name):
     return output
 
 
+def finish_reductions(state, reductions):
+    """Get final reduced arrays from running reductions state.
+
+    Parameters
+    ----------
+    state : dict
+        Running reductions, as updated by update_reductions.
+    reductions : list of str
+        Operators to return, from REDUCTIONS.
+
+    Returns
+    -------
+    dict
+        Reduction names : reduced arrays pairs. If histogram is
+        requested, bins edges are included as 'histogram_bins'.
+    """
+    frames_number = state['frames_number']
+    output = dict(state)
+    output['mean'] = state['sum'] / frames_number
+    output['rms'] = np.sqrt(state['sum_squares'] / frames_number)
+    return {k: v for k, v in output.items()
+            if k in reductions or (k == 'histogram_bins'
+                                   and 'histogram' in reductions)}
+
+
+def get_bulk_values(field, region, position=None):
+    """Get values of a field output in a region from bulk data blocks.
+
+    No per-value Python objects are created, and values of all the
+    instances of the region are joined.
+
+    Parameters
+    ----------
+    field : FieldOutput object
+        Field output of a frame.
+    region : OdbSet object
+        Set of nodes or elements to get values of.
+    position : SymbolicConstant, optional
+        If given, output position to extract values at, such as NODAL.
+
+    Returns
+    -------
+    labels : array
+        Mesh labels of each value location, shape (n_entities,). None
+        if there are no values in region.
+    values : array
+        Output values, shape (n_entities, n_components). None if there
+        are no values in region.
+    """
+    if position is None:
+        subset = field.getSubset(region=region)
+    else:
+        subset = field.getSubset(region=region, position=position)
+    labels, values = [], []
+    for block in subset.bulkDataBlocks:
+        block_labels = block.nodeLabels
+        if block_labels is None or not len(block_labels):
+            block_labels = block.elementLabels
+        labels.append(np.asarray(block_labels))
+        values.append(np.asarray(block.data).reshape(len(block_labels), -1))
+    if not values:
+        return None, None
+    return np.concatenate(labels), np.concatenate(values)
+
+
 def get_folder_calc_time(odbs_folder, show=True, recursive=False,
                          close_odbs=True):
     """Get job calculation time from all Odb objects in folder.
@@ -166,7 +444,7 @@ def get_folder_calc_time(odbs_folder, show=True, recursive=False,
     recursive : bool, optional
         If True, list Odb files recursively, including subfolders.
     close_odbs : bool, optional
-        If True, close current session Odb objects at the end of script.
+        If True, close Odb objects opened by this function at the end.
 
     Returns
     -------
@@ -186,10 +464,9 @@ def get_folder_calc_time(odbs_folder, show=True, recursive=False,
         odb = normalize_odb_object(job_key)
         output[job_key] = get_odb_calc_time(odb, show)
 
-    # Optionally, close all opened Odb objects in current session.
+    # Optionally, close Odb objects opened during the process.
     if close_odbs:
-        from abaqusMacros import close_all_odbs
-        close_all_odbs()
+        close_cached_odbs()
     return output
 
 
@@ -223,6 +500,109 @@ def get_odb_calc_time(odb, show=True):
     return output
 
 
+def get_odb_set(odb, set_name):
+    """Get a node or element set from a Odb object by its name.
+
+    Assembly level sets are searched first, then instance level sets.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+
+    Returns
+    -------
+    OdbSet object
+        Set of nodes or elements.
+    """
+    # Look for set in assembly and then in every instance repository.
+    odb = normalize_odb_object(odb)
+    assembly = odb.rootAssembly
+    for container in [assembly] + list(assembly.instances.values()):
+        for sets in (container.nodeSets, container.elementSets):
+            if set_name in sets.keys():
+                return sets[set_name]
+    raise KeyError('Set ' + set_name + ' not found in ' + odb.name)
+
+
+def get_set_points(odb_set):
+    """Map nodes or elements of a set to rows of output arrays.
+
+    Parameters
+    ----------
+    odb_set : OdbSet object
+        Set of nodes or elements.
+
+    Returns
+    -------
+    rows : dict
+        (instance name, label) tuples : row number pairs.
+    labels : array
+        Mesh labels of set entities, shape (n_entities,).
+    point_attribute : str
+        'node' or 'element', attribute of history points to match.
+    """
+    if len(odb_set.nodes):
+        entities, point_attribute = odb_set.nodes, 'node'
+    else:
+        entities, point_attribute = odb_set.elements, 'element'
+    if entities and not hasattr(entities[0], 'label'):
+        entities = [i for instance_entities in entities
+                    for i in instance_entities]
+    rows = {(i.instanceName, i.label): n for n, i in enumerate(entities)}
+    return rows, np.array([i.label for i in entities]), point_attribute
+
+
+def iterate_set_field_output(odb, set_name, variable, step_names=None,
+                             position=None):
+    """Yield field output values of a set, frame by frame.
+
+    Values are read from bulk data blocks, so no per-value Python
+    objects are created.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+    variable : str
+        Field output key, such as 'U' or 'S'.
+    step_names : list of str, optional
+        Steps to read from. If not given, use all Odb steps.
+    position : SymbolicConstant, optional
+        If given, output position to extract values at, such as NODAL.
+
+    Yields
+    ------
+    time : float
+        Total time of frame.
+    labels : array
+        Mesh labels of each value location, shape (n_entities,).
+    values : array
+        Output values, shape (n_entities, n_components).
+    """
+    # Normalize input to Odb object and get set region.
+    odb = normalize_odb_object(odb)
+    region = get_odb_set(odb, set_name)
+    if step_names is None:
+        step_names = odb.steps.keys()
+
+    # Iterate trough steps and frames, reading set subset only.
+    for step_name in step_names:
+        step = odb.steps[step_name]
+        for frame in step.frames:
+            if variable not in frame.fieldOutputs.keys():
+                continue
+            labels, values = get_bulk_values(frame.fieldOutputs[variable],
+                                             region, position)
+            if values is None:
+                continue
+            yield step.totalTime + frame.frameValue, labels, values
+
+
 def log_message(input_string):
     """Set an output message to pass to Popen subprocess stdout method.
 
@@ -238,33 +618,63 @@ def log_message(input_string):
     print >>sys.__stdout__, input_string
 
 
-def normalize_odb_object(odb_ish):
+def normalize_odb_object(odb_ish, read_only=True):
     """Return a odb object from current session.
 
     If input is already a Odb object, return it. If it is a string,
     look for corresponding object within opened Odbs, if none is find,
-    try to open it.
+    try to open it. Archived Odbs are restored into local cache first,
+    by restore_archived_odb.
+
+    Odb objects opened by this function are kept in a least recently
+    used cache. When more than MAX_OPENED_ODBS are opened, the least
+    recently used one is closed.
 
     Parameters
     ----------
     odb_ish : Odb object or string-like Path
         Odb object identifier.
+    read_only : bool, optional
+        If False, open Odb in read-write mode, reopening it if it was
+        opened as read-only by this function.
 
     Returns
     -------
     Odb object
         Opened Odb object from current session.
     """
-    # Verify is odb is already opened, if not, try to it.
-    if isinstance(odb_ish, str):
-        try:
-            odb = session.odbs[odb_ish]
-        except KeyError:
-            odb = session.openOdb(odb_ish, readOnly=False)
-
-    # If neither could be done, just return its reference.
-    else:
-        odb = odb_ish
+    # If input is not a string, just return its reference.
+    if not isinstance(odb_ish, str):
+        return odb_ish
+
+    # Restore archived Odb, if input is one or its original path.
+    if odb_ish not in session.odbs.keys() and (
+            odb_ish.endswith(ODB_ARCHIVE_EXTENSION)
+            or not os.path.exists(odb_ish)
+            and os.path.exists(odb_ish + ODB_ARCHIVE_EXTENSION)):
+        odb_ish = restore_archived_odb(odb_ish)
+
+    # Reopen Odb cached as read-only if writing is required.
+    cached = odb_ish in OPENED_ODBS
+    if cached and OPENED_ODBS[odb_ish] and not read_only:
+        release_odb(odb_ish)
+        cached = False
+
+    # Verify if odb is already opened, if not, open it and cache it.
+    if odb_ish in session.odbs.keys():
+        odb = session.odbs[odb_ish]
+        if cached:
+            OPENED_ODBS[odb_ish] = OPENED_ODBS.pop(odb_ish)
+        return odb
+    OPENED_ODBS.pop(odb_ish, None)
+    odb = session.openOdb(odb_ish, readOnly=read_only)
+    OPENED_ODBS[odb_ish] = read_only
+    if odb_ish not in SORTED_ODBS_KEYS:
+        bisect.insort(SORTED_ODBS_KEYS, odb_ish)
+
+    # Close least recently used Odb objects beyond cache size.
+    while len(OPENED_ODBS) > MAX_OPENED_ODBS:
+        release_odb(next(iter(OPENED_ODBS)))
     return odb
 
 
@@ -286,26 +696,120 @@ def print_model_mesh_stats(model_name, total_stats=False):
     # element type.
     print('*****', '\nModel:', model_name, '\n')
     model = mdb.models[model_name]
-    for inst_key, instance in model.rootAssembly.instances.items():
+    instances = model.rootAssembly.instances
+    for inst_key, instance in instances.items():
         print('\nInstance:', inst_key)
-        try:
-            for element_type in ELEMENT_TYPES:
-                number_of_elements = eval('stats.' + element_type)
-                if number_of_elements:
-                    print(element_type, ':', number_of_elements)
-        except AttributeError:
-            pass
+        stats = model.rootAssembly.getMeshStats(regions=(instance,))
+        for element_type in ELEMENT_TYPES:
+            number_of_elements = getattr(stats, element_type, 0)
+            if number_of_elements:
+                print(element_type, ':', number_of_elements)
 
     # Optionally, show whole model mesh stats.
     if total_stats:
         print('\n--- TOTAL ---')
-        try:
-            for element_type in ELEMENT_TYPES:
-                number_of_elements = eval('tot_stats.' + element_type)
-                if number_of_elements:
-                    print(element_type, ':', number_of_elements)
-        except AttributeError:
-            pass
+        tot_stats = model.rootAssembly.getMeshStats(
+            regions=tuple(instances.values()))
+        for element_type in ELEMENT_TYPES:
+            number_of_elements = getattr(tot_stats, element_type, 0)
+            if number_of_elements:
+                print(element_type, ':', number_of_elements)
+
+
+def reduce_set_output(odb, set_name, variable, reductions=None,
+                      histogram_bins=None, history=False, step_names=None,
+                      position=None):
+    """Reduce output of all nodes or elements of a set over all frames.
+
+    Running reductions are updated frame by frame, so only arrays of
+    shape (n_entities, n_components) are kept in memory, regardless of
+    the number of frames.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+    variable : str or list of str
+        Field output key, or history output keys if `history` is True.
+    reductions : list of str, optional
+        Operators to evaluate, from REDUCTIONS. If not given, all of
+        them but 'histogram' are evaluated.
+    histogram_bins : array-like, optional
+        Histogram bins edges. Required for 'histogram' reduction.
+    history : bool, optional
+        If True, reduce history output instead of field output.
+    step_names : list of str, optional
+        Steps to read from. If not given, use all Odb steps.
+    position : SymbolicConstant, optional
+        If given, field output position to extract values at.
+
+    Returns
+    -------
+    dict
+        Reduction names : reduced arrays pairs, plus 'labels' array.
+        Histogram counts have shape (n_entities, n_components, n_bins).
+    """
+    # Normalize reductions list and verify operators.
+    if reductions is None:
+        reductions = [i for i in REDUCTIONS if i != 'histogram']
+    for reduction in reductions:
+        if reduction not in REDUCTIONS:
+            raise ValueError('Unknown reduction ' + str(reduction))
+    if 'histogram' in reductions and histogram_bins is None:
+        raise ValueError('histogram_bins required for histogram reduction')
+
+    # Set frames source, streaming field output or history arrays.
+    if history:
+        if isinstance(variable, str):
+            variable = [variable]
+        labels, times, history_values = extract_set_history_output(
+            odb, set_name, variable, step_names)
+        frames = ((time, labels, history_values[:, n])
+                  for n, time in enumerate(times))
+    else:
+        frames = iterate_set_field_output(odb, set_name, variable,
+                                          step_names, position)
+
+    # Update running reductions frame by frame.
+    state, labels = {}, np.array([])
+    if 'histogram' not in reductions:
+        histogram_bins = None
+    for time, labels, values in frames:
+        update_reductions(state, time, values, histogram_bins)
+
+    # Finish mean and rms reductions and filter requested ones.
+    if not state:
+        return {'labels': labels}
+    output = finish_reductions(state, reductions)
+    output['labels'] = np.asarray(labels)
+    return output
+
+
+def release_odb(odb_ish):
+    """Close a Odb object and remove it from normalize_odb_object cache.
+
+    Parameters
+    ----------
+    odb_ish : Odb object or string-like Path
+        Odb object identifier.
+
+    Returns
+    -------
+    None
+    """
+    # Remove Odb from cache and sorted keys indexes.
+    odb_key = odb_ish if isinstance(odb_ish, str) else odb_ish.name
+    OPENED_ODBS.pop(odb_key, None)
+    SORTED_SETS_KEYS.pop(odb_key, None)
+    position = bisect.bisect_left(SORTED_ODBS_KEYS, odb_key)
+    if SORTED_ODBS_KEYS[position:position + 1] == [odb_key]:
+        del SORTED_ODBS_KEYS[position]
+
+    # Close Odb if it is still opened.
+    if odb_key in session.odbs.keys():
+        session.odbs[odb_key].close()
 
 
 def rename_model(model_name, new_name):
@@ -346,6 +850,65 @@ def rename_set(set_name, new_set_name):
     return
 
 
+def restore_archived_odb(odb_path, cache_folder=None, max_bytes=None):
+    """Decompress an archived Odb into local cache, if not there yet.
+
+    Odbs are restored to a sub-folder of cache named after their
+    checksum, keeping their file name, and verified against it. Least
+    recently used Odbs are removed when cache grows beyond its size.
+
+    Parameters
+    ----------
+    odb_path : Path
+        Odb archive path, or path of archived Odb.
+    cache_folder : Path, optional
+        Cache folder. Default is ODB_CACHE_FOLDER.
+    max_bytes : int, optional
+        Cache size. Default is ODB_CACHE_MAX_BYTES.
+
+    Returns
+    -------
+    str
+        Path of restored Odb.
+    """
+    archive_path = str(odb_path)
+    if not archive_path.endswith(ODB_ARCHIVE_EXTENSION):
+        archive_path += ODB_ARCHIVE_EXTENSION
+    with open(archive_path + '.json') as file:
+        metadata = json.load(file)
+    cached_folder = os.path.join(cache_folder or ODB_CACHE_FOLDER,
+                                 metadata['sha256'][:16])
+    cached_path = os.path.join(cached_folder, metadata['name'])
+
+    # Decompress archive, unless a complete copy is cached.
+    if (not os.path.exists(cached_path)
+            or os.path.getsize(cached_path) != metadata['size']):
+        if lzma is None:
+            raise IOError('No lzma module to restore ' + archive_path +
+                          ', restore it with abaqus_outside.restore_odb')
+        if not os.path.exists(cached_folder):
+            os.makedirs(cached_folder)
+        digest = hashlib.sha256()
+        decompressor = lzma.LZMADecompressor()
+        with open(archive_path, 'rb') as source, \
+                open(cached_path + '.part', 'wb') as target:
+            for chunk in iter(lambda: source.read(2 ** 24), b''):
+                data = decompressor.decompress(chunk)
+                digest.update(data)
+                target.write(data)
+        if digest.hexdigest() != metadata['sha256']:
+            os.remove(cached_path + '.part')
+            raise IOError('Checksum mismatch restoring ' + archive_path)
+        if os.path.exists(cached_path):
+            os.remove(cached_path)
+        os.rename(cached_path + '.part', cached_path)
+
+    # Mark Odb as used, keeping its original modification time.
+    os.utime(cached_path, (time.time(), metadata['mtime_ns'] / 1e9))
+    evict_cached_odbs(cache_folder, max_bytes, keep=[cached_path])
+    return cached_path
+
+
 def retrieve_odb_name(number, show_all=False):
     """Get Odb name from session Odbs list, depending on its position.
 
@@ -365,9 +928,8 @@ def retrieve_odb_name(number, show_all=False):
     str
         Name of opened Odb object from current session.
     """
-    # Get list of opened Odbs keys, sort it and select one by position.
-    keys = session.odbs.keys()
-    keys = sorted(keys)
+    # Get sorted list of opened Odbs keys and select one by position.
+    keys = sorted_session_odbs_keys()
     selected_key = keys[number]
 
     # Print list of opened Odbs.
@@ -397,10 +959,12 @@ def retrieve_odb_set_name(odb, number, show_all=False):
     str
         Name of set name in a Odb object from current session.
     """
-    # Get list of Odb sets keys, sort it and select one by position.
+    # Get list of Odb sets keys, sorted only once per Odb, and select
+    # one by position.
     odb = normalize_odb_object(odb)
-    keys = odb.rootAssembly.nodeSets.keys()
-    keys = sorted(keys)
+    if odb.name not in SORTED_SETS_KEYS:
+        SORTED_SETS_KEYS[odb.name] = sorted(odb.rootAssembly.nodeSets.keys())
+    keys = SORTED_SETS_KEYS[odb.name]
     selected_key = keys[number]
 
     # Print list of available node sets.
@@ -409,6 +973,365 @@ def retrieve_odb_set_name(odb, number, show_all=False):
     return selected_key
 
 
+def run_extraction_plan(odb, plan):
+    """Extract all outputs of an extraction plan in a single Odb pass.
+
+    History regions of each step and frames of each step are traversed
+    only once, reading every requested output of the plan from them,
+    instead of once per output.
+
+    Each plan entry is a dict with keys 'name' (output arrays prefix),
+    'output' ('field' or 'history'), 'set' (node or element set name),
+    'variable' (field output key, or list of history output keys) and
+    optionally 'steps', 'position' (such as 'NODAL'), 'reductions' and
+    'histogram_bins', as built by compile_extraction_plan function of
+    abaqus_outside module.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    plan : list of dict
+        Outputs to extract.
+
+    Returns
+    -------
+    dict
+        Output arrays. Without reductions, '<name>' holds values, shape
+        (n_entities, n_frames, n_components), and '<name>_times' holds
+        frames times. With reductions, '<name>_<reduction>' holds each
+        reduced array. In both cases, '<name>_labels' holds set labels.
+    """
+    def add_values(request, times, labels, values):
+        """Add values of some frames to request output or reductions."""
+        request['labels'] = labels
+        if not request.get('reductions'):
+            request['times'].append(times)
+            request['values'].append(values)
+            return
+        bins = None
+        if 'histogram' in request['reductions']:
+            bins = request['histogram_bins']
+        for n, time in enumerate(times):
+            update_reductions(request['state'], time, values[:, n], bins)
+
+    # Prepare requests regions and accumulators.
+    odb = normalize_odb_object(odb)
+    requests = []
+    for entry in plan:
+        request = dict(entry, times=[], values=[], state={},
+                       labels=np.array([]))
+        request['region'] = get_odb_set(odb, entry['set'])
+        request['steps'] = entry.get('steps') or odb.steps.keys()
+        if entry.get('position'):
+            request['position'] = globals()[entry['position']]
+        if entry['output'] == 'history':
+            request['rows'], request['labels'], request['point'] = (
+                get_set_points(request['region']))
+        requests.append(request)
+
+    # Iterate trough steps, reading history regions and frames once.
+    for step_name in odb.steps.keys():
+        step = odb.steps[step_name]
+        step_requests = [i for i in requests if step_name in i['steps']]
+        history_requests = [i for i in step_requests
+                            if i['output'] == 'history']
+        field_requests = [i for i in step_requests
+                          if i['output'] == 'field']
+
+        # Gather history outputs of all history requests.
+        if history_requests:
+            step_values = [{} for _ in history_requests]
+            step_times = [None for _ in history_requests]
+            for region in step.historyRegions.values():
+                outputs_keys = region.historyOutputs.keys()
+                for n, request in enumerate(history_requests):
+                    point = getattr(region.point, request['point'], None)
+                    if point is None or request['variable'][0] not in \
+                            outputs_keys:
+                        continue
+                    row = request['rows'].get((point.instanceName,
+                                               point.label))
+                    if row is None:
+                        continue
+                    data = [np.array(region.historyOutputs[i].data)
+                            for i in request['variable']]
+                    step_times[n] = data[0][:, 0] + step.totalTime
+                    step_values[n][row] = np.stack([i[:, 1] for i in data],
+                                                   axis=-1)
+
+            # Missing regions are filled with NaN values.
+            for n, request in enumerate(history_requests):
+                if step_times[n] is None:
+                    continue
+                values = np.full((len(request['rows']), len(step_times[n]),
+                                  len(request['variable'])), np.nan)
+                for row, row_values in step_values[n].items():
+                    values[row] = row_values
+                add_values(request, step_times[n], request['labels'], values)
+
+        # Read field outputs of all field requests, frame by frame.
+        if field_requests:
+            for frame in step.frames:
+                outputs_keys = frame.fieldOutputs.keys()
+                time = step.totalTime + frame.frameValue
+                for request in field_requests:
+                    if request['variable'] not in outputs_keys:
+                        continue
+                    labels, values = get_bulk_values(
+                        frame.fieldOutputs[request['variable']],
+                        request['region'], request.get('position'))
+                    if values is not None:
+                        add_values(request, [time], labels,
+                                   values[:, np.newaxis])
+
+    # Build output arrays of each request.
+    output = {}
+    for request in requests:
+        name = request['name']
+        output[name + '_labels'] = np.asarray(request['labels'])
+        if request.get('reductions'):
+            if request['state']:
+                reduced = finish_reductions(request['state'],
+                                            request['reductions'])
+                output.update((name + '_' + k, v)
+                              for k, v in reduced.items())
+        elif request['values']:
+            output[name] = np.concatenate(request['values'], axis=1)
+            output[name + '_times'] = np.concatenate(request['times'])
+        else:
+            output[name] = np.zeros((0, 0, 0))
+            output[name + '_times'] = np.array([])
+    return output
+
+
+def save_set_output(odb, set_name, variable, output_folder,
+                    history=False, step_names=None, position=None,
+                    reductions=None, histogram_bins=None):
+    """Save output of all nodes or elements of a set in a npz file.
+
+    Output file is named after the Odb, set and variable, and contains
+    'labels', 'times' and 'values' arrays, as returned by
+    extract_set_field_output or extract_set_history_output. If
+    reductions are given, only reduced arrays returned by
+    reduce_set_output are saved instead.
+
+    Parameters
+    ----------
+    odb : Odb object or string-like Path
+        Odb object identifier.
+    set_name : str
+        Name of node or element set of interest.
+    variable : str or list of str
+        Field output key, or history output keys if `history` is True.
+    output_folder : Path
+        Folder to save npz file to.
+    history : bool, optional
+        If True, extract history output instead of field output.
+    step_names : list of str, optional
+        Steps to read from. If not given, use all Odb steps.
+    position : SymbolicConstant, optional
+        If given, field output position to extract values at.
+    reductions : list of str, optional
+        If given, operators from REDUCTIONS to save instead of values.
+    histogram_bins : array-like, optional
+        Histogram bins edges, for 'histogram' reduction.
+
+    Returns
+    -------
+    str
+        Path of output npz file.
+    """
+    # Extract or reduce set output with one traversal of Odb frames.
+    odb = normalize_odb_object(odb)
+    if history and isinstance(variable, str):
+        variable = [variable]
+    if reductions:
+        arrays = reduce_set_output(odb, set_name, variable, reductions,
+                                   histogram_bins, history, step_names,
+                                   position)
+    elif history:
+        labels, times, values = extract_set_history_output(
+            odb, set_name, variable, step_names)
+        arrays = {'labels': labels, 'times': times, 'values': values}
+    else:
+        labels, times, values = extract_set_field_output(
+            odb, set_name, variable, step_names, position)
+        arrays = {'labels': labels, 'times': times, 'values': values}
+    variable_name = '_'.join(variable) if history else variable
+
+    # Save compressed arrays, named after Odb, set and variable.
+    odb_name = os.path.splitext(os.path.basename(odb.name))[0]
+    npz_name = '-'.join([odb_name, set_name, variable_name]) + '.npz'
+    npz_path = os.path.join(output_folder, npz_name)
+    np.savez_compressed(npz_path, **arrays)
+    return npz_path
+
+
+def sorted_session_odbs_keys():
+    """Get alphabetically sorted keys of session opened Odb objects.
+
+    Sorted keys are kept in an index, updated by normalize_odb_object
+    and release_odb. It is only rebuilt if session Odbs were opened or
+    closed by other means.
+
+    Returns
+    -------
+    list of str
+        Copy of sorted keys of session Odbs.
+    """
+    # Rebuild index if its keys do not match session Odbs.
+    session_keys = set(session.odbs.keys())
+    if session_keys != set(SORTED_ODBS_KEYS):
+        SORTED_ODBS_KEYS[:] = sorted(session_keys)
+    return list(SORTED_ODBS_KEYS)
+
+
+def stream_arrays(model, arrays, stream=None):
+    """Write arrays as binary frames to Popen subprocess stdout.
+
+    Each frame is FRAME_MAGIC, a json header line with model name,
+    variable name, dtype and shape, and the raw array bytes in C
+    order. Frames are parsed by iterate_output_frames of
+    abaqus_outside module, so extracted data reach the outside writer
+    without intermediate npz files.
+
+    Parameters
+    ----------
+    model : str
+        Name of model arrays belong to, such as its Odb name.
+    arrays : dict
+        Variable names : arrays or array-like objects, such as XYData.
+    stream : file, optional
+        Binary stream to write to. Default is sys.__stdout__.
+
+    Returns
+    -------
+    None
+    """
+    # Set stdout to binary mode in Windows, so bytes are not modified.
+    if stream is None:
+        stream = sys.__stdout__
+        if sys.platform == 'win32':
+            import msvcrt
+            msvcrt.setmode(stream.fileno(), os.O_BINARY)
+    stream = getattr(stream, 'buffer', stream)
+
+    # Write a frame per array and flush them.
+    for variable, array in arrays.items():
+        array = np.ascontiguousarray(np.asarray(array, dtype=float))
+        header = json.dumps({'model': model, 'variable': variable,
+                             'dtype': array.dtype.str,
+                             'shape': list(array.shape)})
+        stream.write(FRAME_MAGIC + header.encode('utf-8') + b'\n')
+        stream.write(array.tobytes() if hasattr(array, 'tobytes')
+                     else array.tostring())
+    stream.flush()
+
+
+def update_reductions(state, time, values, histogram_bins=None):
+    """Update running reductions with output values of a frame.
+
+    Running reductions are kept in a state dict, initialized with the
+    first frame, so only arrays of shape (n_entities, n_components)
+    are kept in memory, regardless of the number of frames.
+
+    Parameters
+    ----------
+    state : dict
+        Running reductions, empty before the first frame.
+    time : float
+        Total time of frame.
+    values : array
+        Output values of frame, shape (n_entities, n_components).
+    histogram_bins : array-like, optional
+        Histogram bins edges. If given, histogram counts are updated.
+
+    Returns
+    -------
+    None
+    """
+    # Initialize running reductions with first frame.
+    if not state:
+        shape = values.shape
+        state['frames_number'] = 0
+        state['max'] = np.full(shape, -np.inf)
+        state['min'] = np.full(shape, np.inf)
+        state['abs_max'] = np.zeros(shape)
+        state['time_of_peak'] = np.full(shape, time, dtype=float)
+        state['sum'] = np.zeros(shape)
+        state['sum_squares'] = np.zeros(shape)
+        if histogram_bins is not None:
+            edges = np.asarray(histogram_bins, dtype=float)
+            state['histogram_bins'] = edges
+            state['histogram'] = np.zeros(shape + (len(edges) - 1,),
+                                          dtype=np.int64)
+    state['frames_number'] += 1
+    np.maximum(state['max'], values, out=state['max'])
+    np.minimum(state['min'], values, out=state['min'])
+    abs_values = np.abs(values)
+    peak = abs_values > state['abs_max']
+    state['abs_max'][peak] = abs_values[peak]
+    state['time_of_peak'][peak] = time
+    state['sum'] += values
+    state['sum_squares'] += values ** 2
+
+    # Count values falling inside each histogram bin.
+    if histogram_bins is not None:
+        edges, counts = state['histogram_bins'], state['histogram']
+        bins = np.searchsorted(edges, values, side='right') - 1
+        bins[values == edges[-1]] = len(edges) - 2
+        inside = (bins >= 0) & (bins < len(edges) - 1)
+        flat_index = (np.arange(values.size).reshape(values.shape)[inside]
+                      * (len(edges) - 1) + bins[inside])
+        counts += np.bincount(flat_index,
+                              minlength=counts.size).reshape(counts.shape)
+
+
+def upgrade_odb_file(odb_path):
+    """Upgrade version of a Odb file, keeping old version file.
+
+    The Odb is upgraded to a temporary file named after it, which is
+    verified before swapping: the original file is renamed with an
+    '-old' suffix, replacing any older one, and the upgraded one takes
+    its place.
+
+    Parameters
+    ----------
+    odb_path : str
+        Path of Odb file to upgrade.
+
+    Returns
+    -------
+    bool
+        True if Odb was upgraded, False if no upgrade was required.
+    """
+    if not odbAccess.isUpgradeRequiredForOdb(odb_path):
+        return False
+
+    # Upgrade to a per-file temporary name, removing leftovers.
+    stem = os.path.splitext(odb_path)[0]
+    temp_name = stem + '-upgrading.odb'
+    old_name = stem + '-old.odb'
+    if os.path.exists(temp_name):
+        os.remove(temp_name)
+    session.upgradeOdb(odb_path, temp_name)
+
+    # Verify upgraded file can be opened and contains steps.
+    upgraded = odbAccess.openOdb(temp_name, readOnly=True)
+    steps_number = len(upgraded.steps)
+    upgraded.close()
+    if odbAccess.isUpgradeRequiredForOdb(temp_name) or not steps_number:
+        raise IOError('Upgrade verification failed for ' + odb_path)
+
+    # Rename old and new Odb files.
+    if os.path.exists(old_name):
+        os.remove(old_name)
+    os.rename(odb_path, old_name)
+    os.rename(temp_name, odb_path)
+    return True
+
+
 def upgrade_odbs_folder(odbs_folder, recursive=False, print_every=1):
     """Upgrade version of all Odb objects in a folder.
 
@@ -432,8 +1355,7 @@ def upgrade_odbs_folder(odbs_folder, recursive=False, print_every=1):
     print(len(odb_list), 'Odb objects found', len(upgradable_odb_list),
           'require upgrade')
 
-    # Set temporary names and iterate over old versioned Odbs.
-    temp_name = os.path.join(odbs_folder, 'temp_odb_name.odb')
+    # Iterate over old versioned Odbs.
     for job_number, job_key in enumerate(upgradable_odb_list):
 
         # Optionally, report less times.
@@ -442,10 +1364,41 @@ def upgrade_odbs_folder(odbs_folder, recursive=False, print_every=1):
                   job_number + 1, 'of', len(upgradable_odb_list))
 
         # Upgrade and rename new and old Odb files.
-        new_name = job_key
-        old_name = job_key.replace('.odb', '-old.odb')
-        session.upgradeOdb(job_key, temp_name)
-        os.rename(job_key, old_name)
-        os.rename(temp_name, new_name)
+        upgrade_odb_file(job_key)
     print('DONE')
     return
+
+
+def upgrade_odbs_list(odb_list, journal_path):
+    """Upgrade version of a list of Odb files, journaling progress.
+
+    Intended to be run by each of the Abaqus worker processes launched
+    by upgrade_odbs_parallel function of abaqus_outside module. After
+    each file, a '<STATUS>\t<path>' line is appended to the journal,
+    with UPGRADED, CURRENT or FAILED as status.
+
+    Parameters
+    ----------
+    odb_list : list of str
+        Paths of Odb files to upgrade.
+    journal_path : str
+        Text file to append progress lines to.
+
+    Returns
+    -------
+    None
+    """
+    for job_number, job_key in enumerate(odb_list):
+        log_message('Processing ' + job_key + ' ' + str(job_number + 1) +
+                    ' of ' + str(len(odb_list)))
+        try:
+            status = 'UPGRADED' if upgrade_odb_file(job_key) else 'CURRENT'
+        except Exception as error:
+            log_message('FAILED ' + job_key + ': ' + str(error))
+            status = 'FAILED'
+
+        # Write journal line to disk before going on.
+        with open(journal_path, 'a') as journal:
+            journal.write(status + '\t' + job_key + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
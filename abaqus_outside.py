@@ -6,12 +6,26 @@ https://github.com/rodrigo1392
 
 """
 
+import collections
+import concurrent.futures
+import h5py
+import hashlib
+import json
+import lzma
+import mmap
 import multiprocessing
 import numpy as np
+import os
 import pandas as pd
 import pprint
+import re
+import socket
 import subprocess
 import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
 
 from tools_submodule import databases_tools as db
 from tools_submodule import filesystem_tools as ft
@@ -19,9 +33,580 @@ from tools_submodule import strings_tools as st
 from tools_submodule import math_tools as mt
 from pathlib import Path
 
+import file_catalog as fc
+import sensitivity as sa
+import study_catalog as sc
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 
 INP_KEYWORDS = {'ALPHA_DYN': 'Dynamic,alpha', 'E': 'Elastic'}
 
+# Abaqus solver text output files and patterns to harvest job data from.
+JOB_TEXT_EXTENSIONS = ['.dat', '.msg', '.sta']
+JOB_TIME_PATTERNS = {'userTime': rb'USER TIME \(SEC\)\s*=\s*([\d.E+-]+)',
+                     'systemTime': rb'SYSTEM TIME \(SEC\)\s*=\s*([\d.E+-]+)',
+                     'wallclockTime':
+                         rb'WALLCLOCK TIME \(SEC\)\s*=\s*([\d.E+-]+)'}
+MEMORY_ESTIMATE_PATTERN = (rb'M E M O R Y   E S T I M A T E.*?\n\s*1\s+'
+                           rb'[\d.E+-]+\s+([\d.]+)\s+([\d.]+)')
+STA_INCREMENT_PATTERN = re.compile(r'^\s*\d+\s+\d+\s+(\d+)(U?)\s',
+                                   re.MULTILINE)
+
+# Sub-folders of a file-based jobs queue, one per entry state. Claimed
+# entries names get a '@<host>-<pid>' suffix of their worker.
+QUEUE_STATES = ['pending', 'claimed', 'done', 'failed']
+
+# Degrees of freedom per node by element type prefix, and default
+# degrees of freedom per cpu for job sizing without calibration data.
+ELEMENT_DOFS_PER_NODE = {'AC2D': 1, 'AC3D': 1, 'B2': 3, 'B3': 6, 'C3D': 3,
+                         'CAX': 2, 'CPE': 2, 'CPS': 2, 'DC': 1, 'M3D': 3,
+                         'S': 6, 'T2D': 2, 'T3D': 3}
+DOFS_PER_CPU = 50000
+
+# Keys of extraction plan outputs and their default values.
+EXTRACTION_PLAN_KEYS = {'name': None, 'output': 'field', 'set': None,
+                        'variable': None, 'steps': None, 'position': None,
+                        'reductions': [], 'histogram_bins': None}
+
+# Name of metadata entry of amplitude libraries npz files.
+AMPLITUDE_METADATA_KEY = '__metadata__'
+
+# Start of binary array frames, as written by stream_arrays function of
+# abaqus_inside module.
+ARRAY_FRAME_MAGIC = b'\x00ABQFRAME'
+
+# Files of an Abaqus job needed by other jobs to restart from it.
+RESTART_EXTENSIONS = ['.res', '.mdl', '.stt', '.prt', '.odb', '.sim']
+
+# Extension of Odb archives, and local cache folder and size in bytes
+# of Odbs restored from them. Same as in abaqus_inside module.
+ODB_ARCHIVE_EXTENSION = '.xz'
+ODB_CACHE_FOLDER = os.environ.get(
+    'ABAQUS_ODB_CACHE', os.path.join(tempfile.gettempdir(),
+                                     'abaqus_odb_cache'))
+ODB_CACHE_MAX_BYTES = 50 * 2 ** 30
+
+# Known causes of failed jobs, in priority order, and patterns of their
+# messages in log, msg, dat and sta files.
+FAILURE_PATTERNS = collections.OrderedDict([
+    ('license', rb'(?m)^[^\n]*error[^\n]*licen[sc][^\n]*(?:not available|'
+                rb'unavailable|denied|queued|exceeded)|^[^\n]*licensing '
+                rb'error'),
+    ('disk_full', rb'no space left on device|disk (?:is )?full|'
+                  rb'insufficient disk space'),
+    ('memory', rb'out of memory|insufficient memory|memory allocation '
+               rb'(?:error|failed)|unable to allocate|bad_alloc'),
+    ('distortion', rb'excessive(?:ly)? distort'),
+    ('time_increment', rb'time increment required is less than the '
+                       rb'minimum|too many attempts made for this '
+                       rb'increment')])
+FAILURE_EXTENSIONS = ['.log', '.msg', '.dat', '.sta']
+
+# Retry policy of failed jobs by failure class: number of retries,
+# seconds to wait before each one and factor to scale job cpus by.
+# Convergence failures are model ones, so they are not retried.
+RETRY_POLICY = {'license': {'retries': 6, 'delay': 600, 'cpus_factor': 1},
+                'disk_full': {'retries': 1, 'delay': 1800, 'cpus_factor': 1},
+                'memory': {'retries': 2, 'delay': 0, 'cpus_factor': 0.5},
+                'distortion': {'retries': 0},
+                'time_increment': {'retries': 0},
+                'unknown': {'retries': 1, 'delay': 60, 'cpus_factor': 1}}
+
+
+def analyse_study_sensitivity(config_file, variables=None):
+    """Compute global sensitivity measures of study outputs.
+
+    Parameters samples are read from the parametric csv file, and their
+    sampling design from the <study>_design.json file written by
+    create_parametric_files. Outputs are read from study hdf5 file:
+    every time step of each time history, interpolated to first model
+    times if needed, and scalar responses, as taken by scalar_responses
+    function of study_catalog module.
+
+    Correlation and regression coefficients are always computed. Sobol
+    indices are added for Saltelli designs, and elementary effects for
+    Morris designs. Results are saved in a <study>_sensitivity.hdf5
+    file, with a group per output and a dataset per measure.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+    variables : list of str, optional
+        Hdf5 variables groups to analyse. Default is all of them.
+
+    Returns
+    -------
+    dict
+        Outputs names : dict of measures names : arrays, of shape
+        (n_parameters,) for scalar responses and (n_parameters,
+        n_time_steps) for time histories.
+    """
+    # Read samples and design, ordered by model number.
+    study_name = Path(config_file).stem
+    study_folder = Path.cwd() / study_name
+    samples = pd.read_csv(Path(config_file).with_suffix('.csv'),
+                          index_col='MODEL_NO').sort_index()
+    design = {'sampling': 'uniform', 'parameters': list(samples.columns)}
+    design_path = study_folder / (study_name + '_design.json')
+    if design_path.exists():
+        with open(design_path) as file:
+            design = json.load(file)
+    x = samples[design['parameters']].to_numpy(float)
+
+    # Stack outputs of all models, time histories on a common time axis.
+    outputs, responses = {}, {}
+    with h5py.File(Path(config_file).with_suffix('.hdf5'), 'r') as hdf:
+        for variable in variables or list(hdf):
+            if not isinstance(hdf[variable], h5py.Group):
+                continue
+            arrays = {int(i.attrs.get('MODEL_NO', st.extract_number_from_str(
+                k))): i[()] for k, i in hdf[variable].items()}
+            missing = set(samples.index) - set(arrays)
+            if missing:
+                raise ValueError('Models ' + str(sorted(missing)) +
+                                 ' missing in ' + variable)
+            for model_no in samples.index:
+                for name, value in sc.scalar_responses(
+                        {variable: arrays[model_no]}).items():
+                    responses.setdefault(name, []).append(value)
+            first = arrays[samples.index[0]]
+            if first.ndim == 2 and first.shape[1] == 2 and len(first) > 1:
+                outputs[variable] = np.stack([
+                    arrays[i][:, 1] if np.array_equal(arrays[i][:, 0],
+                                                      first[:, 0])
+                    else np.interp(first[:, 0], arrays[i][:, 0],
+                                   arrays[i][:, 1])
+                    for i in samples.index])
+    outputs.update((k, np.array(v)) for k, v in responses.items())
+
+    # Compute measures of design for all outputs and save them.
+    results = {}
+    with h5py.File(study_folder / (study_name + '_sensitivity.hdf5'),
+                   'w') as hdf:
+        hdf.attrs['parameters'] = design['parameters']
+        for name, y in outputs.items():
+            results[name] = sa.correlation_coefficients(x, y)
+            if design['sampling'] == 'saltelli':
+                results[name].update(sa.sobol_indices(y, x.shape[1]))
+            elif design['sampling'] == 'morris':
+                results[name].update(sa.morris_effects(
+                    x, y, design['sample_size'], design.get('bounds')))
+            for measure, values in results[name].items():
+                hdf.create_dataset(name + '/' + measure, data=values)
+    print('*** SENSITIVITY MEASURES COMPUTED ***')
+    return results
+
+
+def archive_odbs(odb_files, processes=None, preset=6, wait=False):
+    """Compress Odb files in a background pool of processes.
+
+    Parameters
+    ----------
+    odb_files : list of Path
+        Odb files to compress, by compress_odb.
+    processes : int, optional
+        Number of parallel processes. Default is cpus number.
+    preset : int, optional
+        Compression preset, from 0 (fastest) to 9 (smallest).
+    wait : bool, optional
+        If True, wait for all Odbs to be compressed.
+
+    Returns
+    -------
+    dict
+        Odb paths : futures of compress_odb results, or results if
+        `wait` is True, None for failed compressions.
+    """
+    def report_failure(odb_path, future):
+        """Print warning of a failed compression."""
+        if future.exception():
+            print('WARNING: ARCHIVAL OF', odb_path, 'FAILED:',
+                  future.exception())
+
+    # Report failed compressions, whose Odbs are left untouched, as
+    # they finish, even in background.
+    executor = concurrent.futures.ProcessPoolExecutor(processes)
+    futures = {}
+    for odb_path in odb_files:
+        future = executor.submit(compress_odb, odb_path, preset)
+        future.add_done_callback(
+            lambda done, odb_path=str(odb_path): report_failure(odb_path,
+                                                                 done))
+        futures[str(odb_path)] = future
+    executor.shutdown(wait=wait)
+    if not wait:
+        return futures
+    return {k: None if v.exception() else v.result()
+            for k, v in futures.items()}
+
+
+def archive_study_odbs(config_file, extracted, processes=None, wait=False):
+    """Compress Odbs of a study whose data was extracted.
+
+    Only the given Odbs of the study database folder, whose job is not
+    running, are compressed, so they are only opened again for
+    occasional re-extraction. Failed compressions are reported by
+    archive_odbs.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+    extracted : list of Path
+        Odbs whose data was successfully extracted, as selected by
+        extract_fea_data.
+    processes : int, optional
+        Number of parallel processes. Default is cpus number.
+    wait : bool, optional
+        If True, wait for all Odbs to be compressed.
+
+    Returns
+    -------
+    dict
+        Odb paths : futures of compress_odb results, or results if
+        `wait` is True, as returned by archive_odbs.
+    """
+    input_data = ft.extract_config_from_cfg(config_file)
+    study_name = Path(config_file).stem
+    database_folder = Path(input_data['database_folder'], study_name)
+    extracted = set(Path(i).stem for i in extracted)
+    odb_files = [i for i in fc.list_files(database_folder, '.odb')
+                 if Path(i).stem in extracted
+                 and not Path(i).with_suffix('.lck').exists()]
+    print(len(odb_files), 'Odbs to archive')
+    return archive_odbs(odb_files, processes, wait=wait)
+
+
+def choose_job_resources(dofs, calibration=None, total_cpus=None):
+    """Choose cpus, domains and memory of a job from its model size.
+
+    With calibration data from benchmark runs, wallclock time of each
+    benchmarked cpus number is fitted as a power law of degrees of
+    freedom, and the cpus number maximizing study throughput is chosen:
+    that is, the number of jobs that fit the machine at once over their
+    wallclock time, rather than single job speed. Memory is fitted as a
+    power law of degrees of freedom over all benchmarks.
+
+    Without calibration, cpus are set as a power of two, close to one
+    cpu per DOFS_PER_CPU degrees of freedom.
+
+    Parameters
+    ----------
+    dofs : int
+        Estimated degrees of freedom of model.
+    calibration : pandas DataFrame, optional
+        Benchmark runs, with DOFS, CPUS, WALLCLOCK and MEMORY (MB)
+        columns.
+    total_cpus : int, optional
+        Cpus available for the study. Default is machine cpus number.
+
+    Returns
+    -------
+    dict
+        'cpus', 'domains', 'memory' in MB (None if unknown) and
+        'predicted' wallclock time (None if unknown).
+    """
+    if not total_cpus:
+        total_cpus = multiprocessing.cpu_count()
+    output = {'memory': None, 'predicted': None}
+    log_dofs = np.log(max(dofs, 1))
+
+    # Without calibration, use power of two close to size heuristic.
+    if calibration is None or not len(calibration):
+        cpus = 2 ** int(round(np.log2(max(1., dofs / DOFS_PER_CPU))))
+        output['cpus'] = output['domains'] = int(min(cpus, total_cpus))
+        return output
+
+    def fit_power_law(x, y):
+        """Fit log(y) = a + b log(x), with b=1 for a single size."""
+        log_x, log_y = np.log(x), np.log(y)
+        if len(np.unique(log_x)) < 2:
+            return log_y.mean() - log_x.mean(), 1.
+        b, a = np.polyfit(log_x, log_y, 1)
+        return a, b
+
+    # Predict wallclock time of each benchmarked cpus number and pick
+    # the one maximizing jobs finished per unit of time.
+    best_rate = 0
+    for cpus, group in calibration.groupby('CPUS'):
+        if cpus > total_cpus:
+            continue
+        a, b = fit_power_law(group['DOFS'].to_numpy(float),
+                             group['WALLCLOCK'].to_numpy(float))
+        predicted = np.exp(a + b * log_dofs)
+        rate = (total_cpus // cpus) / predicted
+        if rate > best_rate:
+            best_rate = rate
+            output.update(cpus=int(cpus), domains=int(cpus),
+                          predicted=float(predicted))
+    if best_rate == 0:
+        output['cpus'] = output['domains'] = 1
+
+    # Predict memory requirement, with a safety margin.
+    if 'MEMORY' in calibration.columns:
+        a, b = fit_power_law(calibration['DOFS'].to_numpy(float),
+                             calibration['MEMORY'].to_numpy(float))
+        output['memory'] = int(np.ceil(1.2 * np.exp(a + b * log_dofs)))
+    return output
+
+
+def claim_queue_entry(queue_folder, lease_seconds=600):
+    """Atomically claim a pending entry of a file-based jobs queue.
+
+    Entries are claimed by renaming them from the pending to the
+    claimed sub-folder, adding worker host and process id to their
+    name. As renaming is atomic in a shared filesystem, only one
+    worker, from any host, can claim each entry, and it loses its claim
+    if the entry is renamed again. Stale leases are reclaimed first.
+    Entries are touched before renaming, as renaming keeps their
+    enqueue time, and other workers would see them as stale.
+
+    Parameters
+    ----------
+    queue_folder : Path
+        Queue folder, as created by enqueue_abaqus_jobs.
+    lease_seconds : float, optional
+        Seconds without heartbeat after which a claim is stale.
+
+    Returns
+    -------
+    Path or None
+        Claimed entry path, or None if no entry is pending.
+    """
+    reclaim_stale_queue_entries(queue_folder, lease_seconds)
+    worker = socket.gethostname() + '-' + str(os.getpid())
+    for entry in sorted(Path(queue_folder, 'pending').glob('*.json')):
+        claimed = Path(queue_folder, 'claimed',
+                       entry.stem + '@' + worker + '.json')
+        try:
+            os.utime(entry)
+            os.rename(entry, claimed)
+        except OSError:
+            continue
+        return claimed
+    return None
+
+
+def classify_job_failure(job_path):
+    """Find the cause of a failed Abaqus job in its text output files.
+
+    Log, msg, dat and sta files are searched for messages of known
+    failure causes, from FAILURE_PATTERNS, memory mapping them to avoid
+    reading large files into memory.
+
+    Parameters
+    ----------
+    job_path : Path
+        Path of job files, without extension.
+
+    Returns
+    -------
+    dict
+        'class': failure class, a FAILURE_PATTERNS key, or 'unknown'.
+        'message': line of the matched message, or None.
+    """
+    found = {}
+    for extension in FAILURE_EXTENSIONS:
+        file_path = str(job_path) + extension
+        if not os.path.exists(file_path) or not os.path.getsize(file_path):
+            continue
+        with open(file_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for failure_class, pattern in FAILURE_PATTERNS.items():
+                if failure_class in found:
+                    continue
+                match = re.search(pattern, data, re.IGNORECASE)
+                if match:
+                    start = data.rfind(b'\n', 0, match.start()) + 1
+                    end = data.find(b'\n', match.end())
+                    found[failure_class] = data[
+                        start:end if end != -1 else len(data)].decode(
+                            errors='replace').strip()
+
+    # Report most relevant cause, as causes may trigger each other.
+    for failure_class in FAILURE_PATTERNS:
+        if failure_class in found:
+            return {'class': failure_class,
+                    'message': found[failure_class]}
+    return {'class': 'unknown', 'message': None}
+
+
+def compile_extraction_plan(extraction_plan):
+    """Validate and complete outputs declared in a study config file.
+
+    Each output is a dict with keys:
+    - 'set': name of node or element set.
+    - 'variable': field output key, such as 'U', or history output
+      keys, such as ['A1', 'A2'].
+    - 'output', optional: 'field' (default) or 'history'.
+    - 'name', optional: output arrays prefix. Default is set name and
+      variable joined by underscores.
+    - 'steps', optional: steps to read from. Default is all of them.
+    - 'position', optional: field output position, such as 'NODAL'.
+    - 'reductions', optional: reduction operators, such as ['max'],
+      and 'histogram_bins', if 'histogram' reduction is requested.
+
+    For example:
+    EXTRACTION_PLAN = [{'set': 'CREST', 'variable': ['A1'],
+                        'output': 'history',
+                        'reductions': ['abs_max', 'time_of_peak']}]
+
+    The compiled plan is run in Abaqus by run_extraction_plan function
+    of abaqus_inside module.
+
+    Parameters
+    ----------
+    extraction_plan : list of dict
+        Outputs declared in config file.
+
+    Returns
+    -------
+    list of dict
+        Outputs with every key set.
+    """
+    compiled, names = [], set()
+    for entry in extraction_plan:
+        # Verify keys and values of output.
+        unknown_keys = set(entry) - set(EXTRACTION_PLAN_KEYS)
+        if unknown_keys:
+            raise ValueError('Unknown extraction plan keys ' +
+                             str(sorted(unknown_keys)))
+        if 'set' not in entry or 'variable' not in entry:
+            raise ValueError('Extraction plan output needs set and '
+                             'variable: ' + str(entry))
+        output = dict(EXTRACTION_PLAN_KEYS, **entry)
+        if output['output'] not in ('field', 'history'):
+            raise ValueError('Unknown output type ' + str(output['output']))
+        if 'histogram' in output['reductions'] and not \
+                output['histogram_bins']:
+            raise ValueError('histogram_bins required for histogram '
+                             'reduction of ' + str(entry))
+
+        # Normalize history keys to list and set default name.
+        variable = output['variable']
+        if output['output'] == 'history' and isinstance(variable, str):
+            output['variable'] = [variable]
+        if not output['name']:
+            output['name'] = '_'.join([output['set']] + (
+                [variable] if isinstance(variable, str) else list(variable)))
+        if output['name'] in names:
+            raise ValueError('Repeated extraction plan name ' +
+                             output['name'])
+        names.add(output['name'])
+        compiled.append(output)
+    return compiled
+
+
+def compress_odb(odb_path, preset=6, remove=True, chunk_size=2 ** 24):
+    """Compress an Odb file into a verified xz archive.
+
+    Odb is streamed through the compressor, and the archive is then
+    decompressed and checked against the Odb checksum before the Odb
+    is removed. Checksum, size and modification time of the Odb are
+    saved in a json file next to the archive, for restore_odb and
+    extraction cache keys.
+
+    Parameters
+    ----------
+    odb_path : Path
+        Odb file to compress.
+    preset : int, optional
+        Compression preset, from 0 (fastest) to 9 (smallest).
+    remove : bool, optional
+        If True, remove Odb once archive is verified.
+    chunk_size : int, optional
+        Bytes read and written at a time.
+
+    Returns
+    -------
+    Path
+        Archive path.
+    """
+    odb_path = Path(odb_path)
+    archive_path = Path(str(odb_path) + ODB_ARCHIVE_EXTENSION)
+    temp_path = Path(str(archive_path) + '.part')
+    odb_stat = os.stat(odb_path)
+
+    # Compress Odb, computing its checksum on the way.
+    digest = hashlib.sha256()
+    compressor = lzma.LZMACompressor(preset=preset)
+    with open(odb_path, 'rb') as source, open(temp_path, 'wb') as target:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+            target.write(compressor.compress(chunk))
+        target.write(compressor.flush())
+
+    # Verify archive by decompressing it.
+    check = hashlib.sha256()
+    decompressor = lzma.LZMADecompressor()
+    with open(temp_path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            check.update(decompressor.decompress(chunk))
+    if (check.hexdigest() != digest.hexdigest()
+            or os.stat(odb_path).st_mtime_ns != odb_stat.st_mtime_ns):
+        os.remove(temp_path)
+        raise IOError('Archive of ' + str(odb_path) + ' does not match it')
+
+    # Save metadata and archive, and only then remove Odb.
+    metadata = {'name': odb_path.name, 'sha256': digest.hexdigest(),
+                'size': odb_stat.st_size, 'mtime_ns': odb_stat.st_mtime_ns}
+    with open(str(temp_path) + '.json', 'w') as file:
+        json.dump(metadata, file)
+    os.replace(str(temp_path) + '.json', str(archive_path) + '.json')
+    os.replace(temp_path, archive_path)
+    if remove:
+        os.remove(odb_path)
+    return archive_path
+
+
+def count_inp_mesh_entities(inp_path):
+    """Count nodes and elements, by element type, of an inp file.
+
+    Data lines of *Node and *Element keywords blocks are counted,
+    without parsing them, so large inp files are read quickly.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to read.
+
+    Returns
+    -------
+    dict
+        'nodes' : number of nodes, and 'elements' : dict of element
+        types : number of elements pairs.
+    """
+    output = {'nodes': 0, 'elements': {}}
+    block = None
+    with open(inp_path, errors='replace') as file:
+        for line in file:
+            # Keyword lines set current block, comments are skipped.
+            if line.startswith('*'):
+                if line.startswith('**'):
+                    continue
+                keyword = line[1:].partition(',')[0].strip().upper()
+                block = None
+                if keyword == 'NODE':
+                    block = 'nodes'
+                elif keyword == 'ELEMENT':
+                    match = re.search(r'type\s*=\s*([\w]+)', line, re.I)
+                    block = match.group(1).upper() if match else 'UNKNOWN'
+                    output['elements'].setdefault(block, 0)
+                continue
+
+            # Count data lines, skipping elements continuation lines.
+            if block == 'nodes':
+                output['nodes'] += 1
+            elif block and not line.rstrip().endswith(','):
+                output['elements'][block] += 1
+    return output
+
 
 def create_parametric_files(config_file):
     """Generate necessary files for Abaqus parametric analysis.
@@ -66,13 +651,18 @@ def create_parametric_files(config_file):
     def build_parametric_csv(study_nam, parameters_list, max_values,
                              min_values, normal_values, sample_size=10,
                              study_folde=None, analysis_folder=None,
-                             overwrite=False, **kwargs):
+                             overwrite=False, sampling='uniform',
+                             seed=None, **kwargs):
         """Create csv with samples values for Abaqus parametric study.
 
         The algorithm calculates samples for each parameter, and saves
         them column-wise, with parameter name as column names. Default
         output folder is a sub-folder named after the study.
 
+        Besides uniform sampling of one parameter, samples may follow a
+        design of sensitivity module, recorded in a <study>_design.json
+        file next to csv file, for analyse_study_sensitivity to use.
+
         Parameters
         ----------
         study_nam : str
@@ -82,7 +672,9 @@ def create_parametric_files(config_file):
         max_values, min_values, normal_values : List of float
             Maximum, minimum and reference values of each parameter.
         sample_size : int
-            Number of sampling vector for a one parameter study.
+            Number of sampling vector for a one parameter study. For
+            designs, number of samples of latin hypercube, of rows of
+            Saltelli A and B matrices, or of Morris trajectories.
         study_folde : Path, optional
             Folder to save the output file to. If not given, the script
             assumes ./study_nam as output folder.
@@ -90,6 +682,10 @@ def create_parametric_files(config_file):
             Folder to copy output file to. Default is None.
         overwrite : bool, optional.
             If True, allows output file overwriting.
+        sampling : str, optional
+            Sampling design, from DESIGNS of sensitivity module.
+        seed : int, optional
+            Random generator seed of sampling design.
         **kwargs : dict
             Allows to pass same argument values to different functions.
 
@@ -105,11 +701,32 @@ def create_parametric_files(config_file):
 
         # For one parameter study, sample with uniform vector, add
         # reference value and build pandas data-frame.
-        if len(parameters_list) == 1:
+        if sampling == 'uniform' and len(parameters_list) == 1:
             samples = np.linspace(min_values[0], max_values[0], sample_size)
             samples = sorted(list(samples) + normal_values)
             df = pd.DataFrame(samples, columns=parameters_list)
 
+        # Otherwise, sample with design and record it next to csv.
+        else:
+            bounds = list(zip(min_values, max_values))
+            if sampling == 'latin_hypercube':
+                samples = sa.latin_hypercube_design(bounds, sample_size, seed)
+            elif sampling == 'saltelli':
+                samples = sa.saltelli_design(bounds, sample_size, seed)
+            elif sampling == 'morris':
+                samples = sa.morris_design(bounds, sample_size, seed=seed)
+            else:
+                raise ValueError('Unknown sampling design ' + str(sampling) +
+                                 ' for ' + str(len(parameters_list)) +
+                                 ' parameters')
+            df = pd.DataFrame(samples, columns=parameters_list)
+            with open(output_csv.with_name(study_nam + '_design.json'),
+                      'w') as file:
+                json.dump({'sampling': sampling, 'sample_size': sample_size,
+                           'parameters': parameters_list, 'seed': seed,
+                           'bounds': [[float(i), float(j)]
+                                      for i, j in bounds]}, file)
+
         # Insert 'Models' column as index and save data-frame to csv.
         df.insert(0, "MODEL_NO", range(1, df.shape[0] + 1), True)
         db.save_dataframe_safely(df, output_csv, overwrite)
@@ -199,6 +816,7 @@ def create_parametric_files(config_file):
 
     def modify_inp_file(parameters_list, inp_file_name,
                         study_folde=None, analysis_folder=None,
+                        restart_base_steps=0, amplitude_parameters=None,
                         **kwargs):
         """Include parameters information into a Abaqus FEA inp file.
 
@@ -206,6 +824,11 @@ def create_parametric_files(config_file):
         Abaqus FEA model information, adding lines with parametric
         information and associated necessary definitions.
 
+        Optionally, the first steps of the model are split into a base
+        inp file, saved in a 'base' sub-folder and run only once, and
+        the template inp keeps the rest of steps, restarting from base
+        analysis results. See split_restart_inp_lines.
+
         Parameters
         ----------
         parameters_list : list of str
@@ -217,6 +840,11 @@ def create_parametric_files(config_file):
             assumes ./study_nam as output folder.
         analysis_folder : Path, optional
             Folder to copy output file to. Default is None.
+        restart_base_steps : int, optional
+            If given, number of steps to split into a base analysis.
+        amplitude_parameters : dict, optional
+            Parameters : amplitude names pairs, of parameters swapping
+            amplitudes records, which are not substituted in the inp.
         **kwargs : dict
             Allows to pass same argument values to different functions.
 
@@ -257,6 +885,8 @@ def create_parametric_files(config_file):
 
         # Build lines for parametric variables definition and insert.
         for par in parameters_list:
+            if par in (amplitude_parameters or {}):
+                continue
             for n, line in enumerate(lines):
                 key = INP_KEYWORDS[par]
                 if key in line:
@@ -270,6 +900,21 @@ def create_parametric_files(config_file):
                         lines[n + 1] = lines[n + 1].replace(value, '<' + par +
                                                             '>')
 
+        # Optionally, split base steps into base inp file, saving and
+        # copying it to analysis folder.
+        if restart_base_steps:
+            base_lines, lines = split_restart_inp_lines(
+                lines, int(restart_base_steps), parameters_list)
+            base_inp = Path(ft.create_non_existent_folder(
+                inp_path.parent / 'base'), study_nam + '_base.inp')
+            with open(base_inp, 'w+') as file:
+                file.write(''.join(base_lines))
+            if analysis_folder:
+                copy_folder = ft.create_non_existent_folder(
+                    Path(analysis_folder, study_nam, 'base'))
+                shutil.copy(base_inp, copy_folder / base_inp.name)
+            print('*** BASE INP file created ***')
+
         # Set output inp path, save and copy it to analysis folder.
         out_inp_file = inp_path
         with open(out_inp_file, 'w+') as file:
@@ -281,11 +926,12 @@ def create_parametric_files(config_file):
         return out_inp_file
 
     def modify_psf_4_run(psf_file_path, analysis_folder=None,
-                         cpu_numbers=8, **kwargs):
+                         cpu_numbers=8, restart_base_steps=0, **kwargs):
         """Adds execution line to psf file, allowing Abaqus to run jobs.
 
         This function extract only the lines necessary to define the
-        parametric study, and then adds an execution line.
+        parametric study, and then adds an execution line. For studies
+        restarting from a base analysis, the old job option is added.
 
         Parameters
         ----------
@@ -321,9 +967,14 @@ def create_parametric_files(config_file):
         parameters_line = [[i for i in lines if 'parameters = ' in i][0]]
         study_line = [[i for i in lines if 'study = ' in i][0]]
 
-        # Insert execution line and write output file.
+        # Insert execution line and write output file. Base restart
+        # files are staged in study folder by run_psf.
+        old_job_option = ''
+        if restart_base_steps:
+            old_job_option = ' oldjob=' + study_nam + '_base'
         execution_line = ['study.execute(ALL, execOptions = ' +
-                          '"cpus=' + str(cpu_numbers) + '")']
+                          '"cpus=' + str(cpu_numbers) + old_job_option +
+                          '")']
         with open(out_psf, 'w+') as output_file:
             output_file.write(''.join(line_0 + parameters_line
                                       + study_line + execution_line))
@@ -356,11 +1007,299 @@ def create_parametric_files(config_file):
     modify_inp_file(**input_data)
     run_psf(psf_file, **input_data)
 
+    # Swap amplitudes records of generated models, if any.
+    if input_data.get('amplitude_parameters'):
+        template_name = Path(input_data['inp_file_name']
+                             ).with_suffix('.inp').name
+        models_folder = Path(input_data['analysis_folder'], study_name)
+        inp_files = [i for i in fc.list_files(models_folder, '.inp')
+                     if Path(i).name != template_name]
+        inject_amplitude_records(inp_files, input_data['amplitude_library'],
+                                 input_data['amplitude_parameters'],
+                                 models_folder / 'amplitudes')
+
     # Modify psf file for running FEA jobs from command line.
     output_psf = modify_psf_4_run(psf_file, **input_data)
+    update_study_catalog(config_file, ['parameters'])
     return output_psf
 
 
+def enqueue_abaqus_jobs(queue_folder, inp_files, analysis_folder=None,
+                        cpus=1, resources=None, config_file=None):
+    """Add Abaqus models inp files to a file-based jobs queue.
+
+    The queue lives in a shared folder, so workers from several hosts
+    can run its jobs with run_queue_worker. Each model becomes a json
+    entry, named after its queue position and job, in the pending
+    sub-folder, so entries are claimed in the given order. Models
+    already queued, in any state, are not added again.
+
+    If a study config file is given, models are ordered longest
+    predicted runtime first, by schedule_study_jobs.
+
+    Parameters
+    ----------
+    queue_folder : Path
+        Folder to create the queue in.
+    inp_files : list of Path
+        Inp files of models to run.
+    analysis_folder : Path, optional
+        Folder to write jobs results to. Default is inp files folder.
+    cpus : int, optional
+        Number of cpus of each job.
+    resources : dict, optional
+        Jobs names : dict of 'cpus' and 'memory' pairs, overriding
+        `cpus` for each job, as returned by size_study_jobs.
+    config_file : Path, optional
+        Path of config file containing study data of models.
+
+    Returns
+    -------
+    int
+        Number of entries added.
+    """
+    # Order jobs, longest predicted runtime first.
+    if config_file and inp_files:
+        inp_files = schedule_study_jobs(config_file, inp_files)
+
+    # Create queue states sub-folders and list already queued jobs.
+    for state in QUEUE_STATES:
+        ft.create_non_existent_folder(Path(queue_folder, state))
+    queued = {i.stem.partition('@')[0].partition('-')[2]
+              for state in QUEUE_STATES
+              for i in Path(queue_folder, state).glob('*.json')}
+
+    # Write entries through temporary files, so workers never see
+    # incomplete entries.
+    added = 0
+    for inp_file in inp_files:
+        if Path(inp_file).stem in queued:
+            continue
+        entry_name = ('%06d-' % (len(queued) + added) + Path(inp_file).stem
+                      + '.json')
+        job_resources = (resources or {}).get(Path(inp_file).stem, {})
+        entry = {'inp': str(inp_file),
+                 'cpus': job_resources.get('cpus', cpus),
+                 'memory': job_resources.get('memory'),
+                 'analysis_folder': str(analysis_folder or
+                                        Path(inp_file).parent)}
+        temp_path = Path(queue_folder, entry_name + '.tmp')
+        with open(temp_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temp_path, Path(queue_folder, 'pending', entry_name))
+        added += 1
+    print(added, 'jobs added to queue', queue_folder)
+    return added
+
+
+def estimate_inp_dofs(inp_path):
+    """Estimate degrees of freedom of an inp file model.
+
+    Element connectivity of each part or instance is read, and each
+    node is given the largest degrees of freedom per node among its
+    elements types, as set in ELEMENT_DOFS_PER_NODE. Parts meshes are
+    counted once for each assembly instance of them. Models without
+    parts are read as a single part.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to read.
+
+    Returns
+    -------
+    int
+        Estimated number of degrees of freedom.
+    """
+    def element_dofs(element_type):
+        """Get degrees of freedom per node from longest prefix match."""
+        prefixes = [i for i in ELEMENT_DOFS_PER_NODE
+                    if element_type.startswith(i)]
+        if not prefixes:
+            return 3
+        return ELEMENT_DOFS_PER_NODE[max(prefixes, key=len)]
+
+    # Gather elements nodes labels by part or instance, and by degrees
+    # of freedom.
+    parts_nodes, instances = {}, {}
+    scope, dofs, pending = '', None, ''
+    with open(inp_path, errors='replace') as file:
+        for line in file:
+            if line.startswith('*'):
+                if line.startswith('**'):
+                    continue
+                keyword = line[1:].partition(',')[0].strip().upper()
+                dofs = None
+                name = re.search(r'(?<![\w])name\s*=\s*([^,\s]+)', line, re.I)
+                if keyword == 'PART' and name:
+                    scope = name.group(1)
+                elif keyword in ('END PART', 'END INSTANCE'):
+                    scope = ''
+                elif keyword == 'INSTANCE' and name:
+                    scope = 'INSTANCE ' + name.group(1)
+                    instance_part = re.search(r'part\s*=\s*([^,\s]+)',
+                                              line, re.I)
+                    if instance_part:
+                        key = instance_part.group(1)
+                        instances[key] = instances.get(key, 0) + 1
+                elif keyword == 'ELEMENT':
+                    match = re.search(r'type\s*=\s*([\w]+)', line, re.I)
+                    dofs = element_dofs(match.group(1).upper() if match
+                                        else '')
+                continue
+
+            # Join continuation lines and store nodes labels.
+            if dofs is None:
+                continue
+            pending += line.strip()
+            if pending.endswith(','):
+                continue
+            labels = [int(i) for i in pending.split(',')[1:] if i.strip()]
+            parts_nodes.setdefault(scope, {}).setdefault(dofs, []).extend(
+                labels)
+            pending = ''
+
+    # Count unique nodes with their largest degrees of freedom.
+    total_dofs = 0
+    for scope, nodes_by_dofs in parts_nodes.items():
+        node_dofs = {}
+        for dofs in sorted(nodes_by_dofs):
+            node_dofs.update(dict.fromkeys(nodes_by_dofs[dofs], dofs))
+        total_dofs += sum(node_dofs.values()) * instances.get(scope, 1)
+    return total_dofs
+
+
+def evict_cached_odbs(cache_folder=None, max_bytes=None, keep=()):
+    """Remove least recently used Odbs of cache beyond its size.
+
+    Parameters
+    ----------
+    cache_folder : Path, optional
+        Cache folder. Default is ODB_CACHE_FOLDER.
+    max_bytes : int, optional
+        Cache size. Default is ODB_CACHE_MAX_BYTES.
+    keep : list of str, optional
+        Odb paths not to remove.
+
+    Returns
+    -------
+    None
+    """
+    cache_folder = cache_folder or ODB_CACHE_FOLDER
+    max_bytes = ODB_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+
+    # Cached Odbs access time is set on each use, oldest one first.
+    # Partial files of ongoing restores are left out.
+    cached = []
+    for folder, _, files in os.walk(cache_folder):
+        for name in files:
+            if name.endswith('.part'):
+                continue
+            file_path = os.path.join(folder, name)
+            stat = os.stat(file_path)
+            cached.append((stat.st_atime, stat.st_size, file_path))
+    cached.sort()
+    total = sum(i[1] for i in cached)
+    keep = [str(i) for i in keep]
+    for _, size, file_path in cached:
+        if total <= max_bytes:
+            break
+        if file_path in keep:
+            continue
+        try:
+            os.remove(file_path)
+            os.rmdir(os.path.dirname(file_path))
+        except OSError:
+            # Opened by another process, or folder not empty.
+            if os.path.exists(file_path):
+                continue
+        total -= size
+
+
+def export_study_parquet(config_file, output_folder=None,
+                         row_group_size=2 ** 17):
+    """Export study hdf5 database to Parquet files, for columnar analysis.
+
+    Two outputs are written to the output folder:
+    - <study>_models.parquet: a row per model, with parameters values
+      and scalar responses, as taken by scalar_responses function of
+      study_catalog module.
+    - histories: a long format dataset of time histories, with
+      MODEL_NO, TIME and VALUE columns, hive partitioned by VARIABLE.
+    Rows are sorted by model number and written with row groups
+    statistics, so filtered scans skip irrelevant row groups, e.g.:
+    pd.read_parquet(folder / 'histories', filters=[('VARIABLE', '=',
+    name), ('MODEL_NO', '<', 10)]).
+
+    Requires the optional pyarrow package.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+    output_folder : Path, optional
+        Folder to write Parquet files to. Default is a parquet
+        sub-folder of study folder.
+    row_group_size : int, optional
+        Maximum number of rows of each row group.
+
+    Returns
+    -------
+    Path
+        Output folder.
+    """
+    if pq is None:
+        raise ImportError('pyarrow is required to export Parquet files')
+
+    # Set study paths and read parameters of each model.
+    study_name = Path(config_file).stem
+    if output_folder is None:
+        output_folder = Path.cwd() / study_name / 'parquet'
+    output_folder = ft.create_non_existent_folder(output_folder)
+    models = pd.read_csv(Path(config_file).with_suffix('.csv'))
+
+    # Write a long format table per variable group of hdf5 file,
+    # gathering scalar responses of each model.
+    scalars = {}
+    with h5py.File(Path(config_file).with_suffix('.hdf5'), 'r') as hdf:
+        for variable, group in hdf.items():
+            if not isinstance(group, h5py.Group):
+                continue
+            datasets = sorted(
+                ((int(i.attrs.get('MODEL_NO', st.extract_number_from_str(k))),
+                  i) for k, i in group.items()), key=lambda x: x[0])
+            models_numbers, times, values = [], [], []
+            for model_no, dataset in datasets:
+                array = dataset[()]
+                scalars.setdefault(model_no, {}).update(
+                    sc.scalar_responses({variable: array}))
+                if array.ndim == 2 and array.shape[1] == 2:
+                    models_numbers.append(np.full(len(array), model_no,
+                                                  dtype=np.int32))
+                    times.append(array[:, 0])
+                    values.append(array[:, 1])
+            if not values:
+                continue
+            table = pa.table({'MODEL_NO': np.concatenate(models_numbers),
+                              'TIME': np.concatenate(times),
+                              'VALUE': np.concatenate(values)})
+            variable_folder = ft.create_non_existent_folder(Path(
+                output_folder, 'histories',
+                'VARIABLE=' + urllib.parse.quote(variable, safe='')))
+            pq.write_table(table, variable_folder / 'part-0.parquet',
+                           row_group_size=row_group_size,
+                           write_statistics=True, compression='zstd')
+
+    # Write models table with parameters and scalar responses.
+    scalars = pd.DataFrame.from_dict(scalars, orient='index')
+    models = models.join(scalars, on='MODEL_NO')
+    pq.write_table(pa.Table.from_pandas(models, preserve_index=False),
+                   Path(output_folder, study_name + '_models.parquet'),
+                   write_statistics=True, compression='zstd')
+    print('*** PARQUET FILES EXPORTED ***')
+    return output_folder
+
+
 def extract_fea_data(config_file):
     """Gather output data from Abaqus FEA Odb files.
 
@@ -374,6 +1313,29 @@ def extract_fea_data(config_file):
     automatize the slower process of output gathering in parametric
     analysis.
 
+    Extracted npz files are kept in an extraction_cache sub-folder,
+    keyed on each Odb size, modification time and name, and on the
+    modified gather script. Only Odbs without a cached npz for the
+    current script are extracted again, unless the USE_CACHE option of
+    config file is set to 0. Output variable references logged by the
+    script are cached too, so they are returned for all Odbs, even if
+    some or all of them are reused from cache.
+
+    If STREAM_OUTPUT option is set, arrays are streamed from the Abaqus
+    subprocess stdout straight into the study hdf5 file instead, with
+    no npz files nor cache involved. Datasets are named after model
+    numbers, as in summarize_fea_output.
+
+    If EXTRACTION_PLAN option is set, outputs declared in it are
+    extracted in a single pass over each Odb, instead of running the
+    post-process script. See compile_extraction_plan.
+
+    Archived Odbs to process are restored into local cache by
+    restore_odb before running Abaqus, whose Python may lack lzma
+    module. If ARCHIVE_ODBS option is set, Odbs whose npz files were
+    written in this run, or reused from cache, are then archived in
+    background, by archive_study_odbs.
+
     Parameters
     ----------
     config_file : Path
@@ -384,8 +1346,41 @@ def extract_fea_data(config_file):
     List of strings
        Extracted Abaqus output variable reference keywords.
     """
+    def extraction_cache_key(odb_path, script_hash):
+        """Build cache key from Odb size, mtime and name and script."""
+        odb_path = str(odb_path)
+        if odb_path.endswith(ODB_ARCHIVE_EXTENSION):
+            with open(odb_path + '.json') as file:
+                metadata = json.load(file)
+            name, size, mtime = (metadata['name'], metadata['size'],
+                                 metadata['mtime_ns'])
+        else:
+            odb_stat = os.stat(odb_path)
+            name, size, mtime = (Path(odb_path).name, odb_stat.st_size,
+                                 odb_stat.st_mtime_ns)
+        key = '|'.join([name, str(size), str(mtime), script_hash])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def odb_stem(odb_path):
+        """Get job name of an Odb or Odb archive path."""
+        odb_path = str(odb_path)
+        if odb_path.endswith(ODB_ARCHIVE_EXTENSION):
+            odb_path = odb_path[:-len(ODB_ARCHIVE_EXTENSION)]
+        return Path(odb_path).stem
+
+    def extracted_odbs(odb_list, start_time):
+        """Get Odbs whose npz file was written since start time."""
+        output = []
+        for odb_path in odb_list:
+            npz_path = Path(temp_folder, odb_stem(odb_path) + '.npz')
+            if npz_path.exists() and npz_path.stat().st_mtime >= start_time:
+                output.append(odb_path)
+        return output
+
     def modify_gather_script(extraction_algorithm, database_folder=None,
-                             one_odb_only=False, **kwargs):
+                             one_odb_only=False, odb_list=None,
+                             stream_output=False, extraction_plan=None,
+                             **kwargs):
         """Adds batch commands to data gathering post-process script.
 
         Basically, this function inserts commands to a post-process
@@ -403,18 +1398,34 @@ def extract_fea_data(config_file):
         one_odb_only : bool, optional
             If True, pass only one odb to output script. Is useful for
             debugging purposes.
+        odb_list : list of str, optional
+            Odb paths to process. Default is all Odbs of database
+            folder. Archived ones are restored by restore_odb.
+        stream_output : bool, optional
+            If True, stream arrays to stdout instead of saving npz.
+        extraction_plan : list of dict, optional
+            Compiled extraction plan to run instead of post-process
+            script.
         **kwargs : dict
             Allows to pass same argument values to different functions.
 
         Returns
         -------
-        List of strings
-            Abaqus output variable reference keywords.
+        Path
+            Modified script path.
+        str
+            Hash of modified script, excluding list of Odb paths.
         """
-        # Extract study folder and load post-process script.
+        # Extract study folder and load post-process script, or build
+        # extraction plan run line.
         study_folde = extraction_algorithm.parent
-        with open(extraction_algorithm, 'r+') as script:
-            algo_lines = script.readlines()
+        if extraction_plan:
+            algo_lines = ['data = run_extraction_plan(' +
+                          ('odb' if database_folder
+                           else 'retrieve_odb_name(0)') + ', plan)']
+        else:
+            with open(extraction_algorithm, 'r+') as script:
+                algo_lines = script.readlines()
 
         # Build header lines: import built-in modules, add chdir to
         # database folder and modules folder path.
@@ -424,15 +1435,20 @@ def extract_fea_data(config_file):
                   'import csv', 'import numpy as np',
                   'sys.path.append( "' + modules_path + '")',
                   'from abaqus_inside import *']
+        if extraction_plan:
+            header.append('plan = ' + repr(extraction_plan))
 
         # Build batch lines. Pass list of odb paths, set odb files
         # closer and indent script commands.
         closer = []
         if database_folder:
-            odb_list = ft.list_files_with_extension(database_folder, '.odb')
-            odb_list = [str(t) for t in odb_list]
+            if odb_list is None:
+                odb_list = list_odb_files(database_folder)
             if one_odb_only:
                 odb_list = odb_list[0:1]
+            odb_list = [str(restore_odb(t))
+                        if str(t).endswith(ODB_ARCHIVE_EXTENSION) else str(t)
+                        for t in odb_list]
             odb_header = ['odb_list=' + repr(odb_list),
                           'for odb_path in odb_list:',
                           '    odb = session.openOdb(odb_path)']
@@ -441,7 +1457,7 @@ def extract_fea_data(config_file):
 
         # Build time history and batch odb closer lines. Look for
         # existent time history data.
-        time_history, th = False, []
+        time_history, th = bool(extraction_plan), []
         for line in algo_lines:
             if 'XYDataFromHistory' in line:
                 time_history = True
@@ -453,13 +1469,18 @@ def extract_fea_data(config_file):
         if time_history:
             parent_dir, npz_name = '', 'odb_name.replace(".odb",".npz")'
             th = ['data = {k: v for k, v in session.xyDataObjects.items()}',
-                  'odb_name = odbs_retrieve_name(0)',
+                  'odb_name = ' + ('odb.name' if database_folder
+                                   else 'retrieve_odb_name(0)'),
                   'npz_name = ' +
                   repr(str(study_folde / 'temp_files') + '/') +
-                  ' + ' + npz_name + ".split('/')[-1]",
+                  ' + os.path.basename(' + npz_name + ')',
                   'np.savez(npz_name, **data)',
-                  'log_abaqus("npz saved:")',
-                  'log_abaqus(npz_name)']
+                  'log_message("npz saved:")',
+                  'log_message(npz_name)']
+            if stream_output:
+                th = th[:2] + ['stream_arrays(odb_name, data)']
+            if extraction_plan:
+                th = th[1:]
             if database_folder:
                 th = ['    ' + x for x in th]
 
@@ -471,12 +1492,18 @@ def extract_fea_data(config_file):
         with open(modified_script_path, 'w+') as out_file:
             out_file.write(lines_to_exec)
         print('*** GATHER SCRIPT MODIFIED ***')
-        return modified_script_path
+
+        # Hash script lines, except varying list of Odb paths.
+        script_hash = hashlib.sha1('\n'.join(
+            i for i in lines_to_exec.split('\n')
+            if not i.startswith('odb_list=')).encode('utf-8')).hexdigest()
+        return modified_script_path, script_hash
 
     # Read input config file. Extract study name and subfolder.
     input_cfg = ft.extract_config_from_cfg(config_file)
     study_name = config_file.stem
     study_folder = Path(Path.cwd() / study_name)
+    temp_folder = study_folder / 'temp_files'
 
     # Build kwags dict and set default paths and post-process script.
     input_cfg['study_folde'] = study_folder
@@ -489,19 +1516,496 @@ def extract_fea_data(config_file):
     for i in default_false_vars:
         if i not in input_cfg.keys():
             input_cfg[i] = False
-
-    # Modify post-process script for batch and run it in subrpocess.
-    modified_script = modify_gather_script(**input_cfg)
+    if 'use_cache' not in input_cfg.keys():
+        input_cfg['use_cache'] = True
+    input_cfg['extraction_plan'] = compile_extraction_plan(
+        input_cfg.get('extraction_plan') or [])
+
+    # Optionally, stream output arrays into study hdf5 file, setting
+    # datasets attributes from parametric csv file.
+    if input_cfg.get('stream_output'):
+        modified_script, _ = modify_gather_script(**input_cfg)
+        df = pd.read_csv(Path(config_file).with_suffix('.csv'),
+                         index_col='MODEL_NO')
+        parameters = df.to_dict(orient='index')
+        with h5py.File(Path(config_file).with_suffix('.hdf5'), 'a') as hdf:
+            def write_frame(model, variable, array):
+                """Write a streamed array as a dataset of study hdf5."""
+                model_no = st.extract_number_from_str(Path(model).stem)
+                model = str(model_no)
+                group = hdf.require_group(variable)
+                if model in group:
+                    del group[model]
+                group.create_dataset(model, data=array)
+                group[model].attrs.update(parameters.get(model_no, {}))
+                group[model].attrs['MODEL_NO'] = model
+            return run_abaqus_subprocess(
+                script=modified_script, frames_callback=write_frame,
+                **dict(input_cfg, worker_port=None))
+
+    # Without cache, modify post-process script for batch and run it in
+    # subprocess for all Odbs.
+    if not input_cfg['use_cache'] or input_cfg['one_odb_only']:
+        odb_list = list_odb_files(input_cfg['database_folder'])
+        if input_cfg['one_odb_only']:
+            odb_list = odb_list[0:1]
+        start_time = int(time.time())
+        modified_script, _ = modify_gather_script(
+            **dict(input_cfg, odb_list=odb_list))
+        output_vars = run_abaqus_subprocess(script=modified_script,
+                                            **input_cfg)
+        if input_cfg.get('archive_odbs'):
+            archive_study_odbs(config_file,
+                               extracted_odbs(odb_list, start_time))
+        return output_vars
+
+    # Hash post-process script and load cache index.
+    odb_list = list_odb_files(input_cfg['database_folder'])
+    _, script_hash = modify_gather_script(**dict(input_cfg, odb_list=[]))
+    cache_folder = ft.create_non_existent_folder(study_folder /
+                                                 'extraction_cache')
+    references_file = Path(cache_folder, script_hash).with_suffix('.json')
+    cached_vars = []
+    if references_file.exists():
+        with open(references_file) as file:
+            cached_vars = json.load(file)
+
+    # Reuse cached npz files of unchanged Odbs, select the rest. Without
+    # cached output variable references, extract all of them.
+    pending = {}
+    for odb_path in odb_list:
+        key = extraction_cache_key(odb_path, script_hash)
+        cached_npz = Path(cache_folder, key).with_suffix('.npz')
+        if cached_npz.exists() and references_file.exists():
+            shutil.copy(cached_npz, Path(temp_folder,
+                                         odb_stem(odb_path) + '.npz'))
+        else:
+            pending[odb_path] = cached_npz
+    print(len(odb_list) - len(pending), 'Odbs reused from cache,',
+          len(pending), 'to extract')
+    reused = [i for i in odb_list if i not in pending]
+    if not pending:
+        if input_cfg.get('archive_odbs'):
+            archive_study_odbs(config_file, reused)
+        return cached_vars
+
+    # Extract pending Odbs and store their npz files and output
+    # variable references in cache. Remove npz files of previous runs
+    # first, so those of failed extractions are not cached.
+    for odb_path in pending:
+        npz_path = Path(temp_folder, odb_stem(odb_path) + '.npz')
+        if npz_path.exists():
+            os.remove(npz_path)
+    start_time = int(time.time())
+    modified_script, _ = modify_gather_script(
+        **dict(input_cfg, odb_list=list(pending)))
     output_vars = run_abaqus_subprocess(script=modified_script, **input_cfg)
+    for odb_path, cached_npz in pending.items():
+        npz_path = Path(temp_folder, odb_stem(odb_path) + '.npz')
+        if npz_path.exists():
+            shutil.copy(npz_path, cached_npz)
+    output_vars = cached_vars + [i for i in output_vars
+                                 if i not in cached_vars]
+    with open(references_file, 'w') as file:
+        json.dump(output_vars, file)
+    if input_cfg.get('archive_odbs'):
+        archive_study_odbs(config_file, reused + extracted_odbs(
+            pending, start_time))
     return output_vars
 
 
+def extract_inp_amplitudes(inp_path, names=None):
+    """Extract tabular amplitudes data from an inp file.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to extract amplitudes from.
+    names : list of str, optional
+        Names of amplitudes to extract. Default is all tabular ones.
+
+    Returns
+    -------
+    dict
+        Amplitude names : arrays of time, value pairs.
+    """
+    # Gather data lines of each tabular amplitude definition.
+    blocks, current = collections.OrderedDict(), None
+    with open(inp_path, errors='replace') as file:
+        for line in file:
+            if line.startswith('**'):
+                continue
+            if line.startswith('*'):
+                current = None
+                if not line[1:].upper().replace(' ', '').startswith(
+                        'AMPLITUDE'):
+                    continue
+                definition = re.search(r'definition\s*=\s*(\w+)', line, re.I)
+                if definition and definition.group(1).upper() != 'TABULAR':
+                    continue
+                name = re.search(r'name\s*=\s*("[^"]*"|[^,\s]+)', line, re.I)
+                current = name.group(1).strip('"')
+                if names is None or current in names:
+                    blocks[current] = []
+                else:
+                    current = None
+            elif current:
+                blocks[current].append(line)
+
+    # Convert data lines to arrays of time, value pairs.
+    return collections.OrderedDict(
+        (name, np.array(''.join(lines).replace(',', ' ').split(),
+                        dtype=float).reshape(-1, 2))
+        for name, lines in blocks.items())
+
+
+def fit_runtime_model(history, features):
+    """Fit a log-linear model of jobs wallclock time.
+
+    The logarithm of wallclock time is fitted by least squares as a
+    linear function of the features, such as parameters values and
+    logarithm of mesh nodes number.
+
+    Parameters
+    ----------
+    history : pandas DataFrame
+        Past jobs data, with features and wallclockTime columns.
+    features : list of str
+        Columns to use as model features.
+
+    Returns
+    -------
+    dict
+        'features' and fitted 'coefficients', intercept first. None if
+        there are not enough past jobs to fit the model.
+    """
+    history = history.dropna(subset=list(features) + ['wallclockTime'])
+    history = history[history['wallclockTime'] > 0]
+    if len(history) <= len(features) + 1:
+        return None
+    x = np.column_stack([np.ones(len(history))] +
+                        [history[i].to_numpy(float) for i in features])
+    y = np.log(history['wallclockTime'].to_numpy(float))
+    coefficients = np.linalg.lstsq(x, y, rcond=None)[0]
+    return {'features': list(features),
+            'coefficients': [float(i) for i in coefficients]}
+
+
+def harvest_jobs_timing(root_path, recursive=False, processes=None,
+                        cache_file=None):
+    """Get calculation time of all Abaqus jobs in a folder.
+
+    Unlike get_folder_calc_time of abaqus_inside module, Odb files are
+    not opened: job times are parsed from the .dat/.msg job time
+    summary, increments from the .sta file and memory estimates from
+    the .dat file. No Abaqus license is required.
+
+    Files are parsed in parallel processes, and results are cached in
+    a json file, by files modification time. Only new or modified jobs
+    are parsed again.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder containing Abaqus jobs text output files.
+    recursive : bool, optional
+        If True, list files recursively, including subfolders.
+    processes : int, optional
+        Number of parallel processes. Default is cpus number.
+    cache_file : Path, optional
+        Json cache file. Default is .jobs_timing.json in `root_path`.
+
+    Returns
+    -------
+    pandas DataFrame
+        Jobs timing data, one row per job, indexed by job path.
+    """
+    # List jobs paths, without extension, from all text outputs.
+    stats = fc.file_stats(root_path, JOB_TEXT_EXTENSIONS, recursive)
+    jobs_paths = sorted(set(os.path.splitext(i)[0] for i in stats))
+
+    # Load cache and select jobs whose files were modified.
+    if not cache_file:
+        cache_file = Path(root_path, '.jobs_timing.json')
+    cache = {}
+    if Path(cache_file).exists():
+        with open(cache_file) as file:
+            cache = json.load(file)
+    mtimes = {i: [stats[i + ext][1] if i + ext in stats else None
+                  for ext in JOB_TEXT_EXTENSIONS]
+              for i in jobs_paths}
+    outdated = [i for i in jobs_paths
+                if i not in cache or cache[i]['mtimes'] != mtimes[i]]
+
+    # Parse outdated jobs in parallel and update cache.
+    if outdated:
+        with multiprocessing.Pool(processes) as pool:
+            records = pool.map(parse_job_text_outputs, outdated,
+                               chunksize=max(1, len(outdated) // 256))
+        for job_path, record in zip(outdated, records):
+            cache[job_path] = {'mtimes': mtimes[job_path], 'record': record}
+        with open(cache_file, 'w') as file:
+            json.dump(cache, file)
+    print(len(jobs_paths), 'jobs found', len(outdated), 'parsed')
+
+    # Build output table from cached records.
+    records = {i: cache[i]['record'] for i in jobs_paths}
+    return pd.DataFrame.from_dict(records, orient='index')
+
+
+def inject_amplitude_records(inp_files, library_path, amplitude_parameters,
+                             include_folder):
+    """Swap amplitudes of models inp files by records of a library.
+
+    For each model, record number is taken from the parameter value in
+    its *PARAMETER block, and data lines of the amplitude of the same
+    name are replaced by an *Include of the record. Records data are
+    formatted only once, in include files shared by all models using
+    them.
+
+    Parameters
+    ----------
+    inp_files : list of Path
+        Inp files of models to modify.
+    library_path : Path
+        Amplitude library npz file, as saved by save_amplitude_library.
+    amplitude_parameters : dict
+        Parameters : amplitude names pairs. Parameters values are
+        records numbers, in library order.
+    include_folder : Path
+        Folder to write records include files to.
+
+    Returns
+    -------
+    dict
+        Inp files : dict of amplitude names : record names pairs.
+    """
+    # Load library, recording already formatted records.
+    records, metadata = load_amplitude_library(library_path)
+    records_names = metadata['records']
+    include_folder = ft.create_non_existent_folder(include_folder)
+    include_files, output = {}, {}
+    for inp_file in inp_files:
+        with open(inp_file) as file:
+            lines = file.readlines()
+
+        # Read parameters values of model.
+        values, in_parameters = {}, False
+        for line in lines:
+            if line.startswith('*'):
+                in_parameters = line.upper().replace(' ', '').startswith(
+                    '*PARAMETER')
+            elif in_parameters and '=' in line:
+                name, _, value = line.partition('=')
+                values[name.strip()] = value.strip()
+
+        # Replace data lines of each amplitude by record include line.
+        output[inp_file] = {}
+        for parameter, amplitude in amplitude_parameters.items():
+            record = records_names[int(round(float(values[parameter])))]
+            starts = [n for n, i in enumerate(lines)
+                      if i.upper().replace(' ', '').startswith('*AMPLITUDE')
+                      and re.search(r'name\s*=\s*"?' + re.escape(amplitude)
+                                    + r'"?\s*(,|$)', i, re.I)]
+            if not starts:
+                raise ValueError('Amplitude ' + amplitude +
+                                 ' not found in ' + str(inp_file))
+            if record not in include_files:
+                include_path = Path(include_folder, re.sub(
+                    r'[^\w.-]', '_', record) + '.inp')
+                with open(include_path, 'w') as file:
+                    data = records[record].ravel()
+                    full_lines = len(data) // 8 * 8
+                    np.savetxt(file, data[:full_lines].reshape(-1, 8),
+                               fmt='%.10g', delimiter=', ')
+                    if len(data) > full_lines:
+                        np.savetxt(file, data[full_lines:].reshape(1, -1),
+                                   fmt='%.10g', delimiter=', ')
+                include_files[record] = include_path
+            start = end = starts[0] + 1
+            while end < len(lines) and not lines[end].startswith('*'):
+                end += 1
+            lines[start:end] = ['*Include, input=' +
+                                include_files[record].as_posix() + '\n']
+            output[inp_file][amplitude] = record
+        with open(inp_file, 'w') as file:
+            file.write(''.join(lines))
+    return output
+
+
+def iterate_output_frames(stream, chunk_size=2 ** 16):
+    """Parse a subprocess output stream of text and array frames.
+
+    Stream is read incrementally, so each array is available as soon
+    as its frame is complete. Frames are written by stream_arrays
+    function of abaqus_inside module, text lines by log_message.
+
+    Parameters
+    ----------
+    stream : file
+        Binary stream to read from, such as Popen stdout.
+    chunk_size : int, optional
+        Maximum number of bytes to read at once.
+
+    Yields
+    ------
+    str or tuple
+        Text lines, or model name, variable name and array of frames.
+    """
+    read = getattr(stream, 'read1', stream.read)
+    buffer, eof, need_data = bytearray(), False, True
+    while not eof or buffer:
+        if need_data and not eof:
+            chunk = read(chunk_size)
+            eof = not chunk
+            buffer.extend(chunk)
+        need_data = True
+
+        # Yield complete text lines before next frame, or all of them
+        # at end of stream.
+        frame_start = buffer.find(ARRAY_FRAME_MAGIC[:1])
+        text_end = frame_start
+        if frame_start == -1:
+            text_end = len(buffer) if eof else buffer.rfind(b'\n') + 1
+        for line in bytes(buffer[:text_end]).splitlines():
+            yield line.rstrip(b'\r').decode('utf-8', 'replace')
+        del buffer[:text_end]
+        if frame_start == -1:
+            continue
+
+        # Yield frame once its header and data are complete.
+        header_end = buffer.find(b'\n', len(ARRAY_FRAME_MAGIC))
+        if header_end == -1:
+            if eof:
+                raise ValueError('Truncated array frame header')
+            continue
+        header = json.loads(bytes(buffer[len(ARRAY_FRAME_MAGIC):header_end]))
+        dtype = np.dtype(header['dtype'])
+        data_end = (header_end + 1 +
+                    dtype.itemsize * int(np.prod(header['shape'])))
+        if len(buffer) < data_end:
+            if eof:
+                raise ValueError('Truncated array frame of ' +
+                                 header['variable'])
+            continue
+        array = np.frombuffer(buffer[header_end + 1:data_end], dtype=dtype)
+        yield (header['model'], header['variable'],
+               array.reshape(header['shape']))
+        del buffer[:data_end]
+        need_data = False
+
+
+def link_stored_results(config_file):
+    """Reuse stored results of identical simulations of other studies.
+
+    Each model of the study is identified by the content of the study
+    template inp file, its parameters values, as recorded in the
+    parametric csv file, its post-process script and the content of
+    its amplitude records, if any. See study_results_keys. If a global
+    results store, set by the RESULTS_STORE option of config file,
+    already holds extracted npz output of an identical simulation, it
+    is copied into the study temp_files sub-folder, so later writes
+    there do not alter the store, and that model does not need to be
+    run.
+
+    It is called by run_psf before running study jobs.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+
+    Returns
+    -------
+    list of Path
+        Inp files of models without stored results, to be run.
+    """
+    # Read study data and list generated models inp files.
+    input_data = ft.extract_config_from_cfg(config_file)
+    study_name = Path(config_file).stem
+    study_folder = Path.cwd() / study_name
+    template_inp = Path(study_folder, input_data.get('inp_file_name',
+                                                     study_name)
+                        ).with_suffix('.inp')
+    models_folder = Path(input_data.get('analysis_folder', study_folder),
+                         study_name)
+    inp_files = [Path(i) for i in fc.list_files(models_folder, '.inp')
+                 if Path(i).name != template_inp.name]
+    if not input_data.get('results_store'):
+        return inp_files
+
+    # Copy stored npz files of models with identical simulation.
+    stored_files = study_results_keys(config_file)
+    temp_folder = ft.create_non_existent_folder(study_folder / 'temp_files')
+    to_run = []
+    for inp_file in inp_files:
+        model_no = st.extract_number_from_str(inp_file.stem)
+        stored_npz = stored_files.get(model_no)
+        if stored_npz is None or not stored_npz.exists():
+            to_run.append(inp_file)
+            continue
+        npz_path = Path(temp_folder, inp_file.stem + '.npz')
+        shutil.copy(stored_npz, npz_path.with_suffix('.tmp'))
+        os.replace(npz_path.with_suffix('.tmp'), npz_path)
+    print(len(inp_files) - len(to_run), 'models reused from results store,',
+          len(to_run), 'to run')
+    return to_run
+
+
+def list_odb_files(database_folder, recursive=False):
+    """List Odbs of a folder, including archived ones.
+
+    Parameters
+    ----------
+    database_folder : Path
+        Folder containing Odb files or archives.
+    recursive : bool, optional
+        If True, include files in subfolders.
+
+    Returns
+    -------
+    list of str
+        Odb paths, or archive paths of archived Odbs, sorted by model
+        number.
+    """
+    stats = fc.file_stats(database_folder, ['.odb', ODB_ARCHIVE_EXTENSION],
+                          recursive)
+    return [i for i in stats
+            if i.endswith('.odb') or i.endswith('.odb' +
+                                                ODB_ARCHIVE_EXTENSION)
+            and i[:-len(ODB_ARCHIVE_EXTENSION)] not in stats]
+
+
+def load_amplitude_library(library_path):
+    """Load records of an amplitude library.
+
+    Parameters
+    ----------
+    library_path : Path
+        Amplitude library npz file.
+
+    Returns
+    -------
+    dict
+        Record names : arrays of time, value pairs.
+    dict
+        Library metadata, with records names list in 'records' key and
+        records metadata in 'info' key.
+    """
+    with np.load(library_path) as library:
+        metadata = json.loads(str(library[AMPLITUDE_METADATA_KEY]))
+        records = collections.OrderedDict(
+            (name, library[name]) for name in metadata['records'])
+    return records, metadata
+
+
 def parametric_check_odb_files(root_path):
     """Check completeness of Abaqus jobs in a parametric analysis.
 
     This function reads sequentially numbered Abaqus output .log files,
     corresponding to Abaqus jobs. Then it checks if output status is
-    set with COMPLETED Abaqus keyword.
+    set with COMPLETED Abaqus keyword, and reports failure class of
+    jobs that are not, as found by classify_job_failure.
 
     Parameters
     ----------
@@ -514,15 +2018,11 @@ def parametric_check_odb_files(root_path):
         True if no .log file is missing and if all jobs statuses are
         set as COMPLETED. False otherwise.
     """
-    # List all .log files in folder.
-    strings_list = ft.list_files_with_extension(root_path=root_path,
-                                                extension='log',
-                                                full_path=True,
-                                                recursively=False)
+    # List all .log files in folder, sorted by model number.
+    strings_list = fc.list_files(root_path, '.log')
 
     # Extract log files numbers and check consecutiveness.
-    numbers = [st.extract_number_from_str(i) for i in
-               st.sort_strings_by_digit(strings_list)]
+    numbers = list(fc.files_by_model(root_path, ['.log']))
     status_out = True
     check_files, missing_files = mt.check_array_consecutiveness(numbers)
 
@@ -532,14 +2032,20 @@ def parametric_check_odb_files(root_path):
         print('CURRENT NUMBERS: ', numbers)
         status_out = False
 
-    # Report jobs status.
+    # Report jobs status, and failure class of failed ones.
+    failure_classes = collections.Counter()
     for i in strings_list:
         with open(i) as file_read:
             lines_list = file_read.readlines()
-            status = lines_list[-1].split(' ')[-1]
+            status = lines_list[-1].split(' ')[-1] if lines_list else ''
         if status != 'COMPLETED\n':
-            print('WARNING: JOB ', i, ' NOT COMPLETED')
+            failure = classify_job_failure(Path(i).with_suffix(''))
+            failure_classes[failure['class']] += 1
+            print('WARNING: JOB ', i, ' NOT COMPLETED:', failure['class'],
+                  failure['message'] or '')
             status_out = False
+    if failure_classes:
+        print('Failed jobs by class:', dict(failure_classes))
 
     # Report general statuses.
     print('Parametric files in ' + root_path + ' in good condition:',
@@ -547,14 +2053,636 @@ def parametric_check_odb_files(root_path):
     return status_out
 
 
+def parse_job_text_outputs(job_path):
+    """Parse timing, increments and memory data of an Abaqus job.
+
+    Parameters
+    ----------
+    job_path : Path
+        Path of job files, without extension.
+
+    Returns
+    -------
+    dict
+        Job data: systemTime, userTime and wallclockTime in seconds,
+        number of increments and cutbacks, minimum and I/O minimizing
+        memory estimates in MB, and completion status. Values that
+        could not be found are set as None.
+    """
+    output = {'systemTime': None, 'userTime': None, 'wallclockTime': None,
+              'increments': None, 'cutbacks': None, 'minimumMemory': None,
+              'memoryToMinimizeIo': None, 'completed': False}
+
+    # Search job time summary and memory estimate in dat and msg files,
+    # memory mapping them to avoid reading large files into memory.
+    for extension in ['.dat', '.msg']:
+        file_path = str(job_path) + extension
+        if not os.path.exists(file_path) or not os.path.getsize(file_path):
+            continue
+        with open(file_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            summary = data.rfind(b'JOB TIME SUMMARY')
+            if summary != -1 and output['wallclockTime'] is None:
+                tail = data[summary:summary + 1024]
+                for key, pattern in JOB_TIME_PATTERNS.items():
+                    match = re.search(pattern, tail)
+                    if match:
+                        output[key] = float(match.group(1))
+            match = re.search(MEMORY_ESTIMATE_PATTERN, data, re.DOTALL)
+            if match and output['minimumMemory'] is None:
+                output['minimumMemory'] = float(match.group(1))
+                output['memoryToMinimizeIo'] = float(match.group(2))
+
+    # Count converged increments and cutbacks, and check status in sta.
+    sta_path = str(job_path) + '.sta'
+    if os.path.exists(sta_path):
+        with open(sta_path, errors='replace') as file:
+            sta_text = file.read()
+        attempts = STA_INCREMENT_PATTERN.findall(sta_text)
+        output['cutbacks'] = sum(1 for i in attempts if i[1])
+        output['increments'] = len(attempts) - output['cutbacks']
+        output['completed'] = 'COMPLETED SUCCESSFULLY' in sta_text
+    return output
+
+
+def queue_server_time(queue_folder):
+    """Get current time of the file server of a jobs queue folder.
+
+    A temporary probe file of this worker is touched, so its
+    modification time is set by the file server, as those of heartbeats
+    are. Leases are
+    compared against it, instead of local time, so clock skew between
+    hosts does not expire live leases.
+
+    Parameters
+    ----------
+    queue_folder : Path
+        Queue folder, as created by enqueue_abaqus_jobs.
+
+    Returns
+    -------
+    float
+        File server time, in seconds since epoch.
+    """
+    probe = Path(queue_folder, '.clock-' + socket.gethostname() + '-' +
+                 str(os.getpid()))
+    probe.touch()
+    os.utime(probe)
+    server_time = probe.stat().st_mtime
+    os.remove(probe)
+    return server_time
+
+
+def reclaim_stale_queue_entries(queue_folder, lease_seconds=600):
+    """Return claimed queue entries with expired leases to pending.
+
+    Workers refresh the modification time of their claimed entries as
+    heartbeat. Entries not refreshed within `lease_seconds` of file
+    server time, for instance because their worker host died, are
+    moved back to the pending sub-folder, without their worker suffix.
+
+    Parameters
+    ----------
+    queue_folder : Path
+        Queue folder, as created by enqueue_abaqus_jobs.
+    lease_seconds : float, optional
+        Seconds without heartbeat after which a claim is stale.
+
+    Returns
+    -------
+    int
+        Number of reclaimed entries.
+    """
+    reclaimed = 0
+    now = queue_server_time(queue_folder)
+    for entry in Path(queue_folder, 'claimed').glob('*.json'):
+        try:
+            if now - entry.stat().st_mtime < lease_seconds:
+                continue
+            os.rename(entry, Path(queue_folder, 'pending',
+                                  entry.stem.partition('@')[0] + '.json'))
+        except OSError:
+            continue
+        print('Reclaimed stale queue entry', entry.name)
+        reclaimed += 1
+    return reclaimed
+
+
+def record_study_runtimes(config_file):
+    """Log actual runtimes of a study and add them to runtime history.
+
+    Wallclock times are harvested from study jobs text outputs, and
+    added to the runtime log written by schedule_study_jobs, next to
+    predicted ones. Jobs data is appended to the runtime history file
+    set by RUNTIME_HISTORY option of config file, for future fits.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+
+    Returns
+    -------
+    pandas DataFrame
+        Runtime log, with predicted and actual wallclock times.
+    """
+    # Read runtime log and harvest actual jobs times.
+    input_data = ft.extract_config_from_cfg(config_file)
+    study_name = Path(config_file).stem
+    log_path = Path(Path.cwd(), study_name, study_name + '_runtime_log.csv')
+    runtime_log = pd.read_csv(log_path)
+    models_folder = Path(input_data.get('analysis_folder',
+                                        Path.cwd() / study_name), study_name)
+    timing = harvest_jobs_timing(models_folder)
+    timing.index = [Path(i).name for i in timing.index]
+    runtime_log['wallclockTime'] = runtime_log['JOB'].map(
+        timing.get('wallclockTime', pd.Series(dtype=float)))
+    runtime_log.to_csv(log_path, index=False)
+
+    # Report prediction error and append jobs to runtime history.
+    measured = runtime_log.dropna(subset=['PREDICTED', 'wallclockTime'])
+    if len(measured):
+        error = np.abs(np.log(measured['PREDICTED'] /
+                              measured['wallclockTime']))
+        print('Runtime prediction mean log error:', round(error.mean(), 3))
+    if input_data.get('runtime_history'):
+        history_path = Path(input_data['runtime_history'])
+        new_rows = runtime_log.dropna(subset=['wallclockTime']).assign(
+            STUDY=study_name)
+        if history_path.exists():
+            new_rows = pd.concat([pd.read_csv(history_path), new_rows],
+                                 ignore_index=True)
+        new_rows.to_csv(history_path, index=False)
+    return runtime_log
+
+
+def restore_odb(odb_path, cache_folder=None, max_bytes=None):
+    """Decompress an archived Odb into local cache, if not there yet.
+
+    Odbs are restored to a sub-folder of cache named after their
+    checksum, keeping their file name, and verified against it. Least
+    recently used Odbs are removed when cache grows beyond its size.
+    Same as restore_archived_odb function of abaqus_inside module, for
+    extract_fea_data to restore Odbs before running Abaqus, whose
+    Python may lack lzma module.
+
+    Parameters
+    ----------
+    odb_path : Path
+        Odb archive path, or path of archived Odb.
+    cache_folder : Path, optional
+        Cache folder. Default is ODB_CACHE_FOLDER.
+    max_bytes : int, optional
+        Cache size. Default is ODB_CACHE_MAX_BYTES.
+
+    Returns
+    -------
+    Path
+        Path of restored Odb.
+    """
+    archive_path = str(odb_path)
+    if not archive_path.endswith(ODB_ARCHIVE_EXTENSION):
+        archive_path += ODB_ARCHIVE_EXTENSION
+    with open(archive_path + '.json') as file:
+        metadata = json.load(file)
+    cached_path = Path(cache_folder or ODB_CACHE_FOLDER,
+                       metadata['sha256'][:16], metadata['name'])
+    temp_path = Path(str(cached_path) + '.part')
+
+    # Decompress archive, unless a complete copy is cached.
+    if (not cached_path.exists()
+            or cached_path.stat().st_size != metadata['size']):
+        ft.create_non_existent_folder(cached_path.parent)
+        digest = hashlib.sha256()
+        decompressor = lzma.LZMADecompressor()
+        with open(archive_path, 'rb') as source, \
+                open(temp_path, 'wb') as target:
+            for chunk in iter(lambda: source.read(2 ** 24), b''):
+                data = decompressor.decompress(chunk)
+                digest.update(data)
+                target.write(data)
+        if digest.hexdigest() != metadata['sha256']:
+            os.remove(temp_path)
+            raise IOError('Checksum mismatch restoring ' + archive_path)
+        os.replace(temp_path, cached_path)
+
+    # Mark Odb as used, keeping its original modification time.
+    os.utime(cached_path, ns=(time.time_ns(), metadata['mtime_ns']))
+    evict_cached_odbs(cache_folder, max_bytes, keep=[cached_path])
+    return cached_path
+
+
+def results_store_key(inp_hash, parameters, amplitudes=None,
+                      script_hash=None):
+    """Build results store key of a model simulation.
+
+    Parameters
+    ----------
+    inp_hash : str
+        Sha1 hex digest of template inp file the model is generated
+        from.
+    parameters : dict
+        Parameters names : values pairs of the model.
+    amplitudes : dict, optional
+        Amplitude names : arrays of amplitude records injected in the
+        model, so models using different records data have different
+        keys, even with the same record numbers.
+    script_hash : str, optional
+        Hash of post-process script or extraction plan, so studies
+        extracting different outputs have different keys.
+
+    Returns
+    -------
+    str
+        Relative path of model results in store, without suffix: a
+        folder named after the inp content hash, and a file named
+        after the parameters, amplitudes data and script hash.
+    """
+    parameters_vector = ','.join(k + '=' + '%.12g' % float(v)
+                                 for k, v in sorted(parameters.items()))
+    for name, array in sorted((amplitudes or {}).items()):
+        array = np.ascontiguousarray(array, dtype='<f8')
+        parameters_vector += ',' + name + ':' + hashlib.sha1(
+            array.tobytes()).hexdigest()
+    if script_hash:
+        parameters_vector += ',script:' + script_hash
+    parameters_hash = hashlib.sha1(
+        parameters_vector.encode('utf-8')).hexdigest()
+    return inp_hash + '/' + parameters_hash
+
+
+def retry_failed_jobs(root_path, retry_policy=None, max_retries=3,
+                      **kwargs):
+    """Classify failed jobs of a folder and resubmit retryable ones.
+
+    Jobs whose .log file does not end with COMPLETED are classified by
+    classify_job_failure, and run again by run_abaqus_job_with_retries
+    if their failure class policy allows it.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder containing inp, log and Odb files.
+    retry_policy : dict, optional
+        Failure classes : policies, as RETRY_POLICY, which is default.
+    max_retries : int, optional
+        Maximum number of retries of each job, of any class.
+    **kwargs
+        Keyword arguments of run_abaqus_job, such as cpus or command.
+
+    Returns
+    -------
+    dict
+        Failed jobs names : results, as returned by
+        run_abaqus_job_with_retries, or failure class dict if they were
+        not retried.
+    """
+    if retry_policy is None:
+        retry_policy = RETRY_POLICY
+    first_cpus = kwargs.pop('cpus', 1)
+    output = {}
+    for log_path in map(Path, fc.list_files(root_path, '.log')):
+        with open(log_path) as file:
+            if file.read().split()[-1:] == ['COMPLETED']:
+                continue
+        failure = classify_job_failure(log_path.with_suffix(''))
+        policy = retry_policy.get(failure['class'], {})
+        inp_path = log_path.with_suffix('.inp')
+        if not policy.get('retries') or not inp_path.exists():
+            print('WARNING: JOB', log_path.stem, 'NOT RETRIED:',
+                  failure['class'])
+            output[log_path.stem] = failure
+            continue
+
+        # Count previous run as first attempt of its failure class.
+        time.sleep(policy.get('delay', 0))
+        cpus = max(1, int(first_cpus * policy.get('cpus_factor', 1)))
+        output[log_path.stem] = run_abaqus_job_with_retries(
+            inp_path, cpus=cpus, retry_policy=retry_policy,
+            max_retries=max_retries - 1,
+            previous_failures=[failure['class']], **kwargs)
+    return output
+
+
+def run_abaqus_job(inp_path, working_folder=None, cpus=1,
+                   command='abaqus', scratch_folder=None,
+                   transfer_executor=None, memory=None, old_job=None):
+    """Run an Abaqus job from an inp file and wait for it to finish.
+
+    Solver messages are written to a .log file named after the job,
+    so job status can be checked by parametric_check_odb_files.
+
+    If a scratch folder is given, the job runs in a job sub-folder of
+    it, typically on a fast local disk, and its files are moved to the
+    working folder afterwards by transfer_job_results. If a transfer
+    executor is also given, the transfer runs in background and the
+    function returns as soon as the solver finishes.
+
+    If an old job is given, its restart files are copied to the run
+    folder and the job restarts from its results.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file of model to run.
+    working_folder : Path, optional
+        Folder to run job in. Default is inp file folder. If different,
+        inp file is copied to it.
+    cpus : int, optional
+        Number of cpus of the job.
+    command : str, optional
+        Abaqus command line executable.
+    scratch_folder : Path, optional
+        Local folder to stage and run the job in.
+    transfer_executor : concurrent.futures.Executor, optional
+        Executor to move scratch results in background with.
+    memory : int, optional
+        Memory of the job, in MB. Default is Abaqus environment one.
+    old_job : Path, optional
+        Inp file, or any file, of job to restart from.
+
+    Returns
+    -------
+    dict
+        Job name, status (COMPLETED or FAILED), process return code and
+        wallclock time in seconds. Failed jobs have a 'failure' dict,
+        as returned by classify_job_failure. If results are transferred
+        in background, 'transfer' holds the transfer future.
+    """
+    # Set job name and working folder, and staging folder to run in.
+    inp_path = Path(inp_path)
+    job_name = inp_path.stem
+    if working_folder is None:
+        working_folder = inp_path.parent
+    ft.create_non_existent_folder(working_folder)
+    run_folder = Path(working_folder)
+    if scratch_folder:
+        run_folder = Path(scratch_folder, job_name)
+        ft.create_non_existent_folder(run_folder)
+
+    # Copy inp file to run folder, if needed.
+    if Path(run_folder, inp_path.name) != inp_path:
+        shutil.copy(inp_path, Path(run_folder, inp_path.name))
+
+    # Copy restart files of old job to run folder, if needed.
+    options = ' cpus=' + str(cpus)
+    if old_job:
+        old_job = Path(old_job)
+        for extension in RESTART_EXTENSIONS:
+            restart_file = old_job.with_suffix(extension)
+            if (restart_file.exists()
+                    and restart_file.parent != run_folder):
+                shutil.copy(restart_file, Path(run_folder,
+                                               restart_file.name))
+        options += ' oldjob=' + old_job.stem
+
+    # Run job interactively, overwriting files of previous runs without
+    # prompting, logging its output, and check status.
+    start_time = time.time()
+    log_path = Path(run_folder, job_name).with_suffix('.log')
+    if memory:
+        options += ' memory="' + str(int(memory)) + ' mb"'
+    with open(log_path, 'w') as log_file:
+        returncode = subprocess.call(command + ' job=' + job_name +
+                                     ' input=' + inp_path.name + options +
+                                     ' interactive ask_delete=OFF',
+                                     shell=True, cwd=str(run_folder),
+                                     stdout=log_file,
+                                     stderr=subprocess.STDOUT)
+    with open(log_path) as log_file:
+        lines_list = log_file.read().split()
+    completed = lines_list[-1:] == ['COMPLETED']
+    output = {'job': job_name, 'returncode': returncode,
+              'status': 'COMPLETED' if completed else 'FAILED',
+              'wallclock': time.time() - start_time}
+    if not completed:
+        output['failure'] = classify_job_failure(Path(run_folder, job_name))
+
+    # Move staged files back to working folder.
+    if scratch_folder and transfer_executor:
+        output['transfer'] = transfer_executor.submit(
+            transfer_job_results, run_folder, working_folder)
+    elif scratch_folder:
+        transfer_job_results(run_folder, working_folder)
+    return output
+
+
+def run_abaqus_job_with_retries(inp_path, working_folder=None, cpus=1,
+                                retry_policy=None, max_retries=3,
+                                previous_failures=(), wait=None, **kwargs):
+    """Run an Abaqus job, retrying it according to its failure class.
+
+    Failed jobs are classified by classify_job_failure, and retried
+    after the delay of their class policy, with cpus scaled by its
+    cpus factor, until their class retries or `max_retries` run out.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file of model to run.
+    working_folder : Path, optional
+        Folder to run job in. Default is inp file folder.
+    cpus : int, optional
+        Number of cpus of the first attempt.
+    retry_policy : dict, optional
+        Failure classes : policies. Default is RETRY_POLICY. An empty
+        dict disables retries.
+    max_retries : int, optional
+        Maximum number of retries, of any class.
+    previous_failures : list of str, optional
+        Failure classes of previous attempts, counted against their
+        class retries.
+    wait : callable, optional
+        Function called with seconds to wait before a retry and cpus
+        of the retry, such as one giving back cpus to a budget while
+        waiting. Default is time.sleep of the seconds.
+    **kwargs
+        Other keyword arguments of run_abaqus_job.
+
+    Returns
+    -------
+    dict
+        Result of last attempt, as returned by run_abaqus_job, with
+        'attempts' holding failure classes of failed attempts.
+    """
+    if retry_policy is None:
+        retry_policy = RETRY_POLICY
+    failures = list(previous_failures)
+    job_name = Path(inp_path).stem
+    while True:
+        result = run_abaqus_job(inp_path, working_folder, cpus, **kwargs)
+        if result['status'] == 'COMPLETED':
+            break
+        failure_class = result['failure']['class']
+        failures.append(failure_class)
+        policy = retry_policy.get(failure_class, {})
+        if (failures.count(failure_class) > policy.get('retries', 0)
+                or len(failures) - len(previous_failures) > max_retries):
+            break
+
+        # Wait for failed attempt files, and remove its lock file.
+        if 'transfer' in result:
+            result['transfer'].result()
+        folders = [working_folder or Path(inp_path).parent]
+        if kwargs.get('scratch_folder'):
+            folders.append(Path(kwargs['scratch_folder'], job_name))
+        for folder in folders:
+            lock_path = Path(folder, job_name + '.lck')
+            if lock_path.exists():
+                os.remove(lock_path)
+        cpus = max(1, int(cpus * policy.get('cpus_factor', 1)))
+        print('Retrying job', job_name, 'after', failure_class,
+              'failure, with', cpus, 'cpus')
+        if wait:
+            wait(policy.get('delay', 0), cpus)
+        else:
+            time.sleep(policy.get('delay', 0))
+    result['attempts'] = failures
+    return result
+
+
+def run_abaqus_jobs(inp_files, analysis_folder=None, cpus=1,
+                    scratch_folder=None, transfer_workers=2,
+                    command='abaqus', resources=None, total_cpus=None,
+                    old_job=None, retry_policy=None, max_retries=3,
+                    memory=None):
+    """Run a list of Abaqus jobs, in the given order.
+
+    If a scratch folder is given, jobs run staged in it, and their
+    results are moved to the analysis folder by a pool of background
+    transfer threads, overlapping with next jobs computation.
+
+    Jobs run one after the other, unless a cpus budget is given. Then,
+    next job is launched as soon as enough cpus are free, so several
+    jobs may run at once.
+
+    Failed jobs are retried according to their failure class, by
+    run_abaqus_job_with_retries. While a job waits to be retried, its
+    cpus are given back to the budget.
+
+    Parameters
+    ----------
+    inp_files : list of Path
+        Inp files of models to run.
+    analysis_folder : Path, optional
+        Folder to write jobs results to. Default is inp files folder.
+    cpus : int, optional
+        Number of cpus of each job.
+    scratch_folder : Path, optional
+        Local folder to stage and run jobs in.
+    transfer_workers : int, optional
+        Maximum number of concurrent background transfers.
+    command : str, optional
+        Abaqus command line executable.
+    resources : dict, optional
+        Jobs names : dict of 'cpus' and 'memory' pairs, overriding
+        `cpus` for each job, as returned by size_study_jobs.
+    total_cpus : int, optional
+        Cpus budget shared by concurrently running jobs.
+    old_job : Path, optional
+        Inp file of job for all jobs to restart from.
+    retry_policy : dict, optional
+        Failure classes : policies. Default is RETRY_POLICY. An empty
+        dict disables retries.
+    max_retries : int, optional
+        Maximum number of retries of each job, of any class.
+    memory : int, optional
+        Memory of each job, in MB, unless set by `resources`. Default
+        is Abaqus environment one.
+
+    Returns
+    -------
+    list of dict
+        Results of each job, as returned by
+        run_abaqus_job_with_retries.
+    """
+    def run_one(number, inp_file, job_cpus, job_memory, executor):
+        """Run a job, and give back its cpus to budget when done."""
+        held_cpus = [min(job_cpus, total_cpus or job_cpus)]
+
+        def wait_for_retry(seconds, retry_cpus):
+            """Give back cpus to budget while waiting to retry a job."""
+            with budget:
+                free_cpus[0] += held_cpus[0]
+                held_cpus[0] = 0
+                budget.notify_all()
+            time.sleep(seconds)
+            with budget:
+                budget.wait_for(lambda: free_cpus[0] >= min(retry_cpus,
+                                                            total_cpus))
+                held_cpus[0] = min(retry_cpus, total_cpus)
+                free_cpus[0] -= held_cpus[0]
+
+        try:
+            working_folder = analysis_folder or Path(inp_file).parent
+            results[number] = run_abaqus_job_with_retries(
+                inp_file, working_folder, job_cpus, retry_policy,
+                max_retries, wait=wait_for_retry if total_cpus else None,
+                command=command, scratch_folder=scratch_folder,
+                transfer_executor=executor, memory=job_memory,
+                old_job=old_job)
+        finally:
+            with budget:
+                free_cpus[0] += held_cpus[0]
+                budget.notify_all()
+
+    results = [None] * len(inp_files)
+    budget, free_cpus = threading.Condition(), [total_cpus or 0]
+    threads = []
+    with concurrent.futures.ThreadPoolExecutor(transfer_workers) as executor:
+        for number, inp_file in enumerate(inp_files):
+            job_resources = (resources or {}).get(Path(inp_file).stem, {})
+            job_cpus = job_resources.get('cpus', cpus)
+            job_memory = job_resources.get('memory') or memory
+            print('Job number', number + 1, 'of', len(inp_files), 'with',
+                  job_cpus, 'cpus')
+            if not total_cpus:
+                run_one(number, inp_file, job_cpus, job_memory, executor)
+                continue
+
+            # Wait for enough free cpus and launch job in a thread.
+            with budget:
+                budget.wait_for(
+                    lambda: free_cpus[0] >= min(job_cpus, total_cpus))
+                free_cpus[0] -= min(job_cpus, total_cpus)
+            thread = threading.Thread(target=run_one,
+                                      args=(number, inp_file, job_cpus,
+                                            job_memory, executor))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        # Wait for pending transfers, reporting failed ones.
+        for result in results:
+            if result and 'transfer' in result:
+                try:
+                    result['transfer'] = result['transfer'].result()
+                except (IOError, OSError) as error:
+                    print('WARNING: TRANSFER OF', result['job'], 'FAILED:',
+                          error)
+                    result['transfer'] = None
+    return results
+
+
 def run_abaqus_subprocess(script, database_folder=None, gui=False,
-                          verbose=False, **kwargs):
+                          verbose=False, worker_port=None,
+                          frames_callback=None, **kwargs):
 
     """Run script in Abaqus subprocess and return data logged in it.
 
     If a database folder is provided, additional commands are passed,
     to chdir to that folder, in order to create temporary files there.
 
+    If a worker port is provided, the script is executed by a running
+    CAE worker, started by start_cae_worker, instead of a new Abaqus
+    subprocess.
+
+    If a frames callback is provided, subprocess output is parsed while
+    it runs, and each array frame written by stream_arrays function of
+    abaqus_inside module is passed to the callback. Streaming needs a
+    subprocess, so worker port is ignored then.
+
     Parameters
     ----------
     script : Path
@@ -566,6 +2694,11 @@ def run_abaqus_subprocess(script, database_folder=None, gui=False,
         debugging purposes.
     verbose : bool, optional
         If True, print gathered output variable references.
+    worker_port : int, optional
+        Local port of a running CAE worker to execute script with.
+    frames_callback : callable, optional
+        Function of model name, variable name and array, called for
+        each streamed array.
     **kwargs : dict
         Allows to pass same argument values to different functions.
 
@@ -577,6 +2710,21 @@ def run_abaqus_subprocess(script, database_folder=None, gui=False,
     # Normalize script path to string. Select Abaqus executable for cmd.
     print('*** RUNNING ' + script.name + ' ***')
     script = str(script)
+
+    # Optionally, execute script in warm CAE worker session.
+    if worker_port and not frames_callback:
+        argv, cwd = [], None
+        if database_folder:
+            cwd = str(database_folder)
+            argv = ['--', cwd]
+        response = send_to_cae_worker(worker_port, script=script,
+                                      argv=argv, cwd=cwd)
+        print('*** DONE EXECUTING IN CAE WORKER ***')
+        print('ERROR:', response['error'] or None)
+        out_var_references = response['output'].splitlines()
+        if verbose:
+            pprint.pprint(out_var_references)
+        return [i for i in out_var_references if i and ' ' not in i]
     if gui:
         command = 'abaqus cae script='
     else:
@@ -590,15 +2738,27 @@ def run_abaqus_subprocess(script, database_folder=None, gui=False,
         process = r'SET original_folder=%cd% & cd ' + database_folder + \
                   ' & ECHO %cd% & cd & ' + command + script + ' -- %cd%'
 
-    # Launch subprocess and wait for completion
+    # Launch subprocess and wait for completion. Optionally, pass
+    # streamed arrays to callback while it runs.
     p = subprocess.Popen(process, shell=True, stdout=subprocess.PIPE)
-    out, err = p.communicate()
+    if frames_callback:
+        out_var_references = []
+        for item in iterate_output_frames(p.stdout):
+            if isinstance(item, tuple):
+                frames_callback(*item)
+            else:
+                out_var_references.append(item)
+        p.wait()
+        err = None
+    else:
+        out, err = p.communicate()
+        out_var_references = [i.decode("utf-8")
+                              for i in out.split(b'\r\n')]
     print('*** DONE EXECUTING ABAQUS SUBPROCESS ***')
     print('ERROR:', err)
 
     # Get Abaqus logs and print them if verbose is True. Filter output
     # variable references, strip sys argv and empy spaces.
-    out_var_references = [i.decode("utf-8") for i in out.split(b'\r\n')]
     if verbose:
         pprint.pprint(out_var_references)
     paths_to_strip = [Path.cwd()]
@@ -615,6 +2775,27 @@ def run_psf(input_var, **kwargs):
     If a study project configuration file is passed as input, the
     algorithm builds Path of psf file first.
 
+    If the psf file executes jobs restarting from a base analysis, as
+    written by create_parametric_files with RESTART_BASE_STEPS option,
+    the base analysis is run first in the base sub-folder, and its
+    restart files are copied next to the psf file.
+
+    If a config file with RESULTS_STORE option is passed, models with
+    stored results are linked by link_stored_results, and only the
+    rest of them are run, without the psf file. Then, cpus and memory
+    of each job are chosen from its model size by size_study_jobs,
+    calibrated by the benchmarks csv file of JOB_BENCHMARKS option,
+    and jobs share the CPU_NUMBERS cpus budget.
+
+    Jobs are retried according to RETRY_POLICY: by run_abaqus_jobs,
+    or by retry_failed_jobs once the psf file finishes.
+
+    For config files, runtimes of jobs are predicted by
+    schedule_study_jobs, which also sets the order of jobs run without
+    the psf file, and logged with actual ones by record_study_runtimes
+    once jobs finish. Jobs status and timings are then recorded in
+    the study catalog by update_study_catalog.
+
     Parameters
     ----------
     input_var : Path
@@ -626,18 +2807,674 @@ def run_psf(input_var, **kwargs):
     None
     """
     # Build psf Path
+    config_file = None
     if Path(input_var).suffix == '.psf':
         psf_file = str(input_var)
     if Path(input_var).suffix == '.cfg':
+        config_file = input_var
         config_data = ft.extract_config_from_cfg(input_var)
+
+        # Predict jobs runtimes, longest first. With a results store,
+        # link stored results and run only the rest of jobs, instead
+        # of all of them through psf file.
+        to_run = link_stored_results(input_var)
+        if to_run:
+            to_run = schedule_study_jobs(input_var, to_run)
+        if config_data.get('results_store'):
+            models_folder = Path(config_data['analysis_folder'],
+                                 input_var.stem)
+            cpus = int(config_data.get('cpu_numbers', 1))
+            resources = size_study_jobs(
+                to_run, config_data.get('job_benchmarks') or None, cpus)
+            if to_run and config_data.get('restart_base_steps'):
+                base_inp = Path(models_folder, 'base',
+                                input_var.stem + '_base.inp')
+                run_restart_study_jobs(base_inp, to_run, models_folder,
+                                       cpus=cpus, resources=resources,
+                                       total_cpus=cpus)
+            elif to_run:
+                run_abaqus_jobs(to_run, models_folder, cpus=cpus,
+                                resources=resources, total_cpus=cpus)
+            if to_run:
+                record_study_runtimes(input_var)
+            update_study_catalog(input_var, ['jobs'])
+            return
         psf_file = str(Path(config_data['analysis_folder'],
                             input_var.stem, input_var.stem).with_suffix('.psf'))
 
+    # Run base analysis of restarted jobs and stage its restart files.
+    with open(psf_file) as file:
+        psf_text = file.read()
+    psf_folder = Path(psf_file).parent
+    cpus = re.search(r'cpus=(\d+)', psf_text)
+    cpus = int(cpus.group(1)) if cpus else 1
+    old_job = re.search(r'oldjob=([^\s"]+)', psf_text)
+    base_job = None
+    if old_job:
+        base_inp = Path(psf_folder, 'base', old_job.group(1) + '.inp')
+        base_job = run_restart_base_job(base_inp, cpus=cpus)
+        for extension in RESTART_EXTENSIONS:
+            restart_file = base_job.with_suffix(extension)
+            if restart_file.exists():
+                shutil.copy(restart_file, Path(psf_folder,
+                                               restart_file.name))
+
     # Run psf file in no-GUI environment and wait for it to finish
     print('RUNING', psf_file)
     p = subprocess.Popen('abaqus script=' + psf_file, shell=True)
     p.communicate()
 
+    # Retry failed jobs, according to their failure class, log actual
+    # runtimes and record jobs in study catalog.
+    retry_failed_jobs(psf_folder, cpus=cpus, old_job=base_job)
+    if config_file and to_run:
+        record_study_runtimes(config_file)
+    if config_file:
+        update_study_catalog(config_file, ['jobs'])
+
+
+def run_queue_worker(queue_folder, lease_seconds=600, heartbeat_seconds=60,
+                     max_jobs=None, command='abaqus', scratch_folder=None,
+                     retry_policy=None, max_retries=3):
+    """Run jobs from a file-based jobs queue until it is empty.
+
+    Several workers, from one or several hosts sharing the queue
+    folder, can run at the same time. While a job runs, a background
+    thread refreshes its claimed entry modification time as heartbeat.
+    If the lease is lost, because the entry was reclaimed, the job is
+    terminated and abandoned, with no retries, as other worker may run
+    it. Finished entries are moved to the done sub-folder, with their
+    status, host and timing added. Entries whose job could not be run,
+    because of an error, are moved to the failed sub-folder instead.
+
+    Parameters
+    ----------
+    queue_folder : Path
+        Queue folder, as created by enqueue_abaqus_jobs.
+    lease_seconds : float, optional
+        Seconds without heartbeat after which a claim is stale.
+    heartbeat_seconds : float, optional
+        Seconds between heartbeats. Must be smaller than lease.
+    max_jobs : int, optional
+        If given, maximum number of jobs to run.
+    command : str, optional
+        Abaqus command line executable.
+    scratch_folder : Path, optional
+        Local folder of this host to stage and run jobs in.
+    retry_policy : dict, optional
+        Failure classes : policies. Default is RETRY_POLICY. An empty
+        dict disables retries.
+    max_retries : int, optional
+        Maximum number of retries of each job, of any class.
+
+    Returns
+    -------
+    list of dict
+        Results of jobs run by this worker, as returned by
+        run_abaqus_job_with_retries.
+    """
+    def heartbeat(entry_path, entry, stop_event, lost_event):
+        """Refresh entry modification time, until job is finished or
+        entry is reclaimed, then terminating its job."""
+        while not stop_event.wait(heartbeat_seconds):
+            try:
+                os.utime(entry_path)
+            except OSError:
+                print('WARNING: LEASE LOST FOR', entry_path.name)
+                lost_event.set()
+                job_name = Path(entry['inp']).stem
+                run_folder = (Path(scratch_folder, job_name) if scratch_folder
+                              else Path(entry['analysis_folder']))
+                subprocess.call(command + ' terminate job=' + job_name,
+                                shell=True, cwd=str(run_folder))
+                return
+
+    def wait_for_retry(seconds, cpus):
+        """Wait to retry a job, unless its lease was lost."""
+        if lost_event.wait(seconds):
+            raise RuntimeError('Lease lost, job abandoned')
+
+    # Claim entries one at a time, until none is pending.
+    results = []
+    while max_jobs is None or len(results) < max_jobs:
+        entry_path = claim_queue_entry(queue_folder, lease_seconds)
+        if entry_path is None:
+            break
+        with open(entry_path) as file:
+            entry = json.load(file)
+
+        # Run job while heartbeat thread keeps lease alive.
+        stop_event, lost_event = threading.Event(), threading.Event()
+        beat = threading.Thread(target=heartbeat,
+                                args=(entry_path, entry, stop_event,
+                                      lost_event), daemon=True)
+        beat.start()
+        state = 'done'
+        try:
+            result = run_abaqus_job_with_retries(
+                entry['inp'], entry['analysis_folder'], entry['cpus'],
+                retry_policy, max_retries, wait=wait_for_retry,
+                command=command, scratch_folder=scratch_folder,
+                memory=entry.get('memory'))
+        except Exception as error:
+            state = 'failed'
+            result = {'job': Path(entry['inp']).stem, 'status': 'ERROR',
+                      'error': repr(error)}
+        finally:
+            stop_event.set()
+            beat.join()
+
+        # Abandon entries with lost lease, now owned by other worker.
+        if lost_event.is_set():
+            print('WARNING: JOB', Path(entry['inp']).stem, 'ABANDONED')
+            results.append({'job': Path(entry['inp']).stem,
+                            'status': 'ABANDONED'})
+            continue
+
+        # Write result into entry and move it to done or failed
+        # sub-folder, without worker suffix.
+        entry.update(result)
+        entry['host'] = socket.gethostname()
+        done_path = Path(ft.create_non_existent_folder(
+            Path(queue_folder, state)),
+            entry_path.stem.partition('@')[0] + '.json')
+        with open(done_path.with_suffix('.tmp'), 'w') as file:
+            json.dump(entry, file)
+        os.replace(done_path.with_suffix('.tmp'), done_path)
+        if entry_path.exists():
+            os.remove(entry_path)
+        print('Job', result['job'], result['status'], 'on', entry['host'])
+        results.append(result)
+    return results
+
+
+def run_restart_base_job(base_inp, base_folder=None, **kwargs):
+    """Run base analysis of a restart study, if not done already.
+
+    Base analysis is skipped if its log file reports it as completed,
+    so interrupted studies do not repeat it.
+
+    Parameters
+    ----------
+    base_inp : Path
+        Inp file of base analysis.
+    base_folder : Path, optional
+        Folder to run base analysis in. Default is inp file folder.
+    **kwargs : dict
+        Options of run_abaqus_job, such as cpus, command or memory.
+
+    Returns
+    -------
+    Path
+        Inp file path of base job in its folder, to restart from.
+    """
+    base_inp = Path(base_inp)
+    base_folder = Path(base_folder or base_inp.parent)
+    base_log = Path(base_folder, base_inp.stem).with_suffix('.log')
+    completed = False
+    if base_log.exists():
+        with open(base_log) as log_file:
+            completed = log_file.read().split()[-1:] == ['COMPLETED']
+    if not completed:
+        base_result = run_abaqus_job(base_inp, base_folder, **kwargs)
+        if base_result['status'] != 'COMPLETED':
+            raise RuntimeError('Base analysis ' + base_inp.stem +
+                               ' failed, see ' + str(base_log))
+    return Path(base_folder, base_inp.name)
+
+
+def run_restart_study_jobs(base_inp, inp_files, analysis_folder=None,
+                           **kwargs):
+    """Run a base analysis once, and then jobs restarting from it.
+
+    Base analysis is skipped if its log file reports it as completed,
+    so interrupted studies do not repeat it. Base and restarted inp
+    files are typically created by create_parametric_files with the
+    RESTART_BASE_STEPS configuration.
+
+    Parameters
+    ----------
+    base_inp : Path
+        Inp file of base analysis.
+    inp_files : list of Path
+        Inp files of models restarting from base analysis.
+    analysis_folder : Path, optional
+        Folder to write jobs results to. Default is inp files folder.
+    **kwargs : dict
+        Options of run_abaqus_jobs, such as cpus or scratch_folder.
+
+    Returns
+    -------
+    list of dict
+        Results of each restarted job, as returned by run_abaqus_job.
+    """
+    # Run base analysis in its own folder, if not done already.
+    base_folder = Path(base_inp).parent
+    if analysis_folder:
+        base_folder = Path(analysis_folder, 'base')
+    base_kwargs = {k: v for k, v in kwargs.items()
+                   if k in ('cpus', 'command', 'memory')}
+    old_job = run_restart_base_job(base_inp, base_folder, **base_kwargs)
+
+    # Run restarted jobs, copying base restart files to each one.
+    return run_abaqus_jobs(inp_files, analysis_folder, old_job=old_job,
+                           **kwargs)
+
+
+def save_amplitude_library(library_path, amplitudes, info=None):
+    """Add amplitudes records to a binary amplitude library.
+
+    Library is a npz file, holding an array of time, value pairs per
+    record and a json metadata entry. Records already in the library
+    are overwritten, keeping their order, and new ones are appended,
+    so records numbers used as parameters values remain valid.
+
+    Parameters
+    ----------
+    library_path : Path
+        Amplitude library npz file. Created if it does not exist.
+    amplitudes : dict
+        Record names : arrays of time, value pairs, as returned by
+        extract_inp_amplitudes.
+    info : dict, optional
+        Record names : dict of record metadata, such as source or units.
+
+    Returns
+    -------
+    Path
+        Amplitude library npz file.
+    """
+    # Load existing library and merge new records.
+    library_path = Path(library_path).with_suffix('.npz')
+    records = collections.OrderedDict()
+    metadata = {'records': [], 'info': {}}
+    if library_path.exists():
+        records, metadata = load_amplitude_library(library_path)
+    for name, data in amplitudes.items():
+        records[name] = np.asarray(data, dtype=float).reshape(-1, 2)
+        if name not in metadata['records']:
+            metadata['records'].append(name)
+    metadata['info'].update(info or {})
+
+    # Save records and metadata.
+    records[AMPLITUDE_METADATA_KEY] = np.array(json.dumps(metadata))
+    np.savez_compressed(library_path, **records)
+    return library_path
+
+
+def schedule_study_jobs(config_file, inp_files):
+    """Order study jobs longest predicted runtime first.
+
+    A runtime model is fitted on past jobs of the runtime history file
+    set by RUNTIME_HISTORY option of config file, using the study
+    parameters and mesh size as features. Jobs are ordered from the
+    longest to the shortest predicted runtime, so long jobs do not run
+    last while other cores idle. Without enough history, jobs are
+    ordered by mesh size.
+
+    Predictions are written to a <study>_runtime_log.csv file in the
+    study folder, for record_study_runtimes to compare with actual
+    times.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+    inp_files : list of Path
+        Inp files of models to run.
+
+    Returns
+    -------
+    list of Path
+        Inp files, longest predicted runtime first.
+    """
+    # Build study jobs features: parameters values and mesh size.
+    input_data = ft.extract_config_from_cfg(config_file)
+    study_name = Path(config_file).stem
+    parameters = pd.read_csv(Path(config_file).with_suffix('.csv'),
+                             index_col='MODEL_NO')
+    jobs = pd.DataFrame({'JOB': [Path(i).stem for i in inp_files],
+                         'INP': [str(i) for i in inp_files]})
+    jobs['MODEL_NO'] = [st.extract_number_from_str(i) for i in jobs['JOB']]
+    jobs = jobs.join(parameters, on='MODEL_NO')
+    jobs['LOG_NODES'] = [np.log(max(1, count_inp_mesh_entities(i)['nodes']))
+                         for i in inp_files]
+
+    # Fit runtime model on history, with features shared by study.
+    model = None
+    if (input_data.get('runtime_history')
+            and Path(input_data['runtime_history']).exists()):
+        history = pd.read_csv(input_data['runtime_history'])
+        features = ['LOG_NODES'] + [i for i in parameters.columns
+                                    if i in history.columns]
+        model = fit_runtime_model(history, features)
+
+    # Predict runtimes and sort jobs, longest first.
+    if model:
+        x = np.column_stack([np.ones(len(jobs))] +
+                            [jobs[i].to_numpy(float)
+                             for i in model['features']])
+        jobs['PREDICTED'] = np.exp(x @ np.array(model['coefficients']))
+        jobs = jobs.sort_values('PREDICTED', ascending=False)
+    else:
+        jobs['PREDICTED'] = np.nan
+        jobs = jobs.sort_values('LOG_NODES', ascending=False)
+
+    # Save runtime log, with predictions, in study folder.
+    log_path = Path(ft.create_non_existent_folder(Path.cwd() / study_name),
+                    study_name + '_runtime_log.csv')
+    jobs.drop(columns='INP').to_csv(log_path, index=False)
+    return [Path(i) for i in jobs['INP']]
+
+
+def send_to_cae_worker(port, script=None, code=None, argv=None, cwd=None,
+                       timeout=None):
+    """Execute a script or code in a running CAE worker session.
+
+    Parameters
+    ----------
+    port : int
+        Local port of CAE worker, as returned by start_cae_worker.
+    script : Path, optional
+        Path of script to execute.
+    code : str, optional
+        Python source to execute, if no script is given.
+    argv : list of str, optional
+        Arguments to set as sys.argv during execution.
+    cwd : Path, optional
+        Folder to chdir to during execution.
+    timeout : float, optional
+        Seconds to wait for response. Default is no limit.
+
+    Returns
+    -------
+    dict
+        Worker response, with 'status', 'output' and 'error' keys.
+    """
+    request = {'script': str(script) if script else None, 'code': code,
+               'argv': [str(i) for i in argv or []],
+               'cwd': str(cwd) if cwd else None}
+    with socket.create_connection(('127.0.0.1', port)) as connection:
+        connection.settimeout(timeout)
+        with connection.makefile('rwb') as stream:
+            stream.write((json.dumps(request) + '\n').encode('utf-8'))
+            stream.flush()
+            return json.loads(stream.readline().decode('utf-8'))
+
+
+def size_study_jobs(inp_files, calibration_file=None, total_cpus=None):
+    """Choose cpus, domains and memory of each job of a study.
+
+    Parameters
+    ----------
+    inp_files : list of Path
+        Inp files of models to run.
+    calibration_file : Path, optional
+        Csv file of benchmark runs, as used by choose_job_resources.
+    total_cpus : int, optional
+        Cpus available for the study. Default is machine cpus number.
+
+    Returns
+    -------
+    dict
+        Jobs names : resources dicts pairs, as returned by
+        choose_job_resources, with estimated 'dofs' added. To be passed
+        to run_abaqus_jobs.
+    """
+    calibration = None
+    if calibration_file and Path(calibration_file).exists():
+        calibration = pd.read_csv(calibration_file)
+    output = {}
+    for inp_file in inp_files:
+        dofs = estimate_inp_dofs(inp_file)
+        output[Path(inp_file).stem] = dict(choose_job_resources(
+            dofs, calibration, total_cpus), dofs=dofs)
+    if output:
+        print(pd.DataFrame.from_dict(output, orient='index'))
+    return output
+
+
+def split_restart_inp_lines(lines, base_steps, parameters_list=()):
+    """Split inp file lines into base and restarted analyses.
+
+    Base analysis holds model data and the first `base_steps` steps,
+    writing restart data at their end. Restarted analysis holds the
+    heading, parameters definitions, a *Restart, read line and the
+    rest of steps. Then, every parametric variant restarts from the
+    same base analysis results.
+
+    Parameters
+    ----------
+    lines : list of str
+        Lines of inp file.
+    base_steps : int
+        Number of steps to include in base analysis.
+    parameters_list : list of str, optional
+        Parametric variables, which may not be used in base analysis.
+
+    Returns
+    -------
+    list of str
+        Base analysis lines.
+    list of str
+        Restarted analysis lines.
+    """
+    # Locate steps definitions and verify there are steps to restart.
+    upper_lines = [i.upper().replace(' ', '') for i in lines]
+    starts = [n for n, i in enumerate(upper_lines) if i.startswith('*STEP')]
+    ends = [n for n, i in enumerate(upper_lines)
+            if i.startswith('*ENDSTEP')]
+    if len(starts) <= base_steps:
+        raise ValueError('Inp file has ' + str(len(starts)) + ' steps, '
+                         'restart needs more than ' + str(base_steps))
+
+    # Build base lines, writing restart data at end of base steps.
+    base_lines = lines[:starts[0]]
+    for start, end in zip(starts[:base_steps], ends[:base_steps]):
+        base_lines += [i for n, i in enumerate(lines[start:end], start)
+                       if not upper_lines[n].startswith('*RESTART')]
+        base_lines += ['*Restart, write, overlay, frequency=999999\n',
+                       lines[end]]
+    base_text = ''.join(base_lines)
+    for parameter in parameters_list:
+        if '<' + parameter + '>' in base_text:
+            raise ValueError('Parameter ' + parameter + ' used in base '
+                             'analysis, it can not be shared')
+
+    # Build restarted lines with heading and parameters blocks.
+    keywords = [n for n, i in enumerate(upper_lines)
+                if i.startswith('*') and not i.startswith('**')]
+    restart_lines = []
+    for n, keyword in enumerate(keywords):
+        if upper_lines[keyword].startswith(('*HEADING', '*PARAMETER')):
+            block_end = keywords[n + 1] if n + 1 < len(keywords) else None
+            restart_lines += [i for i in lines[keyword:block_end]
+                              if not i.startswith('**')]
+    restart_lines += ['*Restart, read, step=' + str(base_steps) + '\n']
+    restart_lines += lines[ends[base_steps - 1] + 1:]
+    return base_lines, restart_lines
+
+
+def start_cae_worker(port=None, command='abaqus cae noGUI=',
+                     startup_timeout=600):
+    """Launch a long-lived CAE worker and wait until it accepts requests.
+
+    The worker runs cae_worker.py script, which executes requested
+    scripts in the same warm Abaqus session. Command can be replaced,
+    for instance by 'python ', to run the worker with a plain Python
+    interpreter.
+
+    Parameters
+    ----------
+    port : int, optional
+        Local port for the worker to listen on. Default is a free one.
+    command : str, optional
+        Command line prefix to run worker script with.
+    startup_timeout : float, optional
+        Seconds to wait for worker to start accepting requests.
+
+    Returns
+    -------
+    subprocess.Popen
+        Worker process.
+    int
+        Local port the worker listens on.
+    """
+    # Get a free local port, if not given.
+    if not port:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+
+    # Launch worker script and poll its socket until it is ready.
+    worker_script = str(Path(__file__).parent / 'cae_worker.py')
+    process = subprocess.Popen(command + '"' + worker_script + '" -- '
+                               + str(port), shell=True)
+    start_time = time.time()
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            break
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('CAE worker exited during startup')
+            if time.time() - start_time > startup_timeout:
+                process.kill()
+                raise TimeoutError('CAE worker did not start in time')
+            time.sleep(0.2)
+    print('*** CAE WORKER LISTENING ON PORT', port, '***')
+    return process, port
+
+
+def stop_cae_worker(port, process=None):
+    """Ask a running CAE worker to finish, and wait for it.
+
+    Parameters
+    ----------
+    port : int
+        Local port of CAE worker.
+    process : subprocess.Popen, optional
+        Worker process to wait for.
+
+    Returns
+    -------
+    None
+    """
+    with socket.create_connection(('127.0.0.1', port)) as connection:
+        with connection.makefile('rwb') as stream:
+            stream.write(b'{"stop": true}\n')
+            stream.flush()
+            stream.readline()
+    if process:
+        process.wait()
+
+
+def store_study_results(config_file):
+    """Add extracted output of a study to the global results store.
+
+    Npz files of the study temp_files sub-folder are saved in the
+    results store set by the RESULTS_STORE option of config file, so
+    later studies can reuse them with link_stored_results. It is
+    called by summarize_fea_output.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+
+    Returns
+    -------
+    int
+        Number of npz files added to results store.
+    """
+    # Read study data and stored files of its models.
+    input_data = ft.extract_config_from_cfg(config_file)
+    if not input_data.get('results_store'):
+        return 0
+    study_folder = Path.cwd() / Path(config_file).stem
+    stored_files = study_results_keys(config_file)
+
+    # Copy npz files not yet stored, through temporary names.
+    added = 0
+    for npz_path in fc.list_files(study_folder / 'temp_files', '.npz'):
+        model_no = st.extract_number_from_str(Path(npz_path).stem)
+        stored_npz = stored_files.get(model_no)
+        if stored_npz is None or stored_npz.exists():
+            continue
+        ft.create_non_existent_folder(stored_npz.parent)
+        shutil.copy(npz_path, stored_npz.with_suffix('.tmp'))
+        os.replace(stored_npz.with_suffix('.tmp'), stored_npz)
+        added += 1
+    print(added, 'npz files added to results store')
+    return added
+
+
+def study_results_keys(config_file):
+    """Get results store files of each model of a study.
+
+    Models are identified by the study template inp file content, their
+    parameters values, the post-process script or EXTRACTION_PLAN
+    extracting their outputs and, for studies with
+    AMPLITUDE_PARAMETERS, the data of the amplitude library records
+    injected in them.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+
+    Returns
+    -------
+    dict
+        Models numbers : npz file paths in results store, which may not
+        exist yet. Empty if no RESULTS_STORE is set.
+    """
+    input_data = ft.extract_config_from_cfg(config_file)
+    if not input_data.get('results_store'):
+        return {}
+    study_name = Path(config_file).stem
+    template_inp = Path(Path.cwd() / study_name,
+                        input_data.get('inp_file_name', study_name)
+                        ).with_suffix('.inp')
+    parameters = pd.read_csv(Path(config_file).with_suffix('.csv'),
+                             index_col='MODEL_NO').to_dict(orient='index')
+    with open(template_inp, 'rb') as file:
+        inp_hash = hashlib.sha1(file.read()).hexdigest()
+
+    # Hash extraction plan or post-process script, as run by
+    # extract_fea_data.
+    extraction_plan = compile_extraction_plan(
+        input_data.get('extraction_plan') or [])
+    if extraction_plan:
+        script_hash = hashlib.sha1(repr(extraction_plan).encode('utf-8'))
+    else:
+        extraction_algorithm = (input_data.get('extraction_algorithm') or
+                                Path(Path.cwd() / study_name,
+                                     study_name).with_suffix('.py'))
+        with open(extraction_algorithm, 'rb') as file:
+            script_hash = hashlib.sha1(file.read())
+
+    # Amplitude records are taken by index from library, as injected by
+    # inject_amplitude_records.
+    records, records_names = {}, []
+    amplitude_parameters = input_data.get('amplitude_parameters') or {}
+    if amplitude_parameters:
+        records, metadata = load_amplitude_library(
+            input_data['amplitude_library'])
+        records_names = metadata['records']
+    output = {}
+    for model_no, values in parameters.items():
+        amplitudes = {
+            amplitude: records[records_names[int(round(float(
+                values[parameter])))]]
+            for parameter, amplitude in amplitude_parameters.items()}
+        output[model_no] = Path(input_data['results_store'],
+                                results_store_key(inp_hash, values,
+                                                  amplitudes,
+                                                  script_hash.hexdigest())
+                                ).with_suffix('.npz')
+    return output
+
 
 def summarize_fea_output(config_file):
     """Organize and store Abaqus output data files in a hdf5 database.
@@ -651,6 +3488,16 @@ def summarize_fea_output(config_file):
     parametric csv file that contains values of parameters of each
     model.
 
+    If APPEND_HDF5 option is set, an existing hdf5 file is updated in
+    place, writing only new or changed models. See update_study_hdf5.
+
+    If RESULTS_STORE option is set, npz files are also saved in the
+    results store for later studies. See store_study_results.
+
+    If STREAM_OUTPUT option is set, arrays were already written into
+    the hdf5 file by extract_fea_data, and no npz files exist, so only
+    datasets attributes are refreshed from the parametric csv file.
+
     Parameters
     ----------
     config_file : Path
@@ -678,9 +3525,30 @@ def summarize_fea_output(config_file):
     for k, v in df_dict.items():
         v['MODEL_NO'] = str(k)
 
+    # In stream mode, only refresh attributes of streamed datasets.
+    if input_config.get('stream_output'):
+        with h5py.File(hdf_path, 'a') as hdf:
+            for group in hdf.values():
+                if not isinstance(group, h5py.Group):
+                    continue
+                for model, dataset in group.items():
+                    model_no = st.extract_number_from_str(model)
+                    dataset.attrs.update(df_dict.get(model_no, {}))
+        print('*** HDF5 file attributes updated ***')
+        return hdf_path
+
+    # Optionally, update hdf5 file with new or changed models only.
+    npz_files_paths = fc.list_files(temp_folder, '.npz')
+    update_study_catalog(config_file, ['responses'])
+    store_study_results(config_file)
+    if input_config.get('append_hdf5'):
+        update_study_hdf5(npz_files_paths, hdf_path, df_dict,
+                          verbose=input_config['print_hdf5'])
+        print('*** HDF5 file updated ***')
+        return hdf_path
+
     # Save npz files to hdf5 file. Reload hdf5 file to reorder internal
     # structure, using output variable references as group keys.
-    npz_files_paths = ft.list_files_with_extension(temp_folder, '.npz')
     db.save_npz_in_hdf5(npz_files_list=npz_files_paths, hdf5_path=hdf_path,
                         attributes_dict=df_dict,
                         verbose=input_config['print_hdf5'])
@@ -689,3 +3557,389 @@ def summarize_fea_output(config_file):
     shutil.copy(temp_hdf_path, hdf_path)
     print('*** HDF5 file created ***')
     return hdf_path
+
+
+def transfer_job_results(source_folder, destination_folder,
+                         remove_source=True, chunk_size=2 ** 22):
+    """Move files of a staged job folder, verifying their checksums.
+
+    Each file is copied to a temporary name while its checksum is
+    computed, then the copy is read back and verified before being
+    renamed to its final name. Source folder is removed afterwards.
+
+    Parameters
+    ----------
+    source_folder : Path
+        Staged job folder to move files from.
+    destination_folder : Path
+        Folder to move files to.
+    remove_source : bool, optional
+        If True, remove source folder after all files are verified.
+    chunk_size : int, optional
+        Bytes read at a time.
+
+    Returns
+    -------
+    list of Path
+        Paths of transferred files.
+    """
+    def copy_file(source, destination):
+        """Copy a file, returning its sha1 hex digest."""
+        source_hash = hashlib.sha1()
+        with open(source, 'rb') as read_file, \
+                open(destination, 'wb') as write_file:
+            for chunk in iter(lambda: read_file.read(chunk_size), b''):
+                source_hash.update(chunk)
+                write_file.write(chunk)
+        return source_hash.hexdigest()
+
+    def hash_file(file_path):
+        """Get sha1 hex digest of a file."""
+        file_hash = hashlib.sha1()
+        with open(file_path, 'rb') as read_file:
+            for chunk in iter(lambda: read_file.read(chunk_size), b''):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    # Copy and verify each file, retrying once on mismatch.
+    ft.create_non_existent_folder(destination_folder)
+    transferred = []
+    for source in sorted(Path(source_folder).iterdir()):
+        if not source.is_file():
+            continue
+        destination = Path(destination_folder, source.name)
+        temp_path = Path(destination_folder, source.name + '.transfer')
+        for attempt in range(2):
+            if copy_file(source, temp_path) == hash_file(temp_path):
+                break
+        else:
+            raise IOError('Checksum mismatch transferring ' + str(source))
+        os.replace(temp_path, destination)
+        transferred.append(destination)
+
+    # Clean staged job folder.
+    if remove_source:
+        shutil.rmtree(source_folder)
+    return transferred
+
+
+def update_study_catalog(config_file, stages=None):
+    """Record study state in the catalog set by STUDY_CATALOG option.
+
+    Stages are:
+    - 'parameters': parameters values, from parametric csv file.
+    - 'jobs': jobs files, status and timings, from jobs log and text
+      output files.
+    - 'responses': npz files and their scalar responses, as taken by
+      scalar_responses function of study_catalog module. Only npz
+      files whose path or modification time changed since they were
+      recorded are read.
+    Stages functions call this function with their own stage, so
+    catalog is kept up to date during the study workflow.
+
+    Parameters
+    ----------
+    config_file : Path
+        Path of config file containing study data.
+    stages : list of str, optional
+        Stages to record. Default is all of them.
+
+    Returns
+    -------
+    Path
+        Catalog file, or None if STUDY_CATALOG option is not set.
+    """
+    # Read study data and open catalog.
+    input_data = ft.extract_config_from_cfg(config_file)
+    if not input_data.get('study_catalog'):
+        return None
+    study_name = Path(config_file).stem
+    study_folder = Path.cwd() / study_name
+    models_folder = Path(input_data.get('analysis_folder', study_folder),
+                         study_name)
+    if stages is None:
+        stages = ['parameters', 'jobs', 'responses']
+    connection = sc.open_catalog(input_data['study_catalog'])
+    try:
+        # Record parameters values of each model.
+        if 'parameters' in stages:
+            parameters = pd.read_csv(Path(config_file).with_suffix('.csv'),
+                                     index_col='MODEL_NO')
+            sc.record_values(connection, 'parameters', study_name,
+                             parameters.to_dict(orient='index'))
+
+        # Record jobs files, status and timings.
+        if 'jobs' in stages:
+            models = {}
+            for log_path in fc.list_files(models_folder, '.log'):
+                log_path = Path(log_path)
+                with open(log_path) as log_file:
+                    status = log_file.read().split()[-1:]
+                models[st.extract_number_from_str(log_path.stem)] = {
+                    'job': log_path.stem,
+                    'inp_path': str(log_path.with_suffix('.inp')),
+                    'odb_path': str(log_path.with_suffix('.odb')),
+                    'status': ('COMPLETED' if status == ['COMPLETED']
+                               else 'FAILED')}
+            timing = harvest_jobs_timing(models_folder)
+            for job_path, record in timing.iterrows():
+                model_no = st.extract_number_from_str(Path(job_path).name)
+                if model_no in models:
+                    models[model_no].update(
+                        user_time=record.get('userTime'),
+                        system_time=record.get('systemTime'),
+                        wallclock_time=record.get('wallclockTime'))
+            sc.record_models(connection, study_name, models)
+
+        # Record npz files and scalar responses of new or modified npz
+        # files. Files may be rewritten in place, so stat each of them.
+        if 'responses' in stages:
+            recorded = {i[0]: (i[1], i[2]) for i in connection.execute(
+                'SELECT model_no, npz_path, npz_mtime FROM models '
+                'WHERE study = ?', (study_name,))}
+            models, responses = {}, {}
+            for npz_path in fc.list_files(study_folder / 'temp_files',
+                                          '.npz'):
+                model_no = st.extract_number_from_str(Path(npz_path).stem)
+                npz_mtime = os.stat(npz_path).st_mtime
+                if recorded.get(model_no) == (str(npz_path), npz_mtime):
+                    continue
+                models[model_no] = {'npz_path': str(npz_path),
+                                    'npz_mtime': npz_mtime}
+                with np.load(npz_path) as npz:
+                    responses[model_no] = sc.scalar_responses(npz)
+            sc.record_models(connection, study_name, models)
+            sc.record_values(connection, 'responses', study_name,
+                             responses)
+    finally:
+        connection.close()
+    return Path(input_data['study_catalog'])
+
+
+def update_study_hdf5(npz_files, hdf_path, attributes_dict, verbose=False):
+    """Insert, replace or remove models data of a study hdf5 file.
+
+    Hdf5 file has a group per output variable and a dataset per model
+    in it, named after its model number, as built by
+    summarize_fea_output.
+    An index of npz files fingerprints (size, modification time and
+    sha1 checksum) and attributes is kept in file attributes, so only
+    datasets of new or changed npz files, or attributes of models with
+    changed parameters, are written. Datasets of models whose npz file
+    no longer exists are removed.
+
+    Parameters
+    ----------
+    npz_files : list of Path
+        Npz files of models output data.
+    hdf_path : Path
+        Hdf5 file to update. Created if it does not exist.
+    attributes_dict : dict
+        Models numbers : dict of attributes, such as parameters values.
+    verbose : bool, optional
+        If True, print each written or removed model.
+
+    Returns
+    -------
+    dict
+        Lists of 'added', 'updated', 'removed' and 'unchanged' models.
+    """
+    def fingerprint(npz_path, old_entry):
+        """Return fingerprint of npz file, hashing it only if needed."""
+        stat = os.stat(npz_path)
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        if (old_entry and old_entry['size'] == entry['size']
+                and old_entry['mtime'] == entry['mtime']):
+            entry['sha1'] = old_entry['sha1']
+            return entry
+        sha1 = hashlib.sha1()
+        with open(npz_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(2 ** 22), b''):
+                sha1.update(chunk)
+        entry['sha1'] = sha1.hexdigest()
+        return entry
+
+    output = {'added': [], 'updated': [], 'removed': [], 'unchanged': []}
+    with h5py.File(hdf_path, 'a') as hdf:
+        index = json.loads(hdf.attrs.get('npz_index', '{}'))
+
+        # Remove datasets of models without npz file.
+        npz_files = {str(st.extract_number_from_str(Path(i).stem)): Path(i)
+                     for i in npz_files}
+        for model in set(index) - set(npz_files):
+            for variable in index.pop(model)['variables']:
+                if variable in hdf and model in hdf[variable]:
+                    del hdf[variable][model]
+            output['removed'].append(model)
+
+        # Write datasets of new or changed npz files, and attributes of
+        # models with changed attributes.
+        for model, npz_path in sorted(npz_files.items()):
+            old_entry = index.get(model)
+            entry = fingerprint(npz_path, old_entry)
+            attributes = attributes_dict.get(int(model), {})
+            entry['attributes'] = json.loads(json.dumps(attributes,
+                                                        default=str))
+            if old_entry and old_entry['sha1'] == entry['sha1']:
+                entry['variables'] = old_entry['variables']
+                if old_entry['attributes'] != entry['attributes']:
+                    for variable in entry['variables']:
+                        hdf[variable][model].attrs.update(attributes)
+                    output['updated'].append(model)
+                else:
+                    output['unchanged'].append(model)
+                index[model] = entry
+                continue
+            with np.load(npz_path) as npz:
+                entry['variables'] = list(npz.keys())
+                for variable in set((old_entry or {}).get('variables', [])
+                                    ) - set(entry['variables']):
+                    del hdf[variable][model]
+                for variable in entry['variables']:
+                    group = hdf.require_group(variable)
+                    if model in group:
+                        del group[model]
+                    group.create_dataset(model, data=npz[variable])
+                    group[model].attrs.update(attributes)
+            output['updated' if old_entry else 'added'].append(model)
+            index[model] = entry
+            if verbose:
+                print('Model', model, 'written')
+
+        # Save index in file attributes.
+        hdf.attrs['npz_index'] = json.dumps(index)
+    if verbose:
+        print({k: len(v) for k, v in output.items()})
+    return output
+
+
+def upgrade_odbs_parallel(odbs_folder, processes=None, recursive=False,
+                          abaqus_version=None):
+    """Upgrade version of all Odb files in a folder, in parallel.
+
+    Odb files are distributed among several Abaqus CAE processes, each
+    of them running upgrade_odbs_list function of abaqus_inside module.
+    Every Odb is upgraded to its own temporary file, so workers do not
+    interfere, and it is verified before swapping old and new files.
+
+    Progress is recorded in journal files, inside a .odb_upgrade
+    sub-folder of the target Abaqus version. If a previous run was
+    interrupted, finished files are not processed again, half-swapped
+    files are completed and partial temporary files are removed. Once
+    a run finishes, journals are cleared, except for failed files, so
+    later runs check all Odbs again.
+
+    Parameters
+    ----------
+    odbs_folder : Path
+        Folder containing Odb files.
+    processes : int, optional
+        Number of Abaqus worker processes. Default is cpus number.
+    recursive : bool, optional
+        If True, list Odb files recursively, including subfolders.
+    abaqus_version : str, optional
+        Target Abaqus version, naming journals sub-folder. Default is
+        release reported by abaqus command.
+
+    Returns
+    -------
+    dict
+        Statuses : number of Odb files pairs, as recorded in journals.
+    """
+    def read_journals():
+        """Get Odb paths : last successful or failed status pairs."""
+        journals_statuses = {}
+        for journal_path in Path(journal_folder).glob('journal-*.txt'):
+            with open(journal_path) as journal_file:
+                for line in journal_file:
+                    status, _, path = line.rstrip('\n').partition('\t')
+                    if journals_statuses.get(path, 'FAILED') == 'FAILED':
+                        journals_statuses[path] = status
+        return journals_statuses
+
+    def sibling(odb_path, old_suffix, new_suffix):
+        """Change Odb file name suffix, keeping its folder."""
+        name = Path(odb_path).name
+        return str(Path(odb_path).with_name(name[:-len(old_suffix)] +
+                                            new_suffix))
+
+    # Get target Abaqus version from abaqus command release.
+    if not abaqus_version:
+        p = subprocess.Popen('abaqus information=release', shell=True,
+                             stdout=subprocess.PIPE)
+        out, _ = p.communicate()
+        release = re.search(rb'Abaqus\s+(\d[\w.-]*)', out or b'')
+        abaqus_version = release.group(1).decode() if release else 'unknown'
+
+    # Set journals folder and read finished Odbs from previous runs.
+    journal_folder = ft.create_non_existent_folder(
+        Path(odbs_folder, '.odb_upgrade', abaqus_version))
+    finished = {k: v for k, v in read_journals().items() if v != 'FAILED'}
+
+    # Recover files of interrupted runs: complete swaps of verified
+    # upgrades, or remove partial upgrades.
+    odb_list = fc.list_files(odbs_folder, '.odb', recursive)
+    for temp_name in [i for i in odb_list if i.endswith('-upgrading.odb')]:
+        odb_path = sibling(temp_name, '-upgrading.odb', '.odb')
+        if (not os.path.exists(odb_path)
+                and os.path.exists(sibling(odb_path, '.odb', '-old.odb'))):
+            os.rename(temp_name, odb_path)
+            finished[odb_path] = 'UPGRADED'
+            with open(Path(journal_folder, 'journal-recovered.txt'),
+                      'a') as file:
+                file.write('UPGRADED\t' + odb_path + '\n')
+        else:
+            os.remove(temp_name)
+
+    # Select pending Odbs, excluding temporary and old version files.
+    pending = [i for i in odb_list if not i.endswith('-upgrading.odb')
+               and not i.endswith('-old.odb') and i not in finished]
+    print(len(odb_list), 'Odb files found', len(pending), 'pending')
+
+    # Distribute pending Odbs, largest first, among workers.
+    if not processes:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(pending)))
+    pending.sort(key=os.path.getsize, reverse=True)
+    workers_lists = [pending[i::processes] for i in range(processes)]
+
+    # Write worker script, calling abaqus_inside with sys.argv inputs.
+    modules_path = str(Path(__file__).parent)
+    worker_script = Path(journal_folder, 'upgrade_worker.py')
+    with open(worker_script, 'w') as file:
+        file.write('\n'.join(['import json', 'import sys',
+                              'sys.path.append(' + repr(modules_path) + ')',
+                              'from abaqus_inside import *',
+                              'with open(sys.argv[-2]) as odbs_file:',
+                              '    odb_list = json.load(odbs_file)',
+                              'upgrade_odbs_list(odb_list, sys.argv[-1])']))
+
+    # Launch one Abaqus subprocess per worker and wait for all of them.
+    running = []
+    for number, worker_list in enumerate(workers_lists):
+        if not worker_list:
+            continue
+        list_file = Path(journal_folder, 'odbs-' + str(number) + '.json')
+        with open(list_file, 'w') as file:
+            json.dump(worker_list, file)
+        journal = Path(journal_folder, 'journal-' + str(number) + '.txt')
+        command = ('abaqus cae noGUI="' + str(worker_script) + '" -- "'
+                   + str(list_file) + '" "' + str(journal) + '"')
+        running.append(subprocess.Popen(command, shell=True))
+    for process in running:
+        process.communicate()
+
+    # Summarize journals statuses of this and previous runs. Clear
+    # journals, keeping failed Odbs only.
+    statuses = read_journals()
+    summary = {}
+    for status in statuses.values():
+        summary[status] = summary.get(status, 0) + 1
+    for journal_path in Path(journal_folder).glob('journal-*.txt'):
+        os.remove(journal_path)
+    failed = [k for k, v in statuses.items() if v == 'FAILED']
+    if failed:
+        with open(Path(journal_folder, 'journal-failed.txt'), 'w') as file:
+            file.write(''.join('FAILED\t' + i + '\n' for i in failed))
+    print('*** ODB UPGRADE DONE ***', summary)
+    return summary
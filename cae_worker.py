@@ -0,0 +1,158 @@
+"""Long-lived Abaqus CAE worker, executing scripts in a warm session.
+
+    This script is meant to be launched once, as an Abaqus CAE noGUI
+    script, by start_cae_worker function of abaqus_outside module. It
+    listens on a local socket and executes every requested script or
+    code in the same session, so Abaqus startup, license checkout and
+    modules imports are paid only once.
+
+    Requests and responses are json objects, one per line. Requests
+    may contain 'script' (path of file to execute) or 'code' (source
+    to execute), and optionally 'argv' and 'cwd' to set sys.argv and
+    working folder during execution. A 'stop' request ends the worker.
+    Responses contain 'status' (ok or error), 'output' (text printed
+    during execution) and 'error' (traceback, if any). Scripts calling
+    sys.exit, and malformed request lines, get error responses, so the
+    worker keeps serving.
+
+    It does not depend on Abaqus modules, so it can be run by a plain
+    Python interpreter, standing in for the CAE kernel.
+
+    Usage: abaqus cae noGUI=cae_worker.py -- <port>
+
+    Developed by Rodrigo Rivero.
+    https://github.com/rodrigo1392
+
+    """
+
+import json
+import os
+import socket
+import sys
+import traceback
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import __main__
+
+
+# Local address to listen on.
+HOST = '127.0.0.1'
+
+
+def execute_request(request, base_namespace):
+    """Execute a script or code request, capturing its printed output.
+
+    Parameters
+    ----------
+    request : dict
+        Request with 'script' or 'code' keys, and optionally 'argv'
+        and 'cwd' keys.
+    base_namespace : dict
+        Global names to execute the request with, such as Abaqus
+        modules names preloaded by CAE.
+
+    Returns
+    -------
+    dict
+        Response with 'status', 'output' and 'error' keys.
+    """
+    # Redirect stdout, including sys.__stdout__ used by log_message of
+    # abaqus_inside module.
+    file_name = request.get('script') or '<request>'
+    output = StringIO()
+    original_argv, original_cwd = sys.argv, os.getcwd()
+    original_stdout, original_dunder_stdout = sys.stdout, sys.__stdout__
+    sys.stdout = sys.__stdout__ = output
+    response = {'status': 'ok', 'error': ''}
+    try:
+        # Read source and set script sys.argv and working folder.
+        if request.get('script'):
+            with open(file_name) as script:
+                source = script.read()
+        else:
+            source = request.get('code', '')
+        sys.argv = [file_name] + list(request.get('argv', []))
+        if request.get('cwd'):
+            os.chdir(request['cwd'])
+
+        # Execute in a fresh namespace copy.
+        namespace = dict(base_namespace)
+        namespace.update({'__name__': '__main__', '__file__': file_name})
+        exec(compile(source, file_name, 'exec'), namespace)
+    except SystemExit as error:
+        if error.code not in (None, 0):
+            response['status'] = 'error'
+            response['error'] = traceback.format_exc()
+    except Exception:
+        response['status'] = 'error'
+        response['error'] = traceback.format_exc()
+    finally:
+        sys.stdout, sys.__stdout__ = original_stdout, original_dunder_stdout
+        sys.argv = original_argv
+        os.chdir(original_cwd)
+    response['output'] = output.getvalue()
+    return response
+
+
+def serve(port):
+    """Serve script execution requests until a stop request arrives.
+
+    Parameters
+    ----------
+    port : int
+        Local port to listen on.
+
+    Returns
+    -------
+    None
+    """
+    # Keep names loaded at startup, such as Abaqus modules in CAE.
+    base_namespace = {k: v for k, v in vars(__main__).items()
+                      if not k.startswith('__')}
+
+    # Listen on local socket and serve one client at a time. If a
+    # client disconnects or times out, drop its connection and keep
+    # accepting new ones.
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((HOST, port))
+    server.listen(1)
+    running = True
+    while running:
+        connection, address = server.accept()
+        stream = connection.makefile('rwb')
+        try:
+            for line in stream:
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    if not isinstance(request, dict):
+                        raise ValueError('Request is not a json object')
+                except ValueError:
+                    response = {'status': 'error', 'output': '',
+                                'error': traceback.format_exc()}
+                else:
+                    if request.get('stop'):
+                        response, running = {'status': 'stopped'}, False
+                    else:
+                        response = execute_request(request, base_namespace)
+                stream.write((json.dumps(response) + '\n').encode('utf-8'))
+                stream.flush()
+                if not running:
+                    break
+        except (socket.error, OSError) as error:
+            sys.stderr.write('WARNING: CONNECTION FROM %s LOST: %s\n'
+                             % (address[0], error))
+        try:
+            stream.close()
+        except (socket.error, OSError):
+            pass
+        connection.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    serve(int(sys.argv[-1]))
@@ -0,0 +1,230 @@
+"""Cached catalog of files in parametric studies folders.
+
+    Study folders may hold tens of thousands of inp, log, odb and npz
+    files, often on network shares, where listing them once per stage
+    and extension is slow. Here, folders are read with a single
+    os.scandir pass, classifying files by extension and model number,
+    and keeping their size and modification time.
+
+    Catalogs are kept in memory and updated incrementally: on later
+    queries, only directories whose modification time changed are
+    read again. Adding, removing or renaming files changes it, but
+    modifying files in place does not, so stats of files being written
+    may be outdated until their directory changes. Abaqus creates and
+    removes lock and temporary files when jobs start and finish, so
+    jobs files stats are updated by then.
+
+    Developed by Rodrigo Rivero.
+    https://github.com/rodrigo1392
+
+    """
+
+import os
+import re
+import time
+
+
+# Catalogs of scanned folders, by (root path, recursive) pairs.
+CATALOGS = {}
+
+# Directories modified this number of seconds before being scanned are
+# read again on next query, as file systems with coarse timestamps may
+# not register later changes within the same timestamp.
+RACY_SECONDS = 2.0
+
+MODEL_NUMBER_PATTERN = re.compile(r'(\d+)(?!.*\d)')
+
+
+def file_stats(root_path, extensions=None, recursive=False, refresh=False):
+    """Get size and modification time of files in a folder.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder to list files of.
+    extensions : list of str, optional
+        Extensions to keep, such as ['.sta', '.dat']. Default is all.
+    recursive : bool, optional
+        If True, include files in subfolders.
+    refresh : bool, optional
+        If True, read all directories again.
+
+    Returns
+    -------
+    dict
+        Files paths : (size in bytes, modification time) pairs, sorted
+        by model number and name.
+    """
+    if extensions is not None:
+        extensions = set(normalize_extension(i) for i in extensions)
+    catalog = get_catalog(root_path, recursive, refresh)
+    entries = [(folder, name, data)
+               for folder, directory in catalog['directories'].items()
+               for name, data in directory['files'].items()
+               if extensions is None or data[3] in extensions]
+    entries.sort(key=lambda i: (i[2][2] is None, i[2][2] or 0, i[0], i[1]))
+    return {os.path.join(folder, name): (data[0], data[1])
+            for folder, name, data in entries}
+
+
+def files_by_model(root_path, extensions=None, recursive=False,
+                   refresh=False):
+    """Group files of a folder by model number and extension.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder to list files of.
+    extensions : list of str, optional
+        Extensions to keep, such as ['.inp', '.odb']. Default is all.
+    recursive : bool, optional
+        If True, include files in subfolders.
+    refresh : bool, optional
+        If True, read all directories again.
+
+    Returns
+    -------
+    dict
+        Model numbers : dict of extensions : files paths, sorted by
+        model number. Files without number in their names are left
+        out.
+    """
+    if extensions is not None:
+        extensions = set(normalize_extension(i) for i in extensions)
+    output = {}
+    catalog = get_catalog(root_path, recursive, refresh)
+    for folder, directory in catalog['directories'].items():
+        for name, data in directory['files'].items():
+            if data[2] is None or (extensions is not None
+                                   and data[3] not in extensions):
+                continue
+            output.setdefault(data[2], {})[data[3]] = os.path.join(folder,
+                                                                   name)
+    return dict(sorted(output.items()))
+
+
+def get_catalog(root_path, recursive=False, refresh=False):
+    """Get the catalog of a folder, updating changed directories.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder to catalog.
+    recursive : bool, optional
+        If True, include subfolders.
+    refresh : bool, optional
+        If True, read all directories again.
+
+    Returns
+    -------
+    dict
+        Catalog, as returned by scan_folder.
+    """
+    key = (os.path.abspath(str(root_path)), bool(recursive))
+    CATALOGS[key] = scan_folder(key[0], recursive, CATALOGS.get(key),
+                                refresh)
+    return CATALOGS[key]
+
+
+def list_files(root_path, extension, recursive=False, refresh=False):
+    """List files of a folder with an extension, sorted by model number.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder to list files of.
+    extension : str
+        Files extension, with or without leading dot.
+    recursive : bool, optional
+        If True, include files in subfolders.
+    refresh : bool, optional
+        If True, read all directories again.
+
+    Returns
+    -------
+    list of str
+        Files full paths, sorted by model number, and then by name.
+    """
+    return list(file_stats(root_path, [extension], recursive, refresh))
+
+
+def normalize_extension(extension):
+    """Get lowercase extension with leading dot.
+
+    Parameters
+    ----------
+    extension : str
+        Extension, such as 'ODB' or '.odb'.
+
+    Returns
+    -------
+    str
+        Normalized extension, such as '.odb'.
+    """
+    extension = extension.lower()
+    return extension if extension.startswith('.') else '.' + extension
+
+
+def scan_folder(root_path, recursive=False, catalog=None, refresh=False):
+    """Read a folder into a catalog, or update an existing one.
+
+    Directories whose modification time matches the catalog one are
+    not read again, only their known subdirectories are checked.
+
+    Parameters
+    ----------
+    root_path : Path
+        Folder to catalog.
+    recursive : bool, optional
+        If True, include subfolders.
+    catalog : dict, optional
+        Previous catalog of the folder, to update.
+    refresh : bool, optional
+        If True, read all directories again.
+
+    Returns
+    -------
+    dict
+        Catalog, with 'directories': directories paths : dict of
+        'mtime' (None to read it again), 'subdirectories' names and
+        'files': names : (size, modification time, model number,
+        extension) tuples.
+    """
+    previous = (catalog or {}).get('directories', {})
+    directories = {}
+    pending = [str(root_path)]
+    while pending:
+        folder = pending.pop()
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        directory = previous.get(folder)
+
+        # Read directory again only if it changed since last scan.
+        if refresh or not directory or directory['mtime'] != mtime:
+            files, subdirectories = {}, []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirectories.append(entry.name)
+                            continue
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    stem, extension = os.path.splitext(entry.name)
+                    number = MODEL_NUMBER_PATTERN.search(stem)
+                    files[entry.name] = (stat.st_size, stat.st_mtime,
+                                         int(number.group(1)) if number
+                                         else None, extension.lower())
+            if time.time() - mtime / 1e9 < RACY_SECONDS:
+                mtime = None
+            directory = {'mtime': mtime, 'files': files,
+                         'subdirectories': subdirectories}
+        directories[folder] = directory
+        if recursive:
+            pending.extend(os.path.join(folder, i)
+                           for i in directory['subdirectories'])
+    return {'root': str(root_path), 'recursive': bool(recursive),
+            'directories': directories}
@@ -0,0 +1,428 @@
+"""Mesh quality metrics of Abaqus inp files, computed outside Abaqus.
+
+    Nodes, elements and element sets are read from the inp file, part
+    by part or instance by instance, into connectivity arrays. Then,
+    for every element, aspect ratio, skewness, Jacobian ratio and sign
+    and minimum edge length are computed, vectorized over all elements
+    of a type. Only corner nodes are used, so quadratic elements are
+    checked as their linear counterparts.
+
+    Models can then be screened before running expensive jobs, with
+    summaries by element set and the worst elements of each metric.
+
+    Developed by Rodrigo Rivero.
+    https://github.com/rodrigo1392
+
+    """
+
+import collections
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Element shapes by corner nodes: edges, faces and corners to compute
+# Jacobian at, as (corner, three neighbours in right-handed order) for
+# solids and (corner, next, previous) for surfaces.
+SHAPES = {
+    'tri': {'corners': 3, 'solid': False,
+            'edges': [(0, 1), (1, 2), (2, 0)],
+            'faces': [(0, 1, 2)],
+            'jacobian': [(0, 1, 2), (1, 2, 0), (2, 0, 1)]},
+    'quad': {'corners': 4, 'solid': False,
+             'edges': [(0, 1), (1, 2), (2, 3), (3, 0)],
+             'faces': [(0, 1, 2, 3)],
+             'jacobian': [(0, 1, 3), (1, 2, 0), (2, 3, 1), (3, 0, 2)]},
+    'tet': {'corners': 4, 'solid': True,
+            'edges': [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)],
+            'faces': [(0, 1, 2), (0, 1, 3), (1, 2, 3), (0, 2, 3)],
+            'jacobian': [(0, 1, 2, 3)]},
+    'wedge': {'corners': 6, 'solid': True,
+              'edges': [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3),
+                        (0, 3), (1, 4), (2, 5)],
+              'faces': [(0, 1, 2), (3, 4, 5), (0, 1, 4, 3), (1, 2, 5, 4),
+                        (2, 0, 3, 5)],
+              'jacobian': [(0, 1, 2, 3), (1, 2, 0, 4), (2, 0, 1, 5),
+                           (3, 5, 4, 0), (4, 3, 5, 1), (5, 4, 3, 2)]},
+    'hex': {'corners': 8, 'solid': True,
+            'edges': [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6),
+                      (6, 7), (7, 4), (0, 4), (1, 5), (2, 6), (3, 7)],
+            'faces': [(0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4),
+                      (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)],
+            'jacobian': [(0, 1, 3, 4), (1, 2, 0, 5), (2, 3, 1, 6),
+                         (3, 0, 2, 7), (4, 7, 5, 0), (5, 4, 6, 1),
+                         (6, 5, 7, 2), (7, 6, 4, 3)]}}
+
+# Element types prefixes of solids and surfaces checked by shape.
+SOLID_PREFIXES = ('C3D', 'AC3D', 'DC3D', 'DCC3D')
+SURFACE_PREFIXES = ('CPS', 'CPE', 'CAX', 'CGAX', 'AC2D', 'ACAX', 'DC2D',
+                    'DCAX', 'S', 'M3D', 'SFM3D', 'R3D', 'STRI')
+
+# Metrics computed by element_quality, as inp_mesh_quality columns.
+METRICS = ['min_edge_length', 'aspect_ratio', 'skewness', 'min_jacobian',
+           'jacobian_ratio']
+
+# Default screening thresholds: metric : (operator, limit) of bad ones.
+THRESHOLDS = {'aspect_ratio': ('>', 10.0), 'skewness': ('>', 0.8),
+              'jacobian_ratio': ('<', 0.1)}
+
+
+def element_shape(element_type, nodes_number):
+    """Get shape of an element type, from SHAPES keys.
+
+    Parameters
+    ----------
+    element_type : str
+        Abaqus element type, such as 'CPS6M'.
+    nodes_number : int
+        Number of nodes of each element.
+
+    Returns
+    -------
+    str
+        Shape name, or None if element type is not checked.
+    """
+    element_type = element_type.upper()
+    if element_type.startswith(SOLID_PREFIXES):
+        shapes = {4: 'tet', 10: 'tet', 6: 'wedge', 15: 'wedge', 8: 'hex',
+                  20: 'hex', 27: 'hex'}
+    elif element_type.startswith(SURFACE_PREFIXES):
+        shapes = {3: 'tri', 6: 'tri', 4: 'quad', 8: 'quad', 9: 'quad'}
+    else:
+        return None
+    return shapes.get(nodes_number)
+
+
+def element_quality(corners, shape, planar=False):
+    """Compute quality metrics of elements of a shape.
+
+    Parameters
+    ----------
+    corners : array
+        Corner nodes coordinates, shape (n_elements, n_corners, 3).
+    shape : str
+        Elements shape, from SHAPES keys.
+    planar : bool, optional
+        If True, surface elements lie in XY plane, and Jacobian sign
+        is taken from Z axis. Otherwise, from elements mean normal.
+
+    Returns
+    -------
+    dict
+        'aspect_ratio', 'skewness', 'jacobian_ratio', 'min_jacobian'
+        and 'min_edge_length' arrays, shape (n_elements,).
+    """
+    shape = SHAPES[shape]
+
+    # Edges lengths give aspect ratio and minimum edge length.
+    edges = np.array(shape['edges'])
+    lengths = np.linalg.norm(corners[:, edges[:, 1]] -
+                             corners[:, edges[:, 0]], axis=2)
+    output = {'min_edge_length': lengths.min(axis=1)}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        output['aspect_ratio'] = lengths.max(axis=1) / output[
+            'min_edge_length']
+
+    # Equiangle skewness of faces corners angles, worst face taken.
+    skewness = np.zeros(len(corners))
+    for size, ideal in ((3, 60.0), (4, 90.0)):
+        faces = np.array([i for i in shape['faces'] if len(i) == size])
+        if not len(faces):
+            continue
+        points = corners[:, faces]
+        v1 = np.roll(points, -1, axis=2) - points
+        v2 = np.roll(points, 1, axis=2) - points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosines = np.sum(v1 * v2, axis=3) / (
+                np.linalg.norm(v1, axis=3) * np.linalg.norm(v2, axis=3))
+        angles = np.degrees(np.arccos(np.clip(cosines, -1, 1)))
+        skew = np.maximum((angles.max(axis=2) - ideal) / (180 - ideal),
+                          (ideal - angles.min(axis=2)) / ideal)
+        skewness = np.maximum(skewness, skew.max(axis=1))
+    output['skewness'] = skewness
+
+    # Jacobian at corners, from edges vectors meeting at each of them.
+    jacobian = np.array(shape['jacobian'])
+    vectors = corners[:, jacobian[:, 1:]] - corners[:, jacobian[:, :1]]
+    if shape['solid']:
+        corner_jacobians = np.linalg.det(vectors)
+    else:
+        normals = np.cross(vectors[:, :, 0], vectors[:, :, 1])
+        if planar:
+            corner_jacobians = normals[:, :, 2]
+        else:
+            reference = normals.sum(axis=1, keepdims=True)
+            reference /= np.linalg.norm(reference, axis=2, keepdims=True)
+            corner_jacobians = np.sum(normals * reference, axis=2)
+    output['min_jacobian'] = corner_jacobians.min(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        output['jacobian_ratio'] = (output['min_jacobian'] /
+                                    np.abs(corner_jacobians).max(axis=1))
+    return output
+
+
+def inp_mesh_quality(inp_path, meshes=None):
+    """Compute quality metrics of all elements of an inp file.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to read mesh from.
+    meshes : dict, optional
+        Mesh data already read by read_inp_mesh, to avoid reading
+        inp file again.
+
+    Returns
+    -------
+    pandas DataFrame
+        A row per checked element, with 'scope' (instance or part
+        name), 'type', 'label' and metrics columns, as returned by
+        element_quality.
+    """
+    if meshes is None:
+        meshes = read_inp_mesh(inp_path)
+    tables = []
+    for scope, mesh in meshes.items():
+        node_labels, coordinates = mesh['nodes']
+        if not len(node_labels):
+            continue
+        order = np.argsort(node_labels)
+        planar = not np.any(coordinates[:, 2])
+        for element_type, (labels, connectivity) in mesh['elements'].items():
+            shape = element_shape(element_type, connectivity.shape[1])
+            if shape is None:
+                continue
+
+            # Map corner nodes labels to coordinates rows.
+            corner_labels = connectivity[:, :SHAPES[shape]['corners']]
+            rows = order[np.searchsorted(node_labels, corner_labels,
+                                         sorter=order)]
+            metrics = element_quality(coordinates[rows], shape, planar)
+            table = pd.DataFrame(metrics)
+            table.insert(0, 'label', labels)
+            table.insert(0, 'type', element_type)
+            table.insert(0, 'scope', scope)
+            tables.append(table)
+    if not tables:
+        columns = {'scope': str, 'type': str, 'label': np.int64}
+        columns.update((i, float) for i in METRICS)
+        return pd.DataFrame({k: pd.Series(dtype=v)
+                             for k, v in columns.items()})
+    return pd.concat(tables, ignore_index=True)
+
+
+def mesh_quality_report(inp_path, thresholds=None, worst=10):
+    """Summarize mesh quality of an inp file, by element set.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to read mesh from.
+    thresholds : dict, optional
+        Metrics : (operator, limit) pairs of bad elements. Default is
+        THRESHOLDS.
+    worst : int, optional
+        Number of worst elements to report for each metric.
+
+    Returns
+    -------
+    dict
+        'elements': metrics of each element, as returned by
+        inp_mesh_quality, with a 'bad' column.
+        'sets': a row per scope and element set, including 'ALL', with
+        minimum, mean and maximum of each metric, and bad elements
+        count.
+        'worst': worst elements of each metric with a threshold.
+    """
+    if thresholds is None:
+        thresholds = THRESHOLDS
+    meshes = read_inp_mesh(inp_path)
+    elements = inp_mesh_quality(inp_path, meshes)
+    metrics = ['aspect_ratio', 'skewness', 'jacobian_ratio',
+               'min_edge_length']
+
+    # Flag elements beyond any threshold, or with negative Jacobian.
+    bad = np.zeros(len(elements), dtype=bool)
+    if len(elements):
+        bad = elements['min_jacobian'].to_numpy() <= 0
+    for metric, (operator, limit) in thresholds.items():
+        values = elements[metric].to_numpy()
+        bad |= values > limit if operator == '>' else values < limit
+    elements['bad'] = bad
+
+    # Summarize each element set of each scope.
+    rows = []
+    for scope, mesh in meshes.items():
+        scope_elements = elements[elements['scope'] == scope]
+        element_sets = dict(mesh['elsets'], ALL=None)
+        for set_name, set_labels in element_sets.items():
+            selected = scope_elements
+            if set_labels is not None:
+                selected = scope_elements[np.isin(scope_elements['label'],
+                                                  set_labels)]
+            if not len(selected):
+                continue
+            row = {'scope': scope, 'elset': set_name,
+                   'elements': len(selected), 'bad': selected['bad'].sum()}
+            for metric in metrics:
+                row[metric + '_min'] = selected[metric].min()
+                row[metric + '_mean'] = selected[metric].mean()
+                row[metric + '_max'] = selected[metric].max()
+            rows.append(row)
+
+    # Select worst elements of each metric.
+    worst_elements = {
+        metric: (elements.nlargest(worst, metric) if operator == '>'
+                 else elements.nsmallest(worst, metric))
+        for metric, (operator, _) in thresholds.items()}
+    return {'elements': elements, 'sets': pd.DataFrame(rows),
+            'worst': worst_elements}
+
+
+def read_inp_mesh(inp_path):
+    """Read nodes, elements and element sets of an inp file.
+
+    Mesh is read by instance, for meshes defined inside *Instance
+    blocks, or by part, shared by all instances of it otherwise.
+    Nodes coordinates are local ones, as metrics do not depend on
+    instances positioning.
+
+    Parameters
+    ----------
+    inp_path : Path
+        Inp file to read.
+
+    Returns
+    -------
+    dict
+        Instance (or part) names : dict of mesh data, with keys:
+        'nodes': labels and coordinates arrays, shape (n,) and (n, 3).
+        'elements': element types : labels and connectivity arrays.
+        'elsets': element set names : labels arrays.
+    """
+    def new_mesh():
+        """Build empty mesh data."""
+        return {'nodes': [], 'elements': collections.OrderedDict(),
+                'elsets': collections.OrderedDict()}
+
+    def read_block(block, lines):
+        """Add data lines of a keyword block to its mesh."""
+        if not lines:
+            return
+        kind, mesh, name = block
+        text = ''.join(lines)
+        if kind == 'nodes':
+            columns = len(lines[0].split(','))
+            values = np.array(text.replace(',', ' ').split(),
+                              dtype=float).reshape(-1, columns)
+            mesh['nodes'].append(values)
+        elif kind == 'elements':
+            rows = re.sub(r',\s*\n', ', ', text).split('\n')
+            columns = len(rows[0].split(','))
+            values = np.array(','.join(rows).replace(',', ' ').split(),
+                              dtype=np.int64).reshape(-1, columns)
+            mesh['elements'].setdefault(name, []).append(values)
+        elif kind in ('elsets', 'generate'):
+            tokens = [int(i) for i in text.replace(',', ' ').split()
+                      if i.isdigit()]
+            if kind == 'generate':
+                tokens = np.concatenate([
+                    np.arange(tokens[i], tokens[i + 1] + 1, tokens[i + 2])
+                    for i in range(0, len(tokens) - 2, 3)])
+            mesh['elsets'].setdefault(name, []).append(
+                np.asarray(tokens, dtype=np.int64))
+
+    # Read keyword blocks, keeping track of current part or instance.
+    parts, instances = {}, collections.OrderedDict()
+    instances_parts, current = {}, None
+    block, lines = None, []
+    with open(inp_path, errors='replace') as file:
+        for line in file:
+            if line.startswith('**'):
+                continue
+            if not line.startswith('*'):
+                if block:
+                    lines.append(line)
+                continue
+            read_block(block, lines)
+            block, lines = None, []
+            keyword = line[1:].partition(',')[0].strip().upper()
+            options = dict(
+                (k.strip().lower(), v.strip().strip('"'))
+                for k, _, v in (i.partition('=')
+                                for i in line.rstrip().split(',')[1:]))
+            if keyword == 'PART':
+                current = parts[options['name']] = new_mesh()
+            elif keyword == 'INSTANCE':
+                current = instances[options['name']] = new_mesh()
+                instances_parts[options['name']] = options.get('part')
+            elif keyword in ('END PART', 'END INSTANCE'):
+                current = None
+            elif keyword == 'NODE' and current is not None:
+                block = ('nodes', current, None)
+            elif keyword == 'ELEMENT' and current is not None:
+                block = ('elements', current, options.get('type', 'UNKNOWN'))
+            elif keyword == 'ELSET':
+                mesh = instances.get(options.get('instance'), current)
+                if mesh is not None:
+                    block = ('generate' if 'generate' in options
+                             else 'elsets', mesh, options.get('elset'))
+        read_block(block, lines)
+
+    # Use part mesh for instances without their own one.
+    meshes = collections.OrderedDict()
+    for name, mesh in instances.items():
+        part = parts.get(instances_parts[name])
+        if not mesh['nodes'] and part:
+            mesh = dict(part, elsets=dict(part['elsets'], **mesh['elsets']))
+        meshes[name] = mesh
+    used_parts = set(instances_parts.values())
+    meshes.update((k, v) for k, v in parts.items() if k not in used_parts)
+
+    # Join blocks into arrays.
+    for name, mesh in meshes.items():
+        nodes = (np.concatenate(mesh['nodes']) if mesh['nodes']
+                 else np.zeros((0, 4)))
+        coordinates = np.zeros((len(nodes), 3))
+        coordinates[:, :nodes.shape[1] - 1] = nodes[:, 1:4]
+        elements = collections.OrderedDict()
+        for element_type, blocks in mesh['elements'].items():
+            values = np.concatenate(blocks)
+            elements[element_type] = (values[:, 0], values[:, 1:])
+        meshes[name] = {
+            'nodes': (nodes[:, 0].astype(np.int64), coordinates),
+            'elements': elements,
+            'elsets': {k: np.unique(np.concatenate(v))
+                       for k, v in mesh['elsets'].items()}}
+    return meshes
+
+
+def screen_inp_files(inp_files, thresholds=None):
+    """Find models with bad elements before running them.
+
+    Parameters
+    ----------
+    inp_files : list of Path
+        Inp files of models to screen.
+    thresholds : dict, optional
+        Metrics : (operator, limit) pairs of bad elements. Default is
+        THRESHOLDS.
+
+    Returns
+    -------
+    pandas DataFrame
+        A row per model, with elements and bad elements counts and
+        worst value of each metric.
+    """
+    rows = []
+    for inp_file in inp_files:
+        elements = mesh_quality_report(inp_file, thresholds,
+                                       worst=0)['elements']
+        rows.append({'inp': str(inp_file), 'elements': len(elements),
+                     'bad': int(elements['bad'].sum()),
+                     'aspect_ratio_max': elements['aspect_ratio'].max(),
+                     'skewness_max': elements['skewness'].max(),
+                     'jacobian_ratio_min': elements['jacobian_ratio'].min(),
+                     'min_edge_length': elements['min_edge_length'].min()})
+    return pd.DataFrame(rows)
@@ -0,0 +1,267 @@
+"""Global sensitivity analysis of parametric studies outputs.
+
+    Sampling designs, to build the parametric csv samples, and their
+    matching sensitivity measures:
+    - latin_hypercube_design: correlation and regression coefficients.
+    - saltelli_design: Sobol first and total order indices.
+    - morris_design: Morris elementary effects.
+
+    Measures are vectorized over responses: outputs of all models are
+    passed as a single array of shape (n_models, ...), where trailing
+    dimensions may hold scalar responses or every time step of a time
+    history, and indices are computed for all of them at once.
+
+    Developed by Rodrigo Rivero.
+    https://github.com/rodrigo1392
+
+    """
+
+import numpy as np
+
+
+# Sampling designs of build_parametric_csv and their sensitivity measures.
+DESIGNS = ['uniform', 'latin_hypercube', 'saltelli', 'morris']
+
+
+def correlation_coefficients(x, y):
+    """Get correlation and regression coefficients of outputs on inputs.
+
+    Parameters
+    ----------
+    x : array
+        Inputs samples, shape (n_models, n_parameters).
+    y : array
+        Outputs, shape (n_models, ...).
+
+    Returns
+    -------
+    dict
+        'pearson', 'spearman' and standardized regression coefficients
+        'src' arrays, shape (n_parameters, ...).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    trailing_shape = y.shape[1:]
+    y = y.reshape(len(y), -1)
+
+    def standardize(array):
+        """Center and scale columns, setting constant ones to NaN."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (array - array.mean(axis=0)) / array.std(axis=0)
+
+    def ranks(array):
+        """Rank values of each column, keeping constant ones constant."""
+        output = np.argsort(np.argsort(array, axis=0), axis=0).astype(float)
+        output[:, np.ptp(array, axis=0) == 0] = 0
+        return output
+
+    # Correlations are means of products of standardized variables.
+    xs, ys = standardize(x), standardize(y)
+    output = {'pearson': xs.T @ ys / len(x),
+              'spearman': standardize(ranks(x)).T @ standardize(ranks(y))
+              / len(x)}
+
+    # Regression of standardized outputs on standardized inputs.
+    valid = np.all(np.isfinite(ys), axis=0)
+    src = np.full((x.shape[1], ys.shape[1]), np.nan)
+    if valid.any() and np.all(np.isfinite(xs)):
+        src[:, valid] = np.linalg.lstsq(xs, ys[:, valid], rcond=None)[0]
+    output['src'] = src
+    return {k: v.reshape((x.shape[1],) + trailing_shape)
+            for k, v in output.items()}
+
+
+def latin_hypercube_design(bounds, samples, seed=None):
+    """Sample parameters space with a latin hypercube design.
+
+    Parameters
+    ----------
+    bounds : array-like
+        Minimum and maximum values of each parameter, shape
+        (n_parameters, 2).
+    samples : int
+        Number of samples.
+    seed : int, optional
+        Random generator seed.
+
+    Returns
+    -------
+    array
+        Samples, shape (samples, n_parameters).
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    rng = np.random.default_rng(seed)
+    strata = rng.permuted(np.tile(np.arange(samples), (len(bounds), 1)),
+                          axis=1).T
+    unit = (strata + rng.random(strata.shape)) / samples
+    return bounds[:, 0] + unit * (bounds[:, 1] - bounds[:, 0])
+
+
+def morris_design(bounds, trajectories, levels=4, seed=None):
+    """Sample parameters space with Morris one-at-a-time trajectories.
+
+    Each trajectory has n_parameters + 1 points on a grid of `levels`
+    values per parameter, each point moving one parameter, in random
+    order, by a step of levels / (2 * (levels - 1)) of its range.
+
+    Parameters
+    ----------
+    bounds : array-like
+        Minimum and maximum values of each parameter, shape
+        (n_parameters, 2).
+    trajectories : int
+        Number of trajectories.
+    levels : int, optional
+        Number of grid levels, an even number.
+    seed : int, optional
+        Random generator seed.
+
+    Returns
+    -------
+    array
+        Samples, shape (trajectories * (n_parameters + 1), n_parameters).
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    parameters = len(bounds)
+    rng = np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+
+    # Start points on grid, moving up or down, staying inside bounds.
+    start = rng.integers(0, levels, (trajectories, parameters)) / (
+        levels - 1.0)
+    steps = np.where(start + delta <= 1, delta, -delta)
+
+    # Move one parameter at a time, in a random order per trajectory.
+    order = rng.permuted(np.tile(np.arange(parameters), (trajectories, 1)),
+                         axis=1)
+    moves = np.zeros((trajectories, parameters + 1, parameters))
+    rows = np.arange(trajectories)[:, np.newaxis]
+    moves[rows, np.arange(1, parameters + 1), order] = steps[rows, order]
+    unit = start[:, np.newaxis] + np.cumsum(moves, axis=1)
+    unit = unit.reshape(-1, parameters)
+    return bounds[:, 0] + unit * (bounds[:, 1] - bounds[:, 0])
+
+
+def morris_effects(x, y, trajectories, bounds=None):
+    """Get Morris elementary effects statistics from trajectories outputs.
+
+    Steps are scaled by parameters ranges of sampling bounds, so
+    effects do not depend on the extent trajectories happened to reach.
+
+    Parameters
+    ----------
+    x : array
+        Inputs samples, as built by morris_design, shape
+        (trajectories * (n_parameters + 1), n_parameters).
+    y : array
+        Outputs, shape (trajectories * (n_parameters + 1), ...).
+    trajectories : int
+        Number of trajectories.
+    bounds : array-like, optional
+        Minimum and maximum values of each parameter, shape
+        (n_parameters, 2), as passed to morris_design. Default is
+        range of samples.
+
+    Returns
+    -------
+    dict
+        'mu', 'mu_star' and 'sigma' of elementary effects, arrays of
+        shape (n_parameters, ...).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    trailing_shape = y.shape[1:]
+    parameters = x.shape[1]
+    x = x.reshape(trajectories, parameters + 1, parameters)
+    y = y.reshape(trajectories, parameters + 1, -1)
+
+    # Each step moves a single parameter: find it and its scaled step.
+    dx = np.diff(x, axis=1)
+    moved = np.argmax(np.abs(dx), axis=2)
+    if bounds is None:
+        ranges = np.ptp(x.reshape(-1, parameters), axis=0)
+    else:
+        ranges = np.diff(np.asarray(bounds, dtype=float), axis=1)[:, 0]
+    ranges[ranges == 0] = 1
+    step = np.take_along_axis(dx, moved[..., np.newaxis], axis=2)[..., 0]
+    effects_by_step = np.diff(y, axis=1) / (step / ranges[moved])[
+        ..., np.newaxis]
+
+    # Order elementary effects by parameter in each trajectory.
+    effects = np.empty_like(effects_by_step)
+    rows = np.arange(trajectories)[:, np.newaxis]
+    effects[rows, moved] = effects_by_step
+    output = {'mu': effects.mean(axis=0),
+              'mu_star': np.abs(effects).mean(axis=0),
+              'sigma': effects.std(axis=0, ddof=1 if trajectories > 1
+                                   else 0)}
+    return {k: v.reshape((parameters,) + trailing_shape)
+            for k, v in output.items()}
+
+
+def saltelli_design(bounds, samples, seed=None):
+    """Sample parameters space for Sobol indices estimation.
+
+    Two independent latin hypercube matrices A and B are built, and
+    for each parameter, a matrix AB_i equal to A with the parameter
+    column taken from B. Samples are A, B, AB_1, ..., AB_n stacked.
+
+    Parameters
+    ----------
+    bounds : array-like
+        Minimum and maximum values of each parameter, shape
+        (n_parameters, 2).
+    samples : int
+        Number of rows of A and B matrices.
+    seed : int, optional
+        Random generator seed.
+
+    Returns
+    -------
+    array
+        Samples, shape (samples * (n_parameters + 2), n_parameters).
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    parameters = len(bounds)
+    ab = latin_hypercube_design(np.vstack([bounds, bounds]), samples, seed)
+    a, b = ab[:, :parameters], ab[:, parameters:]
+    blocks = [a, b]
+    for i in range(parameters):
+        block = a.copy()
+        block[:, i] = b[:, i]
+        blocks.append(block)
+    return np.vstack(blocks)
+
+
+def sobol_indices(y, parameters):
+    """Get Sobol first and total order indices from Saltelli outputs.
+
+    Saltelli (2010) estimator is used for first order indices, and
+    Jansen (1999) estimator for total order indices.
+
+    Parameters
+    ----------
+    y : array
+        Outputs of samples built by saltelli_design, shape
+        (samples * (n_parameters + 2), ...).
+    parameters : int
+        Number of parameters.
+
+    Returns
+    -------
+    dict
+        'first_order' and 'total_order' indices arrays, shape
+        (n_parameters, ...).
+    """
+    y = np.asarray(y, dtype=float)
+    trailing_shape = y.shape[1:]
+    y = y.reshape(parameters + 2, -1, int(np.prod(trailing_shape)))
+    f_a, f_b, f_ab = y[0], y[1], y[2:]
+    variance = np.var(np.concatenate([f_a, f_b]), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        output = {'first_order': np.mean(f_b * (f_ab - f_a), axis=1)
+                  / variance,
+                  'total_order': 0.5 * np.mean((f_a - f_ab) ** 2, axis=1)
+                  / variance}
+    return {k: v.reshape((parameters,) + trailing_shape)
+            for k, v in output.items()}
@@ -0,0 +1,240 @@
+"""SQLite catalog of parametric studies models, status and results.
+
+    A single catalog file holds every study of a campaign: models and
+    their files paths, job status and timings, parameters values and
+    scalar responses. It is populated by abaqus_outside stages through
+    update_study_catalog, so study state can be queried without
+    listing folders or reading Odb, npz or hdf5 files.
+
+    Parameters and responses are stored as (name, value) rows indexed
+    by name and value, so filtering models by parameter ranges and
+    ranking them by a response are index searches.
+
+    Developed by Rodrigo Rivero.
+    https://github.com/rodrigo1392
+
+    """
+
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Columns of models table, besides study and model number keys.
+MODELS_COLUMNS = ['job', 'inp_path', 'odb_path', 'npz_path', 'npz_mtime',
+                  'status', 'user_time', 'system_time', 'wallclock_time',
+                  'updated']
+
+# Comparison operators allowed in query_models filters.
+FILTER_OPERATORS = ['<', '<=', '=', '>=', '>', '!=']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    study TEXT NOT NULL, model_no INTEGER NOT NULL, job TEXT,
+    inp_path TEXT, odb_path TEXT, npz_path TEXT, npz_mtime REAL,
+    status TEXT, user_time REAL, system_time REAL, wallclock_time REAL,
+    updated REAL, PRIMARY KEY (study, model_no));
+CREATE INDEX IF NOT EXISTS models_status ON models (status, study);
+CREATE TABLE IF NOT EXISTS parameters (
+    study TEXT NOT NULL, model_no INTEGER NOT NULL, name TEXT NOT NULL,
+    value REAL, PRIMARY KEY (study, model_no, name));
+CREATE INDEX IF NOT EXISTS parameters_value
+    ON parameters (name, value, study, model_no);
+CREATE TABLE IF NOT EXISTS responses (
+    study TEXT NOT NULL, model_no INTEGER NOT NULL, name TEXT NOT NULL,
+    value REAL, PRIMARY KEY (study, model_no, name));
+CREATE INDEX IF NOT EXISTS responses_value
+    ON responses (name, value, study, model_no);
+"""
+
+
+def open_catalog(catalog_path):
+    """Open a study catalog, creating its tables if needed.
+
+    Parameters
+    ----------
+    catalog_path : Path
+        SQLite catalog file.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Catalog connection.
+    """
+    connection = sqlite3.connect(str(catalog_path))
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+
+    # Add columns missing in catalogs created by previous versions.
+    columns = [i[1] for i in connection.execute('PRAGMA table_info(models)')]
+    if 'npz_mtime' not in columns:
+        connection.execute('ALTER TABLE models ADD COLUMN npz_mtime REAL')
+    return connection
+
+
+def query_models(connection, study=None, status=None, filters=None,
+                 rank_by=None, descending=True, limit=None):
+    """Query models by status and parameters values, ranked by a response.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Catalog connection.
+    study : str, optional
+        Study name. Default is all studies.
+    status : str, optional
+        Job status, such as 'COMPLETED'.
+    filters : list of tuple, optional
+        (parameter name, operator, value) tuples, such as
+        ('ALPHA_DYN', '<', -0.2). Operators from FILTER_OPERATORS.
+    rank_by : str, optional
+        Response name to sort models by.
+    descending : bool, optional
+        If True, sort from the largest response value.
+    limit : int, optional
+        Maximum number of models to return.
+
+    Returns
+    -------
+    pandas DataFrame
+        Models rows, with a column per filter parameter and ranking
+        response.
+    """
+    # Join parameters and responses tables once per filter or ranking.
+    columns, joins, conditions, values = ['m.*'], [], [], []
+    for n, (name, operator, value) in enumerate(filters or []):
+        if operator not in FILTER_OPERATORS:
+            raise ValueError('Unknown operator ' + str(operator))
+        alias = 'p' + str(n)
+        joins.append('JOIN parameters ' + alias + ' ON ' + alias +
+                     '.study = m.study AND ' + alias + '.model_no = '
+                     'm.model_no AND ' + alias + '.name = ? AND ' + alias +
+                     '.value ' + operator + ' ?')
+        columns.append(alias + '.value AS "' + name.replace('"', '') + '"')
+        values += [name, value]
+    if rank_by:
+        joins.append('JOIN responses r ON r.study = m.study AND '
+                     'r.model_no = m.model_no AND r.name = ?')
+        columns.append('r.value AS "' + rank_by.replace('"', '') + '"')
+        values.append(rank_by)
+
+    # Filter models by study and status, sort and limit them.
+    if study:
+        conditions.append('m.study = ?')
+        values.append(study)
+    if status:
+        conditions.append('m.status = ?')
+        values.append(status)
+    query = 'SELECT ' + ', '.join(columns) + ' FROM models m ' + \
+            ' '.join(joins)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    if rank_by:
+        query += ' ORDER BY r.value' + (' DESC' if descending else '')
+    if limit:
+        query += ' LIMIT ' + str(int(limit))
+    return pd.read_sql_query(query, connection, params=values)
+
+
+def record_models(connection, study, models):
+    """Insert or update models rows of a study.
+
+    Only given columns are updated, so each stage can record its own
+    data without overwriting other stages ones.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Catalog connection.
+    study : str
+        Study name.
+    models : dict
+        Models numbers : dict of MODELS_COLUMNS values.
+
+    Returns
+    -------
+    None
+    """
+    now = time.time()
+    rows_by_columns = {}
+    for model_no, data in models.items():
+        data = dict(data, updated=now)
+        unknown_columns = set(data) - set(MODELS_COLUMNS)
+        if unknown_columns:
+            raise ValueError('Unknown models columns ' +
+                             str(sorted(unknown_columns)))
+        columns = tuple(sorted(data))
+        rows_by_columns.setdefault(columns, []).append(
+            [study, int(model_no)] + [data[i] for i in columns])
+
+    # Upsert rows sharing the same columns in a single statement.
+    with connection:
+        for columns, rows in rows_by_columns.items():
+            connection.executemany(
+                'INSERT INTO models (study, model_no, ' +
+                ', '.join(columns) + ') VALUES (' +
+                ', '.join('?' * (len(columns) + 2)) + ') '
+                'ON CONFLICT (study, model_no) DO UPDATE SET ' +
+                ', '.join(i + ' = excluded.' + i for i in columns), rows)
+
+
+def record_values(connection, table, study, values):
+    """Insert or update parameters or responses values of a study.
+
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+        Catalog connection.
+    table : str
+        'parameters' or 'responses'.
+    study : str
+        Study name.
+    values : dict
+        Models numbers : dict of names : values pairs.
+
+    Returns
+    -------
+    None
+    """
+    if table not in ('parameters', 'responses'):
+        raise ValueError('Unknown values table ' + str(table))
+    rows = [(study, int(model_no), name, float(value))
+            for model_no, model_values in values.items()
+            for name, value in model_values.items()]
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO ' + table +
+                               ' VALUES (?, ?, ?, ?)', rows)
+
+
+def scalar_responses(arrays):
+    """Get scalar responses of a model from its output arrays.
+
+    Single value arrays, such as reduced outputs, are responses by
+    themselves. For time histories, arrays of (time, value) pairs,
+    peak absolute value and its time are taken.
+
+    Parameters
+    ----------
+    arrays : dict
+        Output names : arrays pairs, such as a loaded npz file.
+
+    Returns
+    -------
+    dict
+        Response names : float values pairs.
+    """
+    output = {}
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        if not array.size or array.dtype.kind not in 'fiu':
+            continue
+        if array.size == 1:
+            output[name] = float(array.ravel()[0])
+        elif array.ndim == 2 and array.shape[1] == 2:
+            peak = np.argmax(np.abs(array[:, 1]))
+            output[name + '_abs_max'] = float(abs(array[peak, 1]))
+            output[name + '_time_of_peak'] = float(array[peak, 0])
+    return output
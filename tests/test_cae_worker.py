@@ -0,0 +1,109 @@
+"""Tests of serve function of cae_worker module."""
+
+import json
+import socket
+import struct
+import threading
+import time
+
+import __main__
+import pytest
+
+import cae_worker
+
+
+class StubSession(object):
+    """Stand-in for Abaqus session object preloaded by CAE."""
+
+    def __init__(self):
+        self.odbs = {'Job-1': 'odb'}
+
+
+def connect(port):
+    """Connect to worker, and return request function and stream."""
+    for _ in range(100):
+        try:
+            client = socket.create_connection((cae_worker.HOST, port))
+            break
+        except socket.error:
+            time.sleep(0.05)
+    client.settimeout(10)
+    stream = client.makefile('rwb')
+
+    def request(line):
+        """Send a request line and read the response."""
+        stream.write(line.encode('utf-8') + b'\n')
+        stream.flush()
+        return json.loads(stream.readline().decode('utf-8'))
+    return request, client, stream
+
+
+@pytest.fixture
+def port(monkeypatch):
+    """Run worker in a thread, with a stub session, and stop it."""
+    monkeypatch.setattr(__main__, 'session', StubSession(), raising=False)
+    probe = socket.socket()
+    probe.bind((cae_worker.HOST, 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    thread = threading.Thread(target=cae_worker.serve, args=(port,))
+    thread.daemon = True
+    thread.start()
+    yield port
+    request, client, stream = connect(port)
+    request(json.dumps({'stop': True}))
+    thread.join(5)
+    stream.close()
+    client.close()
+    assert not thread.is_alive()
+
+
+@pytest.fixture
+def worker(port):
+    """Connect to worker, and close connection after test."""
+    request, client, stream = connect(port)
+    yield request
+    stream.close()
+    client.close()
+
+
+def test_code_request_uses_session(worker):
+    response = worker(json.dumps({'code': 'print(sorted(session.odbs))'}))
+    assert response['status'] == 'ok'
+    assert response['output'].strip() == "['Job-1']"
+
+
+def test_script_request_with_argv(worker, tmp_path):
+    script = tmp_path / 'script.py'
+    script.write_text(u'import sys\nprint(sys.argv[-1])\n')
+    response = worker(json.dumps({'script': str(script), 'argv': ['x']}))
+    assert response == {'status': 'ok', 'error': '', 'output': 'x\n'}
+
+
+def test_errors_keep_worker_serving(worker, tmp_path):
+    assert worker('not json')['status'] == 'error'
+    assert worker('[1, 2]')['status'] == 'error'
+    response = worker(json.dumps({'code': 'import sys\nsys.exit(2)'}))
+    assert response['status'] == 'error'
+    assert 'SystemExit' in response['error']
+    response = worker(json.dumps({'script': str(tmp_path / 'missing.py')}))
+    assert response['status'] == 'error'
+    assert worker(json.dumps({'code': 'import sys\nsys.exit()'})) == {
+        'status': 'ok', 'error': '', 'output': ''}
+    response = worker(json.dumps({'code': 'print(1 + 1)'}))
+    assert response['output'] == '2\n'
+
+
+def test_lost_client_keeps_worker_serving(port):
+    request, client, stream = connect(port)
+    stream.write(json.dumps({'code': 'import time\ntime.sleep(0.5)'})
+                 .encode('utf-8') + b'\n')
+    stream.flush()
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                      struct.pack('ii', 1, 0))
+    stream.close()
+    client.close()
+    request, client, stream = connect(port)
+    assert request(json.dumps({'code': 'print(1 + 1)'}))['output'] == '2\n'
+    stream.close()
+    client.close()
@@ -0,0 +1,83 @@
+"""Tests of mesh_quality module."""
+
+import numpy as np
+
+import mesh_quality as mq
+
+
+BEAM_INP = """*Heading
+*Part, name=FRAME
+*Node
+      1,           0.,           0.
+      2,           1.,           0.
+      3,           2.,           0.
+*Element, type=B21
+1, 1, 2
+2, 2, 3
+*Elset, elset=ALL_BEAMS, generate
+ 1,  2,  1
+*End Part
+*Assembly, name=Assembly
+*Instance, name=FRAME-1, part=FRAME
+*End Instance
+*End Assembly
+"""
+
+QUAD_INP = """*Part, name=PLATE
+*Node
+1, 0., 0.
+2, 1., 0.
+3, 1., 1.
+4, 0., 1.
+5, 2., 0.
+6, 2., 1.
+*Element, type=CPS4
+1, 1, 2, 3, 4
+2, 2, 6, 3,
+ 5
+*Elset, elset=TWISTED
+2,
+*End Part
+"""
+
+
+def test_element_quality_unit_shapes():
+    hexahedron = np.array([[[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                            [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]]],
+                          dtype=float)
+    metrics = mq.element_quality(hexahedron, 'hex')
+    assert np.allclose(metrics['aspect_ratio'], 1)
+    assert np.allclose(metrics['skewness'], 0)
+    assert np.allclose(metrics['jacobian_ratio'], 1)
+
+    # Clockwise triangle is inverted.
+    triangle = np.array([[[0, 0, 0], [0, 1, 0], [1, 0, 0]]], dtype=float)
+    metrics = mq.element_quality(triangle, 'tri', planar=True)
+    assert metrics['min_jacobian'][0] < 0
+
+
+def test_report_of_part_mesh_and_sets(tmp_path):
+    inp_path = tmp_path / 'plate.inp'
+    inp_path.write_text(QUAD_INP)
+    report = mq.mesh_quality_report(inp_path)
+    elements = report['elements'].set_index('label')
+    assert list(elements.index) == [1, 2]
+    assert np.isclose(elements.loc[1, 'skewness'], 0)
+    assert not elements.loc[1, 'bad']
+    assert elements.loc[2, 'bad']
+    sets = report['sets'].set_index('elset')
+    assert sets.loc['TWISTED', 'elements'] == 1
+    assert sets.loc['ALL', 'bad'] == 1
+
+
+def test_deck_without_checked_elements(tmp_path):
+    inp_path = tmp_path / 'frame.inp'
+    inp_path.write_text(BEAM_INP)
+    report = mq.mesh_quality_report(inp_path)
+    assert report['elements'].empty
+    assert set(mq.METRICS) <= set(report['elements'].columns)
+    assert report['sets'].empty
+    assert all(i.empty for i in report['worst'].values())
+    screening = mq.screen_inp_files([inp_path])
+    assert screening.loc[0, 'elements'] == 0
+    assert screening.loc[0, 'bad'] == 0
@@ -0,0 +1,78 @@
+"""Tests of iterate_output_frames function of abaqus_outside module."""
+
+import io
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip('tools_submodule.filesystem_tools')
+import abaqus_outside as abo
+
+
+# Stub of an Abaqus subprocess, logging text and streaming frames in
+# the format of stream_arrays function of abaqus_inside module.
+PRODUCER = """
+import json, sys
+import numpy as np
+stream = sys.stdout.buffer
+def frame(model, variable, array):
+    header = json.dumps({'model': model, 'variable': variable,
+                         'dtype': array.dtype.str,
+                         'shape': list(array.shape)})
+    stream.write(MAGIC + header.encode('utf-8') + b'\\n' + array.tobytes())
+stream.write(b'Abaqus License Manager checked out tokens\\n')
+for n in range(3):
+    frame('Job-' + str(n + 1) + '.odb', 'U2',
+          np.arange(2 * (n + 1), dtype=float).reshape(-1, 2) * n)
+    stream.write(b'npz saved: Job-' + str(n + 1).encode() + b'\\n')
+    stream.flush()
+"""
+
+
+def build_frame(model, variable, array):
+    header = json.dumps({'model': model, 'variable': variable,
+                         'dtype': array.dtype.str,
+                         'shape': list(array.shape)})
+    return (abo.ARRAY_FRAME_MAGIC + header.encode('utf-8') + b'\n' +
+            array.tobytes())
+
+
+def test_frames_from_subprocess_stub():
+    code = 'MAGIC = ' + repr(abo.ARRAY_FRAME_MAGIC) + '\n' + PRODUCER
+    process = subprocess.Popen([sys.executable, '-c', code],
+                               stdout=subprocess.PIPE)
+    items = list(abo.iterate_output_frames(process.stdout, chunk_size=5))
+    process.wait()
+    lines = [i for i in items if isinstance(i, str)]
+    frames = [i for i in items if not isinstance(i, str)]
+    assert lines == ['Abaqus License Manager checked out tokens',
+                     'npz saved: Job-1', 'npz saved: Job-2',
+                     'npz saved: Job-3']
+    assert [i[0] for i in frames] == ['Job-1.odb', 'Job-2.odb', 'Job-3.odb']
+    for n, (_, variable, array) in enumerate(frames):
+        assert variable == 'U2'
+        assert np.array_equal(array, np.arange(2 * (n + 1), dtype=float
+                                               ).reshape(-1, 2) * n)
+
+
+def test_frames_split_across_chunks_and_text_without_newline():
+    array = np.linspace(0, 1, 12).reshape(3, 4)
+    data = (b'first line\n' + build_frame('m', 'S11', array) +
+            build_frame('m', 'EMPTY', np.zeros((0, 2))) + b'last line')
+    for chunk_size in (1, 3, 64, len(data)):
+        items = list(abo.iterate_output_frames(io.BytesIO(data),
+                                               chunk_size))
+        assert items[0] == 'first line'
+        assert items[1][:2] == ('m', 'S11')
+        assert np.array_equal(items[1][2], array)
+        assert items[2][2].shape == (0, 2)
+        assert items[3] == 'last line'
+
+
+def test_truncated_frame_raises():
+    data = build_frame('m', 'U1', np.ones(8))[:-3]
+    with pytest.raises(ValueError):
+        list(abo.iterate_output_frames(io.BytesIO(data)))